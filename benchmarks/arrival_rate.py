@@ -0,0 +1,61 @@
+import time
+
+import click
+import numpy as np
+
+from common.execution.optimal_limit_order.estimators import get_executed_quantities
+from synthetic import get_synthetic_trades_and_quotes
+
+
+def get_executed_quantities_loop(trades_and_quotes, offsets, tick_size):
+    executed_quantities_per_offset = []
+    for offset in offsets:
+        prev_timestamp = None
+        limit_order = None
+        executed_quantity = 0
+        last_ask = None
+        executed_quantities = []
+        for index, row in trades_and_quotes.iterrows():
+            timestamp = index.round('min')
+            if not np.isnan(row['ASK']):
+                last_ask = row['ASK']
+            if prev_timestamp is None:
+                prev_timestamp = timestamp
+                continue
+            if timestamp != prev_timestamp:
+                executed_quantities.append(executed_quantity)
+                executed_quantity = 0
+                prev_timestamp = timestamp
+                if last_ask is not None:
+                    limit_order = last_ask + offset * tick_size
+            if executed_quantity == 0 and limit_order is not None and not np.isnan(row['TRDPRC_1']) and row['TRDPRC_1'] > limit_order:
+                executed_quantity = row['COUNT']
+        executed_quantities_per_offset.append(executed_quantities)
+    return np.array(executed_quantities_per_offset, dtype=float)
+
+
+@click.command()
+@click.option('--rows', default=20000)
+@click.option('--offsets', default=5)
+def main(rows, offsets):
+    tick_size = 0.25
+    trades_and_quotes = get_synthetic_trades_and_quotes(rows, tick_size)
+    offsets = np.linspace(-2, 10, offsets)
+
+    start = time.perf_counter()
+    expected = get_executed_quantities_loop(trades_and_quotes, offsets, tick_size)
+    loop_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    actual = get_executed_quantities(trades_and_quotes, offsets, tick_size)
+    vectorized_seconds = time.perf_counter() - start
+
+    assert np.array_equal(expected, actual, equal_nan=True)
+    print(f'rows={rows} offsets={len(offsets)}')
+    print(f'loop: {loop_seconds:.3f}s')
+    print(f'vectorized: {vectorized_seconds:.4f}s')
+    print(f'speedup: {loop_seconds / vectorized_seconds:.0f}x')
+
+
+if __name__ == '__main__':
+    main()  # pylint: disable=no-value-for-parameter
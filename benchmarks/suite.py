@@ -0,0 +1,221 @@
+from contextlib import redirect_stderr, redirect_stdout
+from datetime import datetime
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from unittest import mock
+
+import click
+import numpy as np
+import pandas as pd
+
+from common.execution import orders
+from common.execution.optimal_limit_order.estimators import DayTicks, get_arrival_rate, get_average_trading_size, get_cost_per_share, get_day_estimators, get_volatility
+from common.execution.optimal_limit_order.pricer import LOG_SPACE_SOLVER, get_optimal_quote, get_solver, optimal_limit_order_formula, optimal_limit_order_surface
+from common.execution.session import serialize_position
+from synthetic import get_synthetic_positions, get_synthetic_quotes, get_synthetic_trades
+
+DEFAULT_TOLERANCE = 0.2
+SECONDS = 'seconds'
+ROWS_PER_SECOND = 'rows/s'
+MODEL_PARAMETERS = {'mu': 0, 'sigma': 1.2, 'A': 0.05, 'k': 0.6, 'gamma': 2e-3, 'b': 3.1}
+EXECUTION_PARAMETERS = {'ats': 3.0, 'sigma': 1.2, 'b': 3.1, 'A': 0.05, 'k': 0.6}
+
+
+def measure(function, repeat=5, minimum_seconds=0.05):
+    """
+    Best time in seconds per call out of repeat runs, each run calling
+    function enough times to last minimum_seconds so that fast functions
+    are not dominated by timer noise.
+    """
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        elapsed = time.perf_counter() - start
+        if elapsed >= minimum_seconds:
+            break
+        number *= 2
+    timings = [elapsed / number]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        timings.append((time.perf_counter() - start) / number)
+    return min(timings)
+
+
+def benchmark_pricer(q_maxs, t_maxs, solvers, large_q_maxs, stem, repeat):
+    results = {}
+    for solver in solvers:
+        for q_max in q_maxs:
+            for t_max in t_maxs:
+                name = f'pricer.formula.{get_solver(q_max, solver)}.q{q_max}.t{t_max}'
+                if name in results:
+                    continue
+                seconds = measure(lambda: optimal_limit_order_formula(
+                    q_max=q_max, t_max=t_max, solver=solver,
+                    **MODEL_PARAMETERS), repeat)
+                results[name] = (seconds, SECONDS)
+    for q_max in large_q_maxs:
+        seconds = measure(lambda: optimal_limit_order_surface(
+            q_max=q_max, t_max=300, time_steps=301, solver=LOG_SPACE_SOLVER,
+            **MODEL_PARAMETERS), repeat)
+        results[f'pricer.surface.log_space.q{q_max}.t300'] = (seconds, SECONDS)
+        seconds = measure(lambda: optimal_limit_order_formula(
+            q_max=q_max, t_max=300, **MODEL_PARAMETERS), repeat)
+        results[f'pricer.formula.asymptotic.q{q_max}.t300'] = (seconds, SECONDS)
+    get_optimal_quote(stem, 1, 1, parameters=EXECUTION_PARAMETERS)
+    seconds = measure(lambda: get_optimal_quote(
+        stem, 10, 150, parameters=EXECUTION_PARAMETERS), repeat)
+    results['pricer.surface_lookup'] = (seconds, SECONDS)
+    return results
+
+
+def benchmark_estimators(rows, tick_size, repeat):
+    quotes = get_synthetic_quotes(rows, tick_size)
+    trades = get_synthetic_trades(rows, tick_size, seed=1)
+    average_trading_size = get_average_trading_size(trades)
+    b = get_cost_per_share(quotes, tick_size)
+    estimators = {
+        'average_trading_size': (lambda: get_average_trading_size(trades), rows),
+        'volatility': (lambda: get_volatility(quotes, tick_size), rows),
+        'cost_per_share': (lambda: get_cost_per_share(quotes, tick_size), rows),
+        'arrival_rate': (lambda: get_arrival_rate(
+            quotes, trades, tick_size, average_trading_size, b), 2 * rows),
+        'day_ticks': (lambda: get_day_estimators(
+            DayTicks.from_frames(quotes, trades), tick_size), 2 * rows),
+    }
+    return {f'estimators.{name}': (number_of_rows / measure(function, repeat), ROWS_PER_SECOND)
+            for name, (function, number_of_rows) in estimators.items()}
+
+
+def benchmark_reconciliation(number_of_positions, repeat):
+    """
+    orders.reconcile end to end with broker positions served by a FakeIB
+    and strategy positions split across STRATEGIES in in-memory frames in
+    place of Google Drive, downloading every strategy or reading the cached
+    snapshots.
+    """
+    ib, airflow_positions = get_synthetic_positions(number_of_positions)
+    tickers = sorted(airflow_positions)
+    frames = {}
+    for i, strategy in enumerate(orders.STRATEGIES):
+        positions = {ticker: airflow_positions[ticker]
+                     for ticker in tickers[i::len(orders.STRATEGIES)]}
+        frames[strategy] = pd.DataFrame([{'Date': '2020-05-04', **positions}])
+
+    def get_positions(strategy):
+        return frames[strategy]
+
+    def get_ib_positions():
+        return [serialize_position(position) for position in ib.positions()]
+
+    def reconcile(refresh):
+        with redirect_stdout(io.StringIO()), redirect_stderr(io.StringIO()):
+            orders.reconcile(refresh)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as directory, \
+            mock.patch.object(orders, 'POSITIONS_DIRECTORY', directory), \
+            mock.patch.object(orders, 'get_positions', get_positions), \
+            mock.patch.object(orders, 'get_ib_positions', get_ib_positions):
+        for name, refresh in [('refresh', True), ('cached', False)]:
+            seconds = measure(lambda: reconcile(refresh), repeat)
+            results[f'reconciliation.{name}.n{number_of_positions}'] = (seconds, SECONDS)
+    return results
+
+
+def get_metadata():
+    return {
+        'date': datetime.now().isoformat(timespec='seconds'),
+        'python': sys.version.split(' ')[0],
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+    }
+
+
+def run_suite(quick=False, stem='ES'):
+    repeat = 3 if quick else 5
+    results = {}
+    results.update(benchmark_pricer(
+        q_maxs=[1, 5] if quick else [1, 5, 10, 20],
+        t_maxs=[60, 300] if quick else [60, 300, 900],
+        solvers=['odeint', 'expm'],
+        large_q_maxs=[200] if quick else [200, 1000],
+        stem=stem, repeat=repeat))
+    results.update(benchmark_estimators(
+        rows=20000 if quick else 200000, tick_size=0.25, repeat=repeat))
+    for number_of_positions in [100] if quick else [100, 1000]:
+        results.update(benchmark_reconciliation(number_of_positions, repeat))
+    return {
+        'metadata': get_metadata(),
+        'results': {name: {'value': value, 'unit': unit}
+                    for name, (value, unit) in results.items()},
+    }
+
+
+def save_baseline(baseline, path):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(baseline, f, indent=2, sort_keys=True)
+
+
+def load_baseline(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare(baseline, current, tolerance=DEFAULT_TOLERANCE):
+    """
+    Relative change of every benchmark present in both runs, positive being
+    slower. A benchmark regresses when it is slower by more than tolerance.
+    """
+    rows = []
+    for name, result in sorted(current['results'].items()):
+        reference = baseline['results'].get(name)
+        if reference is None:
+            continue
+        ratio = result['value'] / reference['value']
+        change = 1 / ratio - 1 if result['unit'] == ROWS_PER_SECOND else ratio - 1
+        rows.append({
+            'benchmark': name,
+            'unit': result['unit'],
+            'baseline': reference['value'],
+            'current': result['value'],
+            'change': change,
+            'regression': change > tolerance,
+        })
+    return pd.DataFrame(rows)
+
+
+@click.command()
+@click.option('--quick', is_flag=True, default=False)
+@click.option('--stem', default='ES')
+@click.option('--save', default=None, help='Write the results as a baseline')
+@click.option('--compare', 'baseline_path', default=None, help='Baseline to compare against')
+@click.option('--tolerance', default=DEFAULT_TOLERANCE)
+def main(quick, stem, save, baseline_path, tolerance):
+    current = run_suite(quick=quick, stem=stem)
+    for name, result in sorted(current['results'].items()):
+        print(f'{name}: {result["value"]:.6g} {result["unit"]}')
+    if save:
+        save_baseline(current, save)
+        print(f'baseline saved to {save}')
+    if baseline_path:
+        comparison = compare(load_baseline(baseline_path), current, tolerance)
+        with pd.option_context('display.width', 200, 'display.max_rows', None):
+            print(comparison.to_string(index=False))
+        if comparison['regression'].any():
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()  # pylint: disable=no-value-for-parameter
@@ -0,0 +1,104 @@
+import numpy as np
+import pandas as pd
+from ib_insync import Future
+
+from common.data.constants import FUTURES
+from common.execution.brokers.fake_ib import FakeIB
+from common.execution.symbology import get_prefix
+
+MONTHS = ['F', 'G', 'H', 'J', 'K', 'M', 'N', 'Q', 'U', 'V', 'X', 'Z']
+SESSION_START = pd.Timestamp('2020-05-04 13:30:00')
+SESSION_SECONDS = 6.5 * 3600
+
+
+def _get_index(random, number_of_rows):
+    return pd.DatetimeIndex(SESSION_START + pd.to_timedelta(
+        np.sort(random.uniform(0, SESSION_SECONDS, number_of_rows)), unit='s'))
+
+
+def _get_mid(random, number_of_rows, tick_size):
+    return 3000 + tick_size * np.cumsum(random.choice([-1, 0, 1], number_of_rows))
+
+
+def get_synthetic_quotes(number_of_rows, tick_size=0.25, seed=0):
+    """
+    TAQ-like quotes as downloaded from Eikon: a one tick wide book around a
+    random walk mid.
+    """
+    random = np.random.default_rng(seed)
+    index = _get_index(random, number_of_rows)
+    mid = _get_mid(random, number_of_rows, tick_size)
+    return pd.DataFrame({
+        'BID': mid - tick_size / 2,
+        'BIDSIZE': random.integers(1, 50, number_of_rows).astype(float),
+        'ASK': mid + tick_size / 2,
+        'ASKSIZE': random.integers(1, 50, number_of_rows).astype(float),
+    }, index=index)
+
+
+def get_synthetic_trades(number_of_rows, tick_size=0.25, seed=0):
+    """
+    TAS-like trades as downloaded from Eikon, printed on either side of a
+    random walk mid.
+    """
+    random = np.random.default_rng(seed)
+    index = _get_index(random, number_of_rows)
+    mid = _get_mid(random, number_of_rows, tick_size)
+    side = random.choice([-1, 1], number_of_rows)
+    return pd.DataFrame({
+        'TRDPRC_1': mid + side * tick_size / 2,
+        'COUNT': random.integers(1, 20, number_of_rows).astype(float),
+    }, index=index)
+
+
+def get_synthetic_trades_and_quotes(number_of_rows, tick_size=0.25, seed=0):
+    random = np.random.default_rng(seed)
+    index = _get_index(random, number_of_rows)
+    mid = _get_mid(random, number_of_rows, tick_size)
+    is_quote = random.uniform(size=number_of_rows) < 0.7
+    ask = np.where(is_quote, mid + tick_size / 2, np.nan)
+    bid = np.where(is_quote, mid - tick_size / 2, np.nan)
+    price = np.where(
+        is_quote, np.nan,
+        mid + tick_size * random.integers(-3, 12, number_of_rows))
+    count = np.where(is_quote, np.nan, random.integers(1, 20, number_of_rows))
+    return pd.DataFrame(
+        {'BID': bid, 'ASK': ask, 'TRDPRC_1': price, 'COUNT': count},
+        index=index)
+
+
+def get_synthetic_tickers(number_of_positions, seed=0):
+    """
+    Distinct futures local symbols such as ESM1, cycling through stems,
+    months and years. Only stems whose IB symbol is the RIC stem are used
+    so that both sides of the reconciliation map to the same key.
+    """
+    random = np.random.default_rng(seed)
+    stems = [stem for stem, future in FUTURES.items()
+             if future.get('Stem', {}).get('InteractiveBrokers') == stem
+             and get_prefix(stem) == '']
+    tickers = [f'{stem}{month}{year}' for year in range(10)
+               for month in MONTHS for stem in stems]
+    if number_of_positions > len(tickers):
+        raise ValueError(f'At most {len(tickers)} synthetic positions')
+    return [str(ticker) for ticker in
+            random.choice(tickers, number_of_positions, replace=False)]
+
+
+def get_synthetic_positions(number_of_positions, mismatch_ratio=0.1, seed=0):
+    """
+    Returns (ib, airflow_positions): a FakeIB holding one position per
+    ticker and the strategy positions per ticker, mismatch_ratio of them
+    differing from the broker.
+    """
+    random = np.random.default_rng(seed)
+    tickers = get_synthetic_tickers(number_of_positions, seed)
+    ib = FakeIB()
+    airflow_positions = {}
+    for con_id, ticker in enumerate(tickers, 1):
+        position = int(random.integers(1, 20)) * int(random.choice([-1, 1]))
+        contract = Future(symbol=ticker[:-2], localSymbol=ticker, conId=con_id)
+        ib.set_position(contract, position)
+        is_mismatch = random.uniform() < mismatch_ratio
+        airflow_positions[ticker] = position + (1 if is_mismatch else 0)
+    return ib, airflow_positions
@@ -0,0 +1,104 @@
+from datetime import date, datetime
+import json
+import os
+
+from ib_insync import Contract, Stock, util
+
+CONTRACTS_FILE = os.path.join(
+    os.path.expanduser('~'), '.cache', 'execution', 'contracts.json')
+
+
+def get_stock_contract(ticker):
+    return Stock(ticker, 'SMART', 'USD')
+
+
+def is_expired(contract, day=None):
+    expiry = contract.lastTradeDateOrContractMonth[:8]
+    if len(expiry) != 8:
+        return False
+    day = day or date.today()
+    return datetime.strptime(expiry, '%Y%m%d').date() < day
+
+
+class ContractRegistry():
+    """
+    Qualified contracts by ticker. Contracts are qualified once, kept in
+    memory and in a warm-start file; a contract past its last trade date is
+    evicted and qualified again so futures roll to the next expiry.
+    """
+
+    def __init__(self, ib, path=CONTRACTS_FILE, contract_factory=get_stock_contract):
+        self.ib = ib
+        self.path = path
+        self.contract_factory = contract_factory
+        self._contracts = {}
+        self._load()
+
+    def _load(self):
+        if self.path is None or not os.path.exists(self.path):
+            return
+        with open(self.path) as f:
+            for ticker, fields in json.load(f).items():
+                contract = Contract.create(**fields)
+                if not is_expired(contract):
+                    self._contracts[ticker] = contract
+
+    def _save(self):
+        if self.path is None:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        temporary_path = f'{self.path}.{os.getpid()}.tmp'
+        with open(temporary_path, 'w') as f:
+            json.dump({ticker: util.dataclassNonDefaults(contract)
+                       for ticker, contract in self._contracts.items()},
+                      f, indent=2, sort_keys=True)
+        os.replace(temporary_path, self.path)
+
+    def _get_missing(self, tickers):
+        today = date.today()
+        return [ticker for ticker in dict.fromkeys(tickers)
+                if ticker not in self._contracts
+                or is_expired(self._contracts[ticker], today)]
+
+    def _store(self, tickers, contracts):
+        for ticker, contract in zip(tickers, contracts):
+            self._contracts.pop(ticker, None)
+            if contract.conId:
+                self._contracts[ticker] = contract
+        self._save()
+
+    def _get_contracts(self, tickers):
+        return {ticker: self._contracts[ticker] for ticker in tickers
+                if ticker in self._contracts}
+
+    def qualify(self, tickers):
+        """
+        Qualify every ticker that is missing or expired in a single
+        qualifyContracts call and return the contracts by ticker.
+        """
+        missing = self._get_missing(tickers)
+        if len(missing) > 0:
+            contracts = [self.contract_factory(ticker) for ticker in missing]
+            self.ib.qualifyContracts(*contracts)
+            self._store(missing, contracts)
+        return self._get_contracts(tickers)
+
+    async def qualify_async(self, tickers):
+        missing = self._get_missing(tickers)
+        if len(missing) > 0:
+            contracts = [self.contract_factory(ticker) for ticker in missing]
+            await self.ib.qualifyContractsAsync(*contracts)
+            self._store(missing, contracts)
+        return self._get_contracts(tickers)
+
+    def get(self, ticker):
+        contract = self._contracts.get(ticker)
+        if contract is None or is_expired(contract):
+            contract = self.qualify([ticker]).get(ticker)
+        if contract is None:
+            raise ValueError(f'Contract {ticker} could not be qualified')
+        return contract
+
+    def evict(self, ticker):
+        if self._contracts.pop(ticker, None) is not None:
+            self._save()
@@ -0,0 +1,175 @@
+from datetime import datetime, timezone
+import itertools
+
+from ib_insync import (CommissionReport, Event, Execution, Fill,
+                       HistoricalTickBidAsk, OrderStatus, Position,
+                       TickAttribBidAsk, Ticker, Trade)
+
+
+class FakeIB():
+    """
+    In-memory stand-in for ib_insync.IB covering what InteractiveBrokers
+    uses. Quotes are pushed with set_quote and orders are filled with fill,
+    so that execution code can be exercised without TWS.
+    """
+
+    def __init__(self, account='FAKE'):
+        self.account = account
+        self.pendingTickersEvent = Event('pendingTickersEvent')
+        self.orderStatusEvent = Event('orderStatusEvent')
+        self.execDetailsEvent = Event('execDetailsEvent')
+        self.disconnectedEvent = Event('disconnectedEvent')
+        self.on_update = None
+        self.market_data_requests = 0
+        self.market_data_lines = {}
+        self.qualify_requests = 0
+        self._connected = False
+        self._con_ids = {}
+        self._tickers = {}
+        self._trades = []
+        self._positions = {}
+        self._order_ids = itertools.count(1)
+        self._exec_ids = itertools.count(1)
+
+    def connect(self, host='127.0.0.1', port=7497, clientId=1, **kwargs):
+        self._connected = True
+        return self
+
+    def disconnect(self):
+        self._connected = False
+        self.disconnectedEvent.emit()
+
+    def isConnected(self):
+        return self._connected
+
+    def qualifyContracts(self, *contracts):
+        self.qualify_requests += 1
+        for contract in contracts:
+            key = (contract.secType, contract.symbol,
+                   contract.lastTradeDateOrContractMonth)
+            if key not in self._con_ids:
+                self._con_ids[key] = len(self._con_ids) + 1
+            contract.conId = self._con_ids[key]
+            contract.localSymbol = contract.localSymbol or contract.symbol
+        return list(contracts)
+
+    async def qualifyContractsAsync(self, *contracts):
+        return self.qualifyContracts(*contracts)
+
+    def reqMktData(self, contract, genericTickList='', snapshot=False, regulatorySnapshot=False, mktDataOptions=None):
+        self.market_data_requests += 1
+        self.market_data_lines[contract.conId] = self.market_data_lines.get(contract.conId, 0) + 1
+        ticker = self._tickers.get(contract.conId)
+        if ticker is None:
+            ticker = Ticker(contract=contract)
+            self._tickers[contract.conId] = ticker
+        return ticker
+
+    def cancelMktData(self, contract):
+        lines = self.market_data_lines.get(contract.conId, 0)
+        if lines == 0:
+            raise ValueError(f'No market data line to cancel for {contract.conId}')
+        if lines == 1:
+            self.market_data_lines.pop(contract.conId)
+            self._tickers.pop(contract.conId, None)
+        else:
+            self.market_data_lines[contract.conId] = lines - 1
+
+    def set_quote(self, contract, bid, ask):
+        ticker = self._tickers.get(contract.conId)
+        if ticker is None:
+            ticker = Ticker(contract=contract)
+            self._tickers[contract.conId] = ticker
+        ticker.bid = bid
+        ticker.ask = ask
+        ticker.time = datetime.now(timezone.utc)
+        self.pendingTickersEvent.emit({ticker})
+
+    def reqHistoricalTicks(self, contract, startDateTime, endDateTime, numberOfTicks, whatToShow, useRth, ignoreSize=False, miscOptions=None):
+        self.market_data_requests += 1
+        ticker = self._tickers.get(contract.conId)
+        if ticker is None:
+            return []
+        return [HistoricalTickBidAsk(ticker.time, TickAttribBidAsk(),
+                                     ticker.bid, ticker.ask, 0, 0)]
+
+    def placeOrder(self, contract, order):
+        for trade in self._trades:
+            if trade.order is order:
+                self._emit_status(trade)
+                return trade
+        order.orderId = next(self._order_ids)
+        trade = Trade(contract=contract, order=order,
+                      orderStatus=OrderStatus(orderId=order.orderId,
+                                              status='Submitted',
+                                              remaining=order.totalQuantity))
+        self._trades.append(trade)
+        self._emit_status(trade)
+        return trade
+
+    def cancelOrder(self, order):
+        for trade in self._trades:
+            if trade.order is order and not trade.isDone():
+                trade.orderStatus.status = 'Cancelled'
+                self._emit_status(trade)
+                trade.cancelledEvent.emit(trade)
+                return trade
+
+    def fill(self, trade, quantity, price):
+        quantity = min(quantity, trade.order.totalQuantity - trade.orderStatus.filled)
+        status = trade.orderStatus
+        status.avgFillPrice = (status.avgFillPrice * status.filled +
+                               price * quantity) / (status.filled + quantity)
+        status.filled += quantity
+        status.remaining = trade.order.totalQuantity - status.filled
+        status.lastFillPrice = price
+        status.status = 'Filled' if status.remaining == 0 else 'Submitted'
+        side = 'BOT' if trade.order.action == 'BUY' else 'SLD'
+        execution = Execution(execId=str(next(self._exec_ids)),
+                              time=datetime.now(timezone.utc),
+                              acctNumber=self.account, side=side,
+                              shares=quantity, price=price,
+                              orderId=trade.order.orderId)
+        fill = Fill(trade.contract, execution, CommissionReport(), execution.time)
+        trade.fills.append(fill)
+        signed_quantity = quantity if trade.order.action == 'BUY' else -quantity
+        key = trade.contract.conId
+        position = self._positions.get(key)
+        self._positions[key] = Position(
+            self.account, trade.contract,
+            (position.position if position else 0) + signed_quantity, price)
+        self.execDetailsEvent.emit(trade, fill)
+        trade.fillEvent.emit(trade, fill)
+        self._emit_status(trade)
+        if trade.orderStatus.status == 'Filled':
+            trade.filledEvent.emit(trade)
+
+    def _emit_status(self, trade):
+        trade.statusEvent.emit(trade)
+        self.orderStatusEvent.emit(trade)
+
+    def set_position(self, contract, position, avg_cost=0):
+        self._positions[contract.conId] = Position(
+            self.account, contract, position, avg_cost)
+
+    def positions(self, account=''):
+        return [position for position in self._positions.values()
+                if position.position != 0]
+
+    def accountValues(self, account=''):
+        return []
+
+    def trades(self):
+        return list(self._trades)
+
+    def openTrades(self):
+        return [trade for trade in self._trades if not trade.isDone()]
+
+    def sleep(self, *args):
+        self.waitOnUpdate()
+        return True
+
+    def waitOnUpdate(self, timeout=0):
+        if self.on_update is not None:
+            self.on_update(self)
+        return True
@@ -1,9 +1,17 @@
 from ib_insync import *
+import asyncio
 from datetime import datetime
 import numpy as np
+import time
 
-from common.data.constants import SYMBOL_TO_RIC
-from common.execution.optimal_limit_order.pricer import get_optimal_quote
+from common.data.constants import FUTURES, SYMBOL_TO_RIC
+from common.data.database import ric_to_stem
+from common.execution.brokers.contracts import ContractRegistry
+from common.execution.brokers.latency import QUALIFY, LatencyRecorder
+from common.execution.brokers.market_data import MarketDataBook
+from common.execution.brokers.order_manager import LimitOrderManager, RepricingPolicy
+from common.execution.optimal_limit_order.pricer import get_quote_schedule
+from common.execution.session import EXECUTION_CLIENT_ID, get_ib
 
 PORT_PAPER = 7497
 PORT_LIVE = 7496
@@ -11,61 +19,145 @@ PORT_LIVE = 7496
 
 class InteractiveBrokers():
 
-    def __init__(self):
-        self.ib = IB()
-        self.ib.connect('127.0.0.1', PORT_LIVE, clientId=1)
+    def __init__(self, ib=None, tickers=None, repricing_policy=None, latency=None, contracts=None, latency_path=None):
+        """
+        latency_path : file the latency recorder is exported to after every
+        basket, Prometheus text for a .prom file and JSON otherwise
+        """
+        self.ib = ib or get_ib(EXECUTION_CLIENT_ID)
+        self.latency = latency or LatencyRecorder()
+        self.latency_path = latency_path
+        self.contracts = contracts or ContractRegistry(self.ib)
+        self.market_data = MarketDataBook(self.ib)
+        self.repricing_policy = repricing_policy or RepricingPolicy()
+        if tickers is not None:
+            self.contracts.qualify(tickers)
 
     def submit_market_order(self, ticker=None, size=0):
-        contract = self._get_contact(ticker)
+        timeline = self.latency.start_order(ticker)
+        with timeline.time(QUALIFY):
+            contract = self._get_contact(ticker)
         action = self._get_action(size)
         abs_quantity = np.abs(size)
         market_order = MarketOrder(action=action,
                                    totalQuantity=abs_quantity)
-        market_trade = self.ib.placeOrder(contract, market_order)
+        market_trade = timeline.place_order(self.ib, contract, market_order)
         self.ib.sleep(1)
         assert market_trade.orderStatus.status == 'Submitted'
         while not market_trade.isDone():
             self.ib.waitOnUpdate()
+        timeline.complete()
         print(self.ib.positions())
 
-    def submit_limit_order(self, ticker=None, size=0, time_in_seconds=300):
-        contract = self._get_contact(ticker)
-        action = self._get_action(size)
-        abs_quantity = np.abs(size)
-        limit_order = None
-        limit_trade = None
-        for t in np.linspace(300, 0, 6):
-            bid, ask = self._get_bid_ask(contract)
-            if limit_trade is not None:
-                if abs_quantity == limit_trade.orderStatus.filled:
-                    break
-                abs_quantity -= limit_trade.orderStatus.filled
-            ric = SYMBOL_TO_RIC[ticker]
-            delta_quote = get_optimal_quote(
-                ric=ric, quantity=abs_quantity, time_in_seconds=int(t))
-            limit_price = bid - delta_quote if action == 'BUY' else ask + delta_quote
-            if limit_order is None:
-                limit_order = LimitOrder(action, abs_quantity, limit_price)
-                limit_trade = self.ib.placeOrder(contract, limit_order)
-            else:
-                limit_order.lmtPrice = limit_price
-            limit_trade = self.ib.placeOrder(contract, limit_order)
-            self.ib.sleep(1)
-            assert limit_trade.orderStatus.status == 'Submitted'
-            assert limit_trade in ib.openTrades()
-        while not limit_trade.isDone():
-            self.ib.waitOnUpdate()
+    def submit_limit_order(self, ticker=None, size=0, time_in_seconds=300, policy=None):
+        util.run(self.submit_limit_order_async(
+            ticker, size, time_in_seconds, policy=policy))
         print(self.ib.positions())
 
+    async def submit_limit_order_async(self, ticker=None, size=0, time_in_seconds=300, policy=None, stem=None):
+        """
+        Work a limit order over time_in_seconds with a LimitOrderManager and
+        return its fill report. stem defaults to the one of SYMBOL_TO_RIC.
+        """
+        start = time.monotonic()
+        if size == 0:
+            return {
+                'ticker': ticker,
+                'action': self._get_action(size),
+                'quantity': 0,
+                'filled': 0,
+                'average_price': None,
+                'status': 'Filled',
+                'seconds': 0,
+                'repricings': {},
+            }
+        timeline = self.latency.start_order(ticker)
+        with timeline.time(QUALIFY):
+            contract = (await self.contracts.qualify_async([ticker]))[ticker]
+        stem = stem or self._get_stem(ticker)
+        schedule = get_quote_schedule(
+            stem=stem, quantity=np.abs(size), time_in_seconds=time_in_seconds)
+
+        manager = LimitOrderManager(
+            self.ib, self.market_data, contract,
+            action=self._get_action(size),
+            quantity=np.abs(size),
+            time_in_seconds=time_in_seconds,
+            get_quote=schedule.get_quote,
+            tick_size=FUTURES[stem]['TickSize'],
+            policy=policy or self.repricing_policy,
+            timeline=timeline)
+        with self.market_data.subscription(contract):
+            limit_trade = await manager.run()
+        timeline.complete()
+        report = self._get_fill_report(ticker, limit_trade, start)
+        report['repricings'] = manager.repricings
+        return report
+
+    async def execute_basket_async(self, sizes, time_in_seconds=300, stems=None):
+        """
+        sizes : {ticker: signed quantity}
+        stems : {ticker: stem} for tickers missing from SYMBOL_TO_RIC
+
+        Work all limit orders concurrently on the same connection and return
+        one fill report per ticker.
+        """
+        tickers = [ticker for ticker, size in sizes.items() if size != 0]
+        with self.latency.time(QUALIFY):
+            await self.contracts.qualify_async(tickers)
+        results = await asyncio.gather(
+            *[self.submit_limit_order_async(ticker, sizes[ticker], time_in_seconds,
+                                            stem=(stems or {}).get(ticker))
+              for ticker in tickers],
+            return_exceptions=True)
+        reports = []
+        for ticker, result in zip(tickers, results):
+            if isinstance(result, Exception):
+                result = {
+                    'ticker': ticker,
+                    'action': self._get_action(sizes[ticker]),
+                    'quantity': np.abs(sizes[ticker]),
+                    'filled': 0,
+                    'average_price': None,
+                    'status': 'Error',
+                    'seconds': None,
+                    'error': repr(result),
+                }
+            reports.append(result)
+        if self.latency_path is not None:
+            self.latency.write(self.latency_path)
+        return reports
+
+    def execute_basket(self, sizes, time_in_seconds=300, stems=None):
+        return util.run(self.execute_basket_async(sizes, time_in_seconds, stems))
+
+    def _get_fill_report(self, ticker, trade, start):
+        status = trade.orderStatus
+        return {
+            'ticker': ticker,
+            'action': trade.order.action,
+            'quantity': trade.order.totalQuantity,
+            'filled': status.filled,
+            'average_price': status.avgFillPrice if status.filled else None,
+            'status': status.status,
+            'seconds': time.monotonic() - start,
+        }
+
+    def _get_stem(self, ticker):
+        return ric_to_stem(SYMBOL_TO_RIC[ticker])
+
     def _get_contact(self, ticker):
-        contract = Stock(ticker, 'SMART', 'USD')
-        self.ib.qualifyContracts(contract)
-        return contract
+        return self.contracts.get(ticker)
 
     def _get_action(self, size):
         return 'BUY' if size > 0 else 'SELL'
 
     def _get_bid_ask(self, contract):
+        if self.market_data.is_subscribed(contract):
+            return self.market_data.get_bid_ask(contract)
+        return self._get_historical_bid_ask(contract)
+
+    def _get_historical_bid_ask(self, contract):
         start = ''
         end = datetime.now()
         number_of_ticks = 10
@@ -74,7 +166,7 @@ class InteractiveBrokers():
         return ticks[-1].priceBid, ticks[-1].priceAsk
 
     def __del__(self):
-        self.ib.disconnect()
+        self.market_data.close()
 
 
 if __name__ == '__main__':
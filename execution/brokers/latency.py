@@ -0,0 +1,216 @@
+import bisect
+from collections import deque
+from contextlib import contextmanager
+import json
+import math
+import os
+import time
+
+QUALIFY = 'qualify'
+QUOTE = 'quote'
+PRICE = 'price'
+PLACE_ORDER = 'place_order'
+ACK = 'ack'
+FILL = 'fill'
+COMPLETE = 'complete'
+STEPS = [QUALIFY, QUOTE, PRICE, PLACE_ORDER, ACK, FILL, COMPLETE]
+
+BUCKETS = [0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+           0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600]
+ACKNOWLEDGED_STATUSES = {'PreSubmitted', 'Submitted', 'Filled'}
+METRIC_NAME = 'execution_order_lifecycle_seconds'
+MAXIMUM_TIMELINES = 1000
+PROMETHEUS_EXTENSION = '.prom'
+
+
+class Histogram():
+    """
+    Fixed bucket histogram of durations in seconds, Prometheus style:
+    counts[i] is the number of observations in (buckets[i-1], buckets[i]]
+    and the last count holds everything above the last bucket.
+    """
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        self.min = min(self.min, seconds)
+        self.max = max(self.max, seconds)
+
+    def get_cumulative_counts(self):
+        cumulative_counts = []
+        total = 0
+        for count in self.counts:
+            total += count
+            cumulative_counts.append(total)
+        return cumulative_counts
+
+    def get_quantile(self, quantile):
+        """
+        Upper bound of the bucket holding the quantile, capped by the
+        largest observation.
+        """
+        if self.count == 0:
+            return None
+        rank = quantile * self.count
+        for bound, cumulative_count in zip(self.buckets, self.get_cumulative_counts()):
+            if cumulative_count >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'min': self.min if self.count else None,
+            'max': self.max if self.count else None,
+            'mean': self.sum / self.count if self.count else None,
+            'p50': self.get_quantile(0.5),
+            'p90': self.get_quantile(0.9),
+            'p99': self.get_quantile(0.99),
+            'buckets': dict(zip([*map(str, self.buckets), '+Inf'],
+                                self.get_cumulative_counts())),
+        }
+
+
+class OrderTimeline():
+    """
+    Lifecycle of one order: every step is observed in the recorder and
+    timestamped relative to the start of the order. Acks and fills are
+    measured from the placeOrder call they answer, completion from the
+    start of the order.
+    """
+
+    def __init__(self, recorder, name):
+        self.recorder = recorder
+        self.name = name
+        self.start = time.perf_counter()
+        self.events = []
+        self.trade = None
+        self._placed = None
+        self._is_awaiting_ack = False
+
+    def record(self, step, seconds):
+        self.recorder.observe(step, seconds)
+        self.events.append((step, time.perf_counter() - self.start, seconds))
+
+    @contextmanager
+    def time(self, step):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(step, time.perf_counter() - start)
+
+    def place_order(self, ib, contract, order):
+        self._placed = time.perf_counter()
+        self._is_awaiting_ack = True
+        trade = ib.placeOrder(contract, order)
+        self.record(PLACE_ORDER, time.perf_counter() - self._placed)
+        if self.trade is None:
+            self.trade = trade
+            trade.statusEvent += self._on_status
+            trade.fillEvent += self._on_fill
+            self._on_status(trade)
+        return trade
+
+    def _on_status(self, trade):
+        if self._is_awaiting_ack and trade.orderStatus.status in ACKNOWLEDGED_STATUSES:
+            self._is_awaiting_ack = False
+            self.record(ACK, time.perf_counter() - self._placed)
+
+    def _on_fill(self, trade, fill):
+        self.record(FILL, time.perf_counter() - self._placed)
+
+    def complete(self):
+        self.record(COMPLETE, time.perf_counter() - self.start)
+        if self.trade is not None:
+            self.trade.statusEvent -= self._on_status
+            self.trade.fillEvent -= self._on_fill
+        self.recorder.timelines.append(self.to_dict())
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'events': [{'step': step, 'at': at, 'seconds': seconds}
+                       for step, at, seconds in self.events],
+        }
+
+
+class LatencyRecorder():
+    """
+    In-memory histograms of order lifecycle step durations and the
+    timelines of the last completed orders, exportable as Prometheus text
+    or JSON.
+    """
+
+    def __init__(self, buckets=BUCKETS, maximum_timelines=MAXIMUM_TIMELINES):
+        self.histograms = {step: Histogram(buckets) for step in STEPS}
+        self.timelines = deque(maxlen=maximum_timelines)
+
+    def observe(self, step, seconds):
+        self.histograms[step].observe(seconds)
+
+    @contextmanager
+    def time(self, step):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(step, time.perf_counter() - start)
+
+    def start_order(self, name):
+        return OrderTimeline(self, name)
+
+    def to_prometheus(self, metric_name=METRIC_NAME):
+        lines = [
+            f'# HELP {metric_name} Duration of order lifecycle steps.',
+            f'# TYPE {metric_name} histogram',
+        ]
+        for step, histogram in self.histograms.items():
+            bounds = [*map(str, histogram.buckets), '+Inf']
+            for bound, count in zip(bounds, histogram.get_cumulative_counts()):
+                lines.append(f'{metric_name}_bucket{{step="{step}",le="{bound}"}} {count}')
+            lines.append(f'{metric_name}_sum{{step="{step}"}} {histogram.sum}')
+            lines.append(f'{metric_name}_count{{step="{step}"}} {histogram.count}')
+        return '\n'.join(lines) + '\n'
+
+    def to_dict(self):
+        return {
+            'steps': {step: histogram.to_dict()
+                      for step, histogram in self.histograms.items()},
+            'timelines': list(self.timelines),
+        }
+
+    def write_prometheus(self, path):
+        _write_atomically(path, self.to_prometheus())
+
+    def write_json(self, path):
+        _write_atomically(path, json.dumps(self.to_dict(), indent=2))
+
+    def write(self, path):
+        """
+        Export to path, as Prometheus text for a .prom file and JSON otherwise.
+        """
+        if path.endswith(PROMETHEUS_EXTENSION):
+            self.write_prometheus(path)
+        else:
+            self.write_json(path)
+
+
+def _write_atomically(path, text):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temporary_path = f'{path}.{os.getpid()}.tmp'
+    with open(temporary_path, 'w') as f:
+        f.write(text)
+    os.replace(temporary_path, path)
@@ -0,0 +1,111 @@
+import asyncio
+from contextlib import contextmanager
+import math
+import time
+
+
+def _is_valid_price(price):
+    return price is not None and not math.isnan(price) and price != -1
+
+
+class MarketDataBook():
+    """
+    Latest top of book per contract, kept up to date by live reqMktData
+    subscriptions. Subscriptions are reference counted so that several
+    orders on the same contract share one market data line.
+    """
+
+    def __init__(self, ib, quote_timeout=5):
+        self.ib = ib
+        self.quote_timeout = quote_timeout
+        self._tickers = {}
+        self._reference_counts = {}
+        self._quotes = {}
+        self.ib.pendingTickersEvent += self._on_pending_tickers
+
+    def subscribe(self, contract):
+        key = contract.conId
+        count = self._reference_counts.get(key, 0)
+        if count == 0:
+            ticker = self.ib.reqMktData(contract, '', False, False)
+            self._tickers[key] = ticker
+            self._update(ticker)
+        self._reference_counts[key] = count + 1
+
+    def unsubscribe(self, contract):
+        key = contract.conId
+        count = self._reference_counts.get(key, 0)
+        if count > 1:
+            self._reference_counts[key] = count - 1
+            return
+        if count == 1:
+            self.ib.cancelMktData(contract)
+        self._reference_counts.pop(key, None)
+        self._tickers.pop(key, None)
+        self._quotes.pop(key, None)
+
+    @contextmanager
+    def subscription(self, contract):
+        self.subscribe(contract)
+        try:
+            yield
+        finally:
+            self.unsubscribe(contract)
+
+    def is_subscribed(self, contract):
+        return contract.conId in self._reference_counts
+
+    def get_quote(self, contract):
+        """
+        (bid, ask, time) of a subscribed contract, waiting at most
+        quote_timeout seconds for the first quote after subscribing.
+        """
+        key = contract.conId
+        deadline = time.monotonic() + self.quote_timeout
+        while key not in self._quotes:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError(f'No quote received for {contract.localSymbol or contract.symbol}')
+            self.ib.waitOnUpdate(timeout=remaining)
+        return self._quotes[key]
+
+    def get_latest_quote(self, contract):
+        return self._quotes.get(contract.conId)
+
+    def get_bid_ask(self, contract):
+        bid, ask, _ = self.get_quote(contract)
+        return bid, ask
+
+    async def get_quote_async(self, contract):
+        key = contract.conId
+        deadline = time.monotonic() + self.quote_timeout
+        while key not in self._quotes:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError(f'No quote received for {contract.localSymbol or contract.symbol}')
+            try:
+                await asyncio.wait_for(self.ib.pendingTickersEvent, remaining)
+            except asyncio.TimeoutError:
+                pass
+        return self._quotes[key]
+
+    async def get_bid_ask_async(self, contract):
+        bid, ask, _ = await self.get_quote_async(contract)
+        return bid, ask
+
+    def _on_pending_tickers(self, tickers):
+        for ticker in tickers:
+            if ticker.contract.conId in self._tickers:
+                self._update(ticker)
+
+    def _update(self, ticker):
+        if _is_valid_price(ticker.bid) and _is_valid_price(ticker.ask):
+            self._quotes[ticker.contract.conId] = (ticker.bid, ticker.ask, ticker.time)
+
+    def close(self):
+        for ticker in list(self._tickers.values()):
+            self.ib.cancelMktData(ticker.contract)
+        self._tickers.clear()
+        self._reference_counts.clear()
+        self._quotes.clear()
+        self.ib.pendingTickersEvent -= self._on_pending_tickers
@@ -0,0 +1,177 @@
+import asyncio
+import math
+import time
+
+from ib_insync import LimitOrder
+
+from common.execution.brokers.latency import PRICE, QUOTE as QUOTE_FETCH, LatencyRecorder
+
+QUOTE = 'quote'
+FILL = 'fill'
+DECAY = 'decay'
+
+
+class RepricingPolicy():
+    """
+    quote_threshold : move of the mid in ticks since the last repricing that triggers a new one
+    decay_interval : seconds between two re-evaluations of the optimal quote as time to go decreases
+    minimum_intervals : minimum seconds between two repricings caused by the same trigger
+    cancel_after : seconds the order keeps working after the deadline before being cancelled
+    """
+
+    def __init__(self, quote_threshold=1, decay_interval=10, minimum_intervals=None, cancel_after=60):
+        self.quote_threshold = quote_threshold
+        self.decay_interval = decay_interval
+        self.cancel_after = cancel_after
+        self.minimum_intervals = {
+            QUOTE: 1,
+            FILL: 0.5,
+            DECAY: 5,
+            **(minimum_intervals or {}),
+        }
+
+
+def round_to_tick(price, tick_size, action):
+    ticks = price / tick_size
+    ticks = math.floor(ticks + 1e-9) if action == 'BUY' else math.ceil(ticks - 1e-9)
+    return round(ticks * tick_size, 10)
+
+
+class LimitOrderManager():
+    """
+    Works one parent limit order and reprices it when the top of book moves,
+    when it gets filled or when the optimal quote decays with time to go,
+    each trigger being rate limited by the policy. At the deadline the
+    order is repriced with zero time to go and keeps following the top of
+    book and fills for policy.cancel_after seconds, after which the rest is
+    cancelled.
+
+    get_quote(quantity, time_in_seconds) returns the optimal distance to
+    the touch in price units. Lifecycle steps are recorded in timeline,
+    completed by the caller.
+    """
+
+    def __init__(self, ib, market_data, contract, action, quantity, time_in_seconds, get_quote, tick_size, policy=None, timeline=None):
+        self.ib = ib
+        self.market_data = market_data
+        self.contract = contract
+        self.action = action
+        self.quantity = quantity
+        self.time_in_seconds = time_in_seconds
+        self.get_quote = get_quote
+        self.tick_size = tick_size
+        self.policy = policy or RepricingPolicy()
+        self.timeline = timeline or LatencyRecorder().start_order(contract.localSymbol)
+        self.order = None
+        self.trade = None
+        self.repricings = {QUOTE: 0, FILL: 0, DECAY: 0}
+        self._start = None
+        self._priced_mid = None
+        self._last_repricings = {QUOTE: -math.inf, FILL: -math.inf, DECAY: -math.inf}
+        self._queue = None
+
+    def _get_time_to_go(self):
+        return max(self.time_in_seconds - (time.monotonic() - self._start), 0)
+
+    def _reprice(self, time_to_go):
+        quote = self.market_data.get_latest_quote(self.contract)
+        if quote is None:
+            return
+        bid, ask, _ = quote
+        filled = self.trade.orderStatus.filled if self.trade else 0
+        remaining = self.quantity - filled
+        if remaining <= 0:
+            return
+        with self.timeline.time(PRICE):
+            delta_quote = self.get_quote(remaining, time_to_go)
+        price = bid - delta_quote if self.action == 'BUY' else ask + delta_quote
+        price = round_to_tick(price, self.tick_size, self.action)
+        self._priced_mid = (bid + ask) / 2
+        if self.order is None:
+            self.order = LimitOrder(self.action, self.quantity, price)
+        elif self.order.lmtPrice == price:
+            return
+        else:
+            self.order.lmtPrice = price
+        self.trade = self.timeline.place_order(self.ib, self.contract, self.order)
+
+    def _on_pending_tickers(self, tickers):
+        if self._priced_mid is None:
+            return
+        quote = self.market_data.get_latest_quote(self.contract)
+        if quote is None:
+            return
+        mid = (quote[0] + quote[1]) / 2
+        if abs(mid - self._priced_mid) >= self.policy.quote_threshold * self.tick_size:
+            self._queue.put_nowait(QUOTE)
+
+    def _on_fill(self, trade, fill):
+        self._queue.put_nowait(FILL)
+
+    def _get_timeout(self, pending, next_decay):
+        now = time.monotonic()
+        deadline = self._start + self.time_in_seconds
+        if now >= deadline:
+            deadline += self.policy.cancel_after
+        deadlines = [next_decay, deadline]
+        for trigger in pending:
+            deadlines.append(self._last_repricings[trigger] +
+                             self.policy.minimum_intervals[trigger])
+        return max(min(deadlines) - now, 0)
+
+    async def run(self):
+        """
+        Work the order until done and return its trade, None for a zero
+        quantity as no order is placed.
+        """
+        if self.quantity <= 0:
+            return None
+        self._start = time.monotonic()
+        self._queue = asyncio.Queue()
+        with self.timeline.time(QUOTE_FETCH):
+            await self.market_data.get_quote_async(self.contract)
+        self.ib.pendingTickersEvent += self._on_pending_tickers
+        try:
+            self._reprice(self._get_time_to_go())
+            self.trade.fillEvent += self._on_fill
+            pending = set()
+            next_decay = self._start + self.policy.decay_interval
+            deadline = self._start + self.time_in_seconds
+            expired = False
+            while not self.trade.isDone() and \
+                    time.monotonic() < deadline + self.policy.cancel_after:
+                try:
+                    trigger = await asyncio.wait_for(
+                        self._queue.get(), self._get_timeout(pending, next_decay))
+                    pending.add(trigger)
+                except asyncio.TimeoutError:
+                    pass
+                now = time.monotonic()
+                if not expired and now >= deadline:
+                    expired = True
+                    next_decay = math.inf
+                    if not self.trade.isDone():
+                        self._reprice(0)
+                    continue
+                if now >= next_decay:
+                    pending.add(DECAY)
+                    next_decay = now + self.policy.decay_interval
+                eligible = [trigger for trigger in pending
+                            if now - self._last_repricings[trigger] >=
+                            self.policy.minimum_intervals[trigger]]
+                if len(eligible) == 0 or self.trade.isDone():
+                    continue
+                self._reprice(self._get_time_to_go())
+                for trigger in eligible:
+                    self._last_repricings[trigger] = now
+                    self.repricings[trigger] += 1
+                pending.clear()
+            if not self.trade.isDone():
+                self.ib.cancelOrder(self.order)
+            while not self.trade.isDone():
+                await self.trade.statusEvent
+        finally:
+            self.ib.pendingTickersEvent -= self._on_pending_tickers
+            if self.trade is not None:
+                self.trade.fillEvent -= self._on_fill
+        return self.trade
@@ -1,61 +1,359 @@
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from datetime import date, datetime, time, timedelta, timezone
+import json
+import os
+import shutil
+import threading
+import time as clock
+
+import click
+import pandas as pd
 from tqdm import tqdm
 
 from common.data.constants import CRYPTOCURRENCIES
-from common.data.bitfinex import get_public_trades
+from common.data.database import json_data_to_df
+from common.data.bitfinex import convert_bitfinex_trades, get_public_trades
+from common.execution.optimal_limit_order.tick_store import QUOTES, TRADES, has_ticks, write_ticks
 from ....eikon import get_timeseries
 
+DOWNLOAD_DIRECTORY = os.path.join(
+    os.path.expanduser('~'), '.cache', 'execution', 'downloads')
+DEFAULT_WORKERS = 8
+EIKON_REQUESTS_PER_SECOND = 5
+BITFINEX_REQUESTS_PER_SECOND = 1
+MAX_RETRIES = 5
+BACKOFF_SECONDS = 1
+EIKON_ROW_LIMIT = 50000
+BITFINEX_ROW_LIMIT = 10000
+# Eikon end dates are inclusive
+EIKON_RESOLUTION = timedelta(microseconds=1)
+INITIAL_WINDOW = timedelta(hours=1)
+MINIMUM_WINDOW = timedelta(seconds=1)
+MAXIMUM_WINDOW = timedelta(days=1)
+SPARSE_FILL_RATIO = 0.25
+PROGRESS_SECONDS = 1
+
+
+class RateLimiter():
+
+    def __init__(self, requests_per_second):
+        self.interval = 1 / requests_per_second
+        self._next_time = 0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            now = clock.monotonic()
+            wait = self._next_time - now
+            self._next_time = max(now, self._next_time) + self.interval
+        if wait > 0:
+            clock.sleep(wait)
+
+
+RATE_LIMITERS = {
+    'eikon': RateLimiter(EIKON_REQUESTS_PER_SECOND),
+    'bitfinex': RateLimiter(BITFINEX_REQUESTS_PER_SECOND),
+}
+
+
+class DownloadManifest():
+    """
+    Progress of the days being downloaded and stored days, saved after
+    every update so that an interrupted download resumes where it stopped.
+    rows and windows count what was fetched since it was opened.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.rows = 0
+        self.windows = 0
+        self._lock = threading.Lock()
+        self._done = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                self._done = json.load(f)
+
+    def is_done(self, key):
+        return key in self._done
+
+    def get(self, key):
+        return self._done.get(key)
+
+    def mark_done(self, key, value):
+        with self._lock:
+            self._done[key] = value
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            temporary_path = f'{self.path}.tmp'
+            with open(temporary_path, 'w') as f:
+                json.dump(self._done, f)
+            os.replace(temporary_path, self.path)
+
+    def mark_window_done(self, key, window_end, rows):
+        """
+        Move the cursor key past a completed window of rows.
+        """
+        with self._lock:
+            self.rows += rows
+            self.windows += 1
+        self.mark_done(key, window_end.isoformat())
+
+
+def _get_day_key(kind, ric, day):
+    return f'{kind}/{ric}/{day.isoformat()}'
+
+
+def _get_cursor_key(kind, ric, day):
+    return f'{_get_day_key(kind, ric, day)}/cursor'
+
+
+def _get_staging_directory(kind, ric, day):
+    return os.path.join(DOWNLOAD_DIRECTORY, 'staging', kind, ric, day.isoformat())
+
+
+def _get_window_path(kind, ric, day, start):
+    return os.path.join(_get_staging_directory(kind, ric, day), f'{start:%H%M%S%f}.pkl')
+
+
+def _to_naive_utc(timestamp):
+    timestamp = pd.Timestamp(timestamp)
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.tz_convert('UTC').tz_localize(None)
+    return timestamp.to_pydatetime()
+
+
+def _get_eikon_timeseries(ric, fields, interval, start, end):
+    RATE_LIMITERS['eikon'].acquire()
+    r = get_timeseries(rics=ric,
+                       fields=fields,
+                       start_date=start.isoformat(),
+                       end_date=(end - EIKON_RESOLUTION).isoformat(),
+                       interval=interval)
+    if r['error'] is not None:
+        raise Exception(f'Eikon {ric} {start} - {end}: {r["error"]}')
+    # A window without rows is a response without error nor data
+    if not r['data']:
+        return None
+    return json_data_to_df(r['data'])
+
+
+def fetch_quotes(ric, start, end):
+    """
+    Quotes of ric in [start, end), naive UTC datetimes.
+    """
+    return _get_eikon_timeseries(ric, ['BID', 'BIDSIZE', 'ASK', 'ASKSIZE'], 'taq', start, end)
+
+
+def fetch_trades(ric, start, end):
+    """
+    Trades of ric in [start, end), naive UTC datetimes, from Bitfinex for
+    cryptocurrencies and Eikon otherwise.
+    """
+    if ric not in CRYPTOCURRENCIES:
+        return _get_eikon_timeseries(ric, ['TRDPRC_1', 'COUNT'], 'tas', start, end)
+    ticker = ric.replace('=', '')
+    symbol = f't{ticker}USD'
+    RATE_LIMITERS['bitfinex'].acquire()
+    trades_list = get_public_trades(
+        symbol=symbol,
+        start=int(1000 * start.replace(tzinfo=timezone.utc).timestamp()),
+        end=int(1000 * end.replace(tzinfo=timezone.utc).timestamp()) - 1,
+        limit=str(BITFINEX_ROW_LIMIT), sort=1)
+    trades_frame = convert_bitfinex_trades(trades_list)
+    if trades_frame is not None:
+        trades_frame['COUNT'] = trades_frame['COUNT'].abs()
+    return trades_frame
 
-def download(ric, start_date, end_date):
+
+def get_fetcher(kind, ric):
+    """
+    (fetch, row limit, whether a truncated response can be paginated from
+    its last timestamp) of kind for ric. Bitfinex sorts trades by time, so
+    its pages continue from the last one; Eikon windows are split instead.
+    """
+    if kind == QUOTES:
+        return fetch_quotes, EIKON_ROW_LIMIT, False
+    if ric in CRYPTOCURRENCIES:
+        return fetch_trades, BITFINEX_ROW_LIMIT, True
+    return fetch_trades, EIKON_ROW_LIMIT, False
+
+
+def fetch_adaptively(fetch, start, end, limit, can_paginate, window=INITIAL_WINDOW):
+    """
+    Fetch [start, end) with fetch(start, end), a frame of at most limit rows
+    or None, in half open windows sized from the previous responses: a
+    window doubles after a response under SPARSE_FILL_RATIO of the limit
+    and halves over 1 - SPARSE_FILL_RATIO of it. A response at the limit is
+    truncated. It is paginated from its last timestamp when can_paginate,
+    the rows of that timestamp being dropped as the next page starts with
+    them, and fetched again in halves otherwise. Yields (start, end, frame)
+    of every completed window.
+    """
+    cursor = start
+    while cursor < end:
+        window_end = min(cursor + window, end)
+        frame = fetch(cursor, window_end)
+        rows = 0 if frame is None else frame.shape[0]
+        if rows >= limit:
+            frame = frame.sort_index(kind='stable')
+            last = _to_naive_utc(frame.index[-1])
+            if can_paginate and _to_naive_utc(frame.index[0]) < last:
+                yield cursor, last, frame[frame.index < frame.index[-1]]
+                cursor = last
+                continue
+            if window > MINIMUM_WINDOW:
+                window = max(window / 2, MINIMUM_WINDOW)
+                continue
+            print(f'{cursor} - {window_end} truncated at {limit} rows')
+        yield cursor, window_end, frame
+        cursor = window_end
+        if rows < limit * SPARSE_FILL_RATIO:
+            window = min(window * 2, MAXIMUM_WINDOW)
+        elif rows > limit * (1 - SPARSE_FILL_RATIO):
+            window = max(window / 2, MINIMUM_WINDOW)
+
+
+def _get_day_bounds(day):
+    start = datetime.combine(day, time())
+    return start, start + timedelta(days=1)
+
+
+def _concat_frames(frames):
+    frames = [frame for frame in frames if frame is not None]
+    if len(frames) == 0:
+        return None
+    data = pd.concat(frames)
+    data.sort_index(inplace=True, kind='stable')
+    return data
+
+
+def download_ticks(kind, ric, day):
+    fetch, limit, can_paginate = get_fetcher(kind, ric)
+    return _concat_frames([frame for _, _, frame in fetch_adaptively(
+        lambda start, end: fetch(ric, start, end), *_get_day_bounds(day), limit, can_paginate)])
+
+
+def download_quotes(ric, day):
+    return download_ticks(QUOTES, ric, day)
+
+
+def download_trades(ric, day):
+    return download_ticks(TRADES, ric, day)
+
+
+def _with_retries(function, *args):
+    for attempt in range(MAX_RETRIES):
+        try:
+            return function(*args)
+        except Exception:
+            if attempt == MAX_RETRIES - 1:
+                raise
+            clock.sleep(BACKOFF_SECONDS * 2 ** attempt)
+
+
+def _download_day(manifest, kind, ric, day):
+    """
+    Fetch the rest of a day from its cursor, staging every completed
+    window, then write the day to the tick store. Returns the rows fetched
+    and the number of requests.
+    """
+    start, end = _get_day_bounds(day)
+    cursor = manifest.get(_get_cursor_key(kind, ric, day))
+    cursor = start if cursor is None else datetime.fromisoformat(cursor)
+    fetch, limit, can_paginate = get_fetcher(kind, ric)
+    requests = 0
+
+    def fetch_with_retries(window_start, window_end):
+        nonlocal requests
+        requests += 1
+        return _with_retries(fetch, ric, window_start, window_end)
+
+    rows = 0
+    os.makedirs(_get_staging_directory(kind, ric, day), exist_ok=True)
+    for window_start, window_end, frame in fetch_adaptively(
+            fetch_with_retries, cursor, end, limit, can_paginate):
+        window_rows = 0 if frame is None else frame.shape[0]
+        if window_rows > 0:
+            frame.to_pickle(_get_window_path(kind, ric, day, window_start))
+            rows += window_rows
+        manifest.mark_window_done(_get_cursor_key(kind, ric, day), window_end, window_rows)
+    _store_day(manifest, kind, ric, day)
+    return rows, requests
+
+
+def _store_day(manifest, kind, ric, day):
+    directory = _get_staging_directory(kind, ric, day)
+    frames = [pd.read_pickle(os.path.join(directory, filename))
+              for filename in sorted(os.listdir(directory)) if filename.endswith('.pkl')]
+    data = _concat_frames(frames)
+    rows = 0
+    if data is not None:
+        write_ticks(kind, ric, day, data)
+        rows = data.shape[0]
+    manifest.mark_done(_get_day_key(kind, ric, day), rows)
+    shutil.rmtree(directory, ignore_errors=True)
+
+
+def bulk_download(rics, start_date, end_date, workers=DEFAULT_WORKERS):
+    """
+    Download (kind, ric, day) partitions of quotes and trades on a thread
+    pool, every day being fetched in adaptive windows, and write each day
+    to the tick store. Progress reports the rows and windows fetched per
+    second from the manifest. Returns the partitions that still failed after
+    retries; running again resumes them from their last completed window.
+    """
+    manifest = DownloadManifest(os.path.join(DOWNLOAD_DIRECTORY, 'manifest.json'))
+    days = [start_date + timedelta(days=i)
+            for i in range((end_date - start_date).days + 1)]
+    partitions = [(kind, ric, day) for ric in rics for day in days for kind in [QUOTES, TRADES]
+                  if not manifest.is_done(_get_day_key(kind, ric, day)) and not has_ticks(kind, ric, day)]
+    failed_partitions = []
+    total_requests = 0
+    start_time = clock.monotonic()
+    with ThreadPoolExecutor(max_workers=workers) as executor, \
+            tqdm(total=len(partitions)) as progress:
+        futures = {executor.submit(_download_day, manifest, *partition): partition
+                   for partition in partitions}
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, timeout=PROGRESS_SECONDS, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    _, requests = future.result()
+                except Exception as e:
+                    print(f'{_get_day_key(*futures[future])} failed: {e}')
+                    failed_partitions.append(futures[future])
+                else:
+                    total_requests += requests
+                progress.update()
+            elapsed = max(clock.monotonic() - start_time, 1e-9)
+            progress.set_postfix(requests=total_requests,
+                                 rows_per_s=f'{manifest.rows / elapsed:.0f}',
+                                 chunks_per_s=f'{manifest.windows / elapsed:.1f}')
+    return failed_partitions
+
+
+def download(ric, start_date, end_date, workers=DEFAULT_WORKERS):
     print(ric)
-    delta = end_date - start_date
-    for i in tqdm(range(delta.days + 1)):
-        day = start_date + timedelta(days=i)
-        for hour in range(24):
-            start_datetime = datetime.combine(
-                day, time(hour, 0, 0)).isoformat()
-            end_datetime = datetime.combine(
-                day, time(hour, 59, 59, 999)).isoformat()
-            if ric in CRYPTOCURRENCIES:
-                get_timeseries(rics=ric,
-                               fields=['BID', 'BIDSIZE',
-                                       'ASK', 'ASKSIZE'],
-                               start_date=start_datetime,
-                               end_date=end_datetime,
-                               interval='taq')
-                for minutes in [0, 15, 30, 45]:
-                    start_datetime_min = datetime.combine(
-                        day, time(hour, minutes, 0, tzinfo=timezone.utc))
-                    end_datetime_min = datetime.combine(
-                        day, time(hour, minutes + 14, 59, 999, tzinfo=timezone.utc))
-                    start = int(1000 * start_datetime_min.timestamp())
-                    end = int(1000 * end_datetime_min.timestamp())
-                    ticker = ric.replace('=', '')
-                    symbol = f't{ticker}USD'
-                    get_public_trades(
-                        symbol=symbol, start=start, end=end, limit='10000', sort=1)
-
-            else:
-                get_timeseries(rics=ric,
-                               fields=['TRDPRC_1', 'COUNT'],
-                               start_date=start_datetime,
-                               end_date=end_datetime,
-                               interval='tas')
-                get_timeseries(rics=ric,
-                               fields=['BID', 'BIDSIZE',
-                                       'ASK', 'ASKSIZE'],
-                               start_date=start_datetime,
-                               end_date=end_datetime,
-                               interval='taq')
+    return bulk_download([ric], start_date, end_date, workers=workers)
 
 
-if __name__ == '__main__':
-    start_date = date(2020, 5, 1)
-    end_date = date(2020, 5, 29)
+@click.command()
+@click.option('--start-date', default=date(2020, 5, 1).isoformat())
+@click.option('--end-date', default=date(2020, 5, 29).isoformat())
+@click.option('--workers', default=DEFAULT_WORKERS)
+def main(start_date, end_date, workers):
     rics = [
         # 'AXAF.PA',
         # 'SPY', 'EWJ', 'VNQ', 'IEF.O', 'DBC', 'VGK', 'VWO', 'VNQI.O', 'TLT.O', 'GLD',
         *CRYPTOCURRENCIES
     ]
-    for ric in rics:
-        download(ric, start_date, end_date)
+    failed_partitions = bulk_download(rics,
+                                      date.fromisoformat(start_date),
+                                      date.fromisoformat(end_date),
+                                      workers=workers)
+    if len(failed_partitions) > 0:
+        print(f'{len(failed_partitions)} days failed, run again to resume')
+
+
+if __name__ == '__main__':
+    main()  # pylint: disable=no-value-for-parameter
@@ -1,148 +1,284 @@
 import click
-from datetime import date, datetime, time, timedelta, timezone
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from datetime import date, timedelta
 import numpy as np
 import pandas as pd
 from pprint import pprint
 from tqdm import tqdm
 
-from common.data.constants import CRYPTOCURRENCIES, FUTURES
-from common.data.database import json_data_to_df
-from common.data.bitfinex import convert_bitfinex_trades, get_public_trades
-from ....eikon import get_timeseries
+from common.data.constants import FUTURES
+from common.execution.optimal_limit_order.download import download_quotes, download_trades
+from common.execution.optimal_limit_order.parameters import publish_parameters
+from common.execution.optimal_limit_order.tick_store import QUOTES, TRADES, has_ticks, read_tick_arrays, read_ticks, write_ticks
+from common.execution.trading_hours import filter_trading_hours, get_ric_session_index
 
 MINIMUM_EVENT_NUMBER = 30
+ESTIMATORS_DIRECTORY = os.path.join(
+    os.path.expanduser('~'), '.cache', 'execution', 'estimators')
+# Bumped whenever get_estimators changes so that cached days are recomputed
+ESTIMATORS_VERSION = 2
+CALIBRATION_WINDOW_DAYS = 30
+NANOSECONDS_PER_SECOND = 10**9
+NANOSECONDS_PER_MINUTE = 60 * NANOSECONDS_PER_SECOND
 
 
 def get_quotes(ric, day):
-    quotes_frames = []
-    for hour in range(24):
-        start_datetime = datetime.combine(
-            day, time(hour, 0, 0)).isoformat()
-        end_datetime = datetime.combine(
-            day, time(hour, 59, 59, 999)).isoformat()
-        r = get_timeseries(rics=ric,
-                           fields=['BID', 'BIDSIZE',
-                                   'ASK', 'ASKSIZE'],
-                           start_date=start_datetime,
-                           end_date=end_datetime,
-                           interval='taq')
-        if r['error'] is None:
-            quotes_frame = json_data_to_df(r['data'])
-            quotes_frames.append(quotes_frame)
-    if len(quotes_frames) == 0:
-        return None
-    quotes = pd.concat(quotes_frames)
-    quotes.sort_index(inplace=True)
+    quotes = read_ticks(QUOTES, ric, day)
+    if quotes is not None:
+        return quotes
+    quotes = download_quotes(ric, day)
+    if quotes is not None:
+        write_ticks(QUOTES, ric, day, quotes)
     return quotes
 
 
 def get_trades(ric, day):
-    trades_frames = []
-    for hour in range(24):
-        start_datetime = datetime.combine(
-            day, time(hour, 0, 0)).isoformat()
-        end_datetime = datetime.combine(
-            day, time(hour, 59, 59, 999)).isoformat()
-        if ric in CRYPTOCURRENCIES:
-            for minutes in [0, 15, 30, 45]:
-                start_datetime_min = datetime.combine(
-                    day, time(hour, minutes, 0, tzinfo=timezone.utc))
-                end_datetime_min = datetime.combine(
-                    day, time(hour, minutes + 14, 59, 999, tzinfo=timezone.utc))
-                start = int(1000 * start_datetime_min.timestamp())
-                end = int(1000 * end_datetime_min.timestamp())
-                ticker = ric.replace('=', '')
-                symbol = f't{ticker}USD'
-                trades_list = get_public_trades(
-                    symbol=symbol, start=start, end=end, limit='10000', sort=1)
-                trades_frame = convert_bitfinex_trades(trades_list)
-                if trades_frame is not None:
-                    trades_frame['COUNT'] = trades_frame['COUNT'].abs()
-                    trades_frames.append(trades_frame)
-        else:
-            r = get_timeseries(rics=ric,
-                               fields=['TRDPRC_1', 'COUNT'],
-                               start_date=start_datetime,
-                               end_date=end_datetime,
-                               interval='tas')
-            if r['error'] is None:
-                trades_frame = json_data_to_df(r['data'])
-                trades_frames.append(trades_frame)
-    if len(trades_frames) == 0:
-        return None
-    trades = pd.concat(trades_frames)
-    trades.sort_index(inplace=True)
+    trades = read_ticks(TRADES, ric, day)
+    if trades is not None:
+        return trades
+    trades = download_trades(ric, day)
+    if trades is not None:
+        write_ticks(TRADES, ric, day, trades)
     return trades
 
 
 def filter_opening_hours(ric, data):
-    if ric.endswith('.PA'):
-        opening_time = time(9, 0, 0)
-        closing_time = time(17, 30, 0)
-        data = data.tz_localize('UTC').tz_convert('Europe/Paris')
-        data = data.between_time(opening_time, closing_time)
-    elif ric in CRYPTOCURRENCIES:
-        pass
-    else:
-        opening_time = time(9, 30, 0)
-        closing_time = time(16, 0, 0)
-        data = data.tz_localize('UTC').tz_convert('America/New_York')
-        data = data.between_time(opening_time, closing_time)
-    return data
+    return filter_trading_hours(ric, data)
+
+
+def _get_run_starts(nanoseconds):
+    """
+    Start of every run of equal timestamps in sorted nanoseconds.
+    """
+    if len(nanoseconds) == 0:
+        return np.empty(0, dtype=np.int64)
+    is_start = np.empty(len(nanoseconds), dtype=bool)
+    is_start[0] = True
+    is_start[1:] = nanoseconds[1:] != nanoseconds[:-1]
+    return np.flatnonzero(is_start)
+
+
+def _get_run_medians(values, starts):
+    """
+    Median of values over each run beginning at starts, NaN skipped like
+    pandas. Only the runs of more than one value are sorted.
+    """
+    sizes = np.diff(np.append(starts, len(values)))
+    medians = values[starts]
+    is_multiple = sizes > 1
+    if is_multiple.any():
+        multiple_sizes = sizes[is_multiple]
+        rows = np.repeat(is_multiple, sizes)
+        run_ids = np.repeat(np.arange(len(multiple_sizes)), multiple_sizes)
+        run_values = values[rows]
+        run_values = run_values[np.lexsort((run_values, run_ids))]
+        run_starts = np.cumsum(multiple_sizes) - multiple_sizes
+        valid = np.add.reduceat(~np.isnan(run_values), run_starts)
+        low = run_starts + np.maximum(valid - 1, 0) // 2
+        high = run_starts + valid // 2
+        medians[is_multiple] = (run_values[low] + run_values[high]) / 2
+    return medians
+
+
+def aggregate_quotes(nanoseconds, bids, asks):
+    """
+    (timestamps, bids, asks) with one row per timestamp, the median of its
+    quotes.
+    """
+    starts = _get_run_starts(nanoseconds)
+    return (nanoseconds[starts], _get_run_medians(bids, starts),
+            _get_run_medians(asks, starts))
+
+
+def aggregate_trades(nanoseconds, prices, sizes):
+    """
+    (timestamps, prices, sizes) with one row per timestamp, the median
+    price and the total size of its trades, missing sizes counting as zero.
+    """
+    starts = _get_run_starts(nanoseconds)
+    total_sizes = np.add.reduceat(np.nan_to_num(sizes), starts) if len(starts) \
+        else np.empty(0, dtype=sizes.dtype)
+    return nanoseconds[starts], _get_run_medians(prices, starts), total_sizes
+
+
+class DayTicks():
+    """
+    Ticks of one (ric, day) in trading hours as flat arrays, int64 UTC
+    nanoseconds, float32 prices and float32 sizes, with the per timestamp
+    aggregates every estimator reads computed once. Raw rows are only kept
+    as the counts, mean spread and average trading size.
+    """
+
+    def __init__(self, quote_times, bids, asks, trade_times, prices, sizes):
+        self.number_of_quotes = len(quote_times)
+        self.number_of_trades = len(trade_times)
+        self.mean_spread = np.nanmean(asks - bids, dtype=np.float64) \
+            if self.number_of_quotes else np.nan
+        self.average_trading_size = np.nanmean(sizes, dtype=np.float64) \
+            if self.number_of_trades else np.nan
+        self.quote_times, self.bids, self.asks = aggregate_quotes(quote_times, bids, asks)
+        self.trade_times, self.prices, self.sizes = aggregate_trades(trade_times, prices, sizes)
+
+    @classmethod
+    def from_frames(cls, quotes, trades):
+        return cls(*_get_quote_arrays(quotes), *_get_trade_arrays(trades))
+
+    @property
+    def nbytes(self):
+        return sum(values.nbytes for values in [
+            self.quote_times, self.bids, self.asks,
+            self.trade_times, self.prices, self.sizes])
+
+
+def _get_quote_arrays(quotes, dtype=np.float32):
+    return (quotes.index.as_unit('ns').asi8,
+            quotes['BID'].to_numpy(dtype=dtype),
+            quotes['ASK'].to_numpy(dtype=dtype))
+
+
+def _get_trade_arrays(trades, dtype=np.float32):
+    return (trades.index.as_unit('ns').asi8,
+            trades['TRDPRC_1'].to_numpy(dtype=dtype),
+            trades['COUNT'].to_numpy(dtype=dtype))
+
+
+def _read_day_arrays(kind, ric, day, columns, download):
+    """
+    Stored columns of ric on day in trading hours, downloading and storing
+    the day first if needed. Only the rows kept are copied out of the
+    memory maps, prices and sizes as float32.
+    """
+    if not has_ticks(kind, ric, day):
+        data = download(ric, day)
+        if data is None:
+            return None
+        write_ticks(kind, ric, day, data)
+    nanoseconds, data = read_tick_arrays(kind, ric, day, columns)
+    session_index = get_ric_session_index(ric)
+    mask = slice(None) if session_index is None else session_index.get_mask(nanoseconds)
+    return (np.asarray(nanoseconds[mask], dtype=np.int64),
+            *[np.asarray(data[column][mask], dtype=np.float32) if column in data
+              else np.full(len(nanoseconds[mask]), np.nan, dtype=np.float32)
+              for column in columns])
+
+
+def get_day_ticks(ric, day):
+    quotes = _read_day_arrays(QUOTES, ric, day, ['BID', 'ASK'], download_quotes)
+    if quotes is None:
+        return None
+    trades = _read_day_arrays(TRADES, ric, day, ['TRDPRC_1', 'COUNT'], download_trades)
+    if trades is None:
+        return None
+    return DayTicks(*quotes, *trades)
 
 
 def get_average_trading_size(trades):
-    return np.nanmean(trades['COUNT'].tolist())
+    return np.nanmean(trades['COUNT'].to_numpy(dtype=float))
+
+
+def _get_volatility(quote_times, bids, asks, tick_size):
+    """
+    Standard deviation in ticks of the one second changes of the mid, the
+    mid of each second being the last one at or before it.
+    """
+    if len(quote_times) == 0:
+        return np.nan
+    mid = (bids.astype(np.float64) + asks) / 2
+    first_second = quote_times[0] // NANOSECONDS_PER_SECOND * NANOSECONDS_PER_SECOND
+    seconds = np.arange(first_second, quote_times[-1] + 1, NANOSECONDS_PER_SECOND)
+    positions = np.searchsorted(quote_times, seconds, side='right') - 1
+    mid_1s = np.where(positions >= 0, mid[np.maximum(positions, 0)], np.nan)
+    return np.nanstd(np.diff(mid_1s)) / tick_size
 
 
 def get_volatility(quotes, tick_size):
-    aggr_quotes = quotes[['BID', 'ASK']].groupby(level=0).median()
-    mid = (aggr_quotes['BID'] + aggr_quotes['ASK']) / 2
-    mid_1s = mid.resample('1S').pad()
-    return np.nanstd(np.diff(mid_1s.tolist())) / tick_size
+    return _get_volatility(*aggregate_quotes(*_get_quote_arrays(quotes, float)), tick_size)
 
 
 def get_cost_per_share(quotes, tick_size, market_impact_factor=3):
     spread = quotes['ASK'] - quotes['BID']
-    return np.nanmean(spread.tolist()) / tick_size * market_impact_factor
-
-
-def get_arrival_rate(quotes, trades, tick_size, average_trading_size, b):
-    agg_quotes = quotes[['BID', 'ASK']].groupby(level=0).median()
-    agg_trades_price = trades['TRDPRC_1'].groupby(level=0).median()
-    agg_trades_quantity = trades['COUNT'].groupby(level=0).sum()
-    trades_and_quotes = pd.concat([agg_quotes, agg_trades_price,
-                                   agg_trades_quantity], axis=1, sort=False)
-    x = []
-    y = []
-    for offset in np.linspace(-b, 10, 5):
-        prev_timestamp = None
-        limit_order = None
-        executed_quantity = 0
-        last_ask = None
-        executed_quantities = []
-        for index, row in trades_and_quotes.iterrows():
-            timestamp = index.round('min')
-            if not np.isnan(row['ASK']):
-                last_ask = row['ASK']
-            if prev_timestamp is None:
-                prev_timestamp = timestamp
-                continue
-            if timestamp != prev_timestamp:
-                executed_quantities.append(executed_quantity)
-                executed_quantity = 0
-                prev_timestamp = timestamp
-                if last_ask is not None:
-                    limit_order = last_ask + offset * tick_size
-            if executed_quantity == 0 and limit_order is not None and not np.isnan(row['TRDPRC_1']) and row['TRDPRC_1'] > limit_order:
-                executed_quantity = row['COUNT']
-        x.append(offset)
-        y.append(np.mean(executed_quantities))
-    index = np.array(y) > 0
-    x = np.array(x)[index]
-    y = np.array(y)[index]
+    return np.nanmean(spread.to_numpy(dtype=float)) / tick_size * market_impact_factor
+
+
+def _get_minutes(nanoseconds):
+    """
+    Minutes of nanoseconds rounded half to even like DatetimeIndex.round.
+    """
+    minutes, remainder = np.divmod(nanoseconds, NANOSECONDS_PER_MINUTE)
+    half = NANOSECONDS_PER_MINUTE // 2
+    return minutes + ((remainder > half) | ((remainder == half) & (minutes % 2 == 1)))
+
+
+def _get_executed_quantities(nanoseconds, asks, prices, quantities, offsets, tick_size):
+    number_of_rows = len(nanoseconds)
+    if number_of_rows == 0:
+        return np.empty((len(offsets), 0))
+    minutes = _get_minutes(nanoseconds)
+    is_bucket_start = np.empty(number_of_rows, dtype=bool)
+    is_bucket_start[0] = True
+    is_bucket_start[1:] = minutes[1:] != minutes[:-1]
+    del minutes
+    bucket_starts = np.flatnonzero(is_bucket_start)
+    del is_bucket_start
+    ask_rows = np.flatnonzero(~np.isnan(asks))
+    last_ask_rows = np.searchsorted(ask_rows, bucket_starts, side='right') - 1
+    has_ask = last_ask_rows >= 0
+    bucket_ask = np.full(len(bucket_starts), np.nan)
+    bucket_ask[has_ask] = asks[ask_rows[last_ask_rows[has_ask]]]
+    bucket_ask[0] = np.nan
+    ask_limits = np.repeat(bucket_ask, np.diff(np.append(bucket_starts, number_of_rows)))
+    is_traded = quantities != 0
+    executed_quantities = np.zeros((len(offsets), len(bucket_starts)))
+    for i, offset in enumerate(np.asarray(offsets, dtype=float)):
+        executed_rows = np.flatnonzero((prices > ask_limits + offset * tick_size) & is_traded)
+        buckets = np.searchsorted(bucket_starts, executed_rows, side='right') - 1
+        buckets, first = np.unique(buckets, return_index=True)
+        executed_quantities[i, buckets] = quantities[executed_rows[first]]
+    return executed_quantities[:, :-1]
+
+
+def get_executed_quantities(trades_and_quotes, offsets, tick_size):
+    """
+    For each offset, the quantity of the first trade above a limit order
+    placed at the last ask + offset ticks at the start of every minute
+    bucket. Returns an array of shape (len(offsets), number of buckets - 1),
+    the last bucket being incomplete.
+    """
+    return _get_executed_quantities(
+        trades_and_quotes.index.as_unit('ns').asi8,
+        trades_and_quotes['ASK'].to_numpy(dtype=float),
+        trades_and_quotes['TRDPRC_1'].to_numpy(dtype=float),
+        trades_and_quotes['COUNT'].to_numpy(dtype=float),
+        offsets, tick_size)
+
+
+def _get_arrival_rate(quote_times, asks, trade_times, prices, sizes, tick_size, average_trading_size, b, offsets=None):
+    """
+    Arrival rate from the aggregated quotes and trades merged on the union
+    of their timestamps.
+    """
+    nanoseconds = np.union1d(quote_times, trade_times)
+    merged_asks = np.full(len(nanoseconds), np.nan, dtype=asks.dtype)
+    merged_asks[np.searchsorted(nanoseconds, quote_times)] = asks
+    merged_prices = np.full(len(nanoseconds), np.nan, dtype=prices.dtype)
+    merged_quantities = np.full(len(nanoseconds), np.nan, dtype=sizes.dtype)
+    trade_rows = np.searchsorted(nanoseconds, trade_times)
+    merged_prices[trade_rows] = prices
+    merged_quantities[trade_rows] = sizes
+    if offsets is None:
+        offsets = np.linspace(-b, 10, 5)
+    executed_quantities = _get_executed_quantities(
+        nanoseconds, merged_asks, merged_prices, merged_quantities, offsets, tick_size)
+    x = np.asarray(offsets, dtype=float)
+    y = np.array([np.mean(quantities) for quantities in executed_quantities])
+    index = y > 0
+    x = x[index]
+    y = y[index]
     if len(x) < 2:
-        return np.NaN, np.NaN
+        return np.nan, np.nan
     coefficients = tuple(np.polyfit(x, np.log(y), 1))
     k = -coefficients[0]
     sixty_seconds = 60
@@ -150,27 +286,36 @@ def get_arrival_rate(quotes, trades, tick_size, average_trading_size, b):
     return A, k
 
 
-def get_estimators(ric, day, tick_size):
-    quotes = get_quotes(ric, day)
-    trades = get_trades(ric, day)
-    if quotes is None or trades is None:
-        return
-    quotes = filter_opening_hours(ric, quotes)
-    trades = filter_opening_hours(ric, trades)
-    if quotes.shape[0] < MINIMUM_EVENT_NUMBER or trades.shape[0] < MINIMUM_EVENT_NUMBER:
+def get_arrival_rate(quotes, trades, tick_size, average_trading_size, b, offsets=None):
+    quote_times, _, asks = aggregate_quotes(*_get_quote_arrays(quotes, float))
+    return _get_arrival_rate(quote_times, asks, *aggregate_trades(*_get_trade_arrays(trades, float)),
+                             tick_size, average_trading_size, b, offsets)
+
+
+def get_day_estimators(ticks, tick_size, market_impact_factor=3):
+    """
+    Estimators of one DayTicks, every one reading its shared aggregates.
+    """
+    if ticks.number_of_quotes < MINIMUM_EVENT_NUMBER or ticks.number_of_trades < MINIMUM_EVENT_NUMBER:
         return
-    average_trading_size = get_average_trading_size(trades)
-    b = get_cost_per_share(quotes, tick_size)
-    A, k = get_arrival_rate(quotes, trades,
-                            tick_size, average_trading_size, b)
-    estimators = {
-        'ats': average_trading_size,
-        'sigma': get_volatility(quotes, tick_size),
+    b = ticks.mean_spread / tick_size * market_impact_factor
+    A, k = _get_arrival_rate(ticks.quote_times, ticks.asks, ticks.trade_times,
+                             ticks.prices, ticks.sizes, tick_size,
+                             ticks.average_trading_size, b)
+    return {
+        'ats': ticks.average_trading_size,
+        'sigma': _get_volatility(ticks.quote_times, ticks.bids, ticks.asks, tick_size),
         'b': b,
         'A': A,
         'k': k,
     }
-    return estimators
+
+
+def get_estimators(ric, day, tick_size):
+    ticks = get_day_ticks(ric, day)
+    if ticks is None:
+        return
+    return get_day_estimators(ticks, tick_size)
 
 
 def get_tick_size(ric):
@@ -186,29 +331,142 @@ def get_tick_size(ric):
         return 0.01
 
 
-@click.command()
-@click.option('--stems', default=','.join(list(FUTURES.keys())))
-def main(stems):
-    start_date = date.today() - timedelta(days=30)
-    end_date = date.today() - timedelta(days=1)
-    stems = stems.split(',')
-    delta = end_date - start_date
+def get_calibration_ric(stem):
+    ric_suffix = 'c1'
+    ric = FUTURES[stem].get('Stem', {}).get('Reuters', '') + ric_suffix
+    return None if ric == ric_suffix else ric
+
+
+def get_calibration_jobs(stems, start_date, end_date):
+    jobs = []
     for stem in stems:
-        print(stem)
-        data = []
-        for i in tqdm(range(delta.days + 1)):
+        ric = get_calibration_ric(stem)
+        if ric is None:
+            continue
+        tick_size = FUTURES[stem]['TickSize']
+        for i in range((end_date - start_date).days + 1):
             day = start_date + timedelta(days=i)
-            if day.weekday in [5, 6]:
-                continue
-            ric_suffix = 'c1'
-            ric = FUTURES[stem].get('Stem', {}).get('Reuters', '') + ric_suffix
-            if ric == ric_suffix:
+            if day.weekday() in [5, 6]:
                 continue
-            tick_size = FUTURES[stem]['TickSize']
-            data.append(get_estimators(ric, day, tick_size))
-        data = [d for d in data if d is not None]
-        dfm = pd.DataFrame(data=data)
-        pprint(dfm.median(axis=0, skipna=True).to_dict())
+            jobs.append((stem, ric, day, tick_size))
+    return jobs
+
+
+def _get_estimators_directory(ric):
+    return os.path.join(ESTIMATORS_DIRECTORY, f'v{ESTIMATORS_VERSION}', ric)
+
+
+def _get_estimators_path(ric, day):
+    return os.path.join(_get_estimators_directory(ric), f'{day.isoformat()}.json')
+
+
+def has_cached_estimators(ric, day):
+    return os.path.exists(_get_estimators_path(ric, day))
+
+
+def read_cached_estimators(ric, day):
+    """
+    Cached estimators of ric on day, None for a day cached as empty.
+    """
+    with open(_get_estimators_path(ric, day)) as f:
+        return json.load(f)
+
+
+def write_cached_estimators(ric, day, estimators):
+    path = _get_estimators_path(ric, day)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary_path = f'{path}.{os.getpid()}.tmp'
+    with open(temporary_path, 'w') as f:
+        json.dump(estimators, f)
+    os.replace(temporary_path, path)
+
+
+def evict_cached_estimators(ric, start_date, end_date):
+    directory = _get_estimators_directory(ric)
+    if not os.path.isdir(directory):
+        return
+    for filename in os.listdir(directory):
+        if not filename.endswith('.json'):
+            continue
+        day = date.fromisoformat(filename[:-len('.json')])
+        if day < start_date or day > end_date:
+            os.remove(os.path.join(directory, filename))
+
+
+def _run_calibration_job(job):
+    stem, ric, day, tick_size = job
+    if has_cached_estimators(ric, day):
+        return job, read_cached_estimators(ric, day), None
+    try:
+        estimators = get_estimators(ric, day, tick_size)
+    except Exception as e:
+        return job, None, repr(e)
+    # A day without enough ticks is cached as null so it is not computed again
+    write_cached_estimators(ric, day, estimators)
+    return job, estimators, None
+
+
+def calibrate(stems, start_date, end_date, workers=None):
+    """
+    Run get_estimators for every (stem, day) on a process pool and return
+    one row of median estimators per stem. Per-day estimators are cached so
+    only days without a cached result are computed, a day without enough
+    ticks after its download being cached as empty. A failing (stem, day),
+    including one lost with a dead worker process, is reported, skipped
+    and not cached so that it is computed again on the next run.
+    """
+    jobs = get_calibration_jobs(stems, start_date, end_date)
+    if workers == 1:
+        results = [_run_calibration_job(job) for job in tqdm(jobs)]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(_run_calibration_job, job): job
+                       for job in jobs}
+            results = []
+            for future in tqdm(as_completed(futures), total=len(futures)):
+                try:
+                    results.append(future.result())
+                except BrokenProcessPool as e:
+                    results.append((futures[future], None, repr(e)))
+    data = {stem: [] for stem in stems}
+    for (stem, ric, day, _), estimators, error in results:
+        if error is not None:
+            print(f'{stem} {ric} {day}: {error}')
+        elif estimators is not None:
+            data[stem].append(estimators)
+    medians = {stem: pd.DataFrame(data=d).median(axis=0, skipna=True)
+               for stem, d in data.items() if len(d) > 0}
+    return pd.DataFrame.from_dict(medians, orient='index')
+
+
+def recalibrate(stems, end_date=None, window_days=CALIBRATION_WINDOW_DAYS, workers=None):
+    """
+    Rolling recalibration over the window_days days ending at end_date
+    (yesterday by default): computes the missing days, evicts cached days
+    outside the window and returns the median estimators per stem.
+    """
+    end_date = end_date or date.today() - timedelta(days=1)
+    start_date = end_date - timedelta(days=window_days - 1)
+    results = calibrate(stems, start_date, end_date, workers=workers)
+    for stem in stems:
+        ric = get_calibration_ric(stem)
+        if ric is not None:
+            evict_cached_estimators(ric, start_date, end_date)
+    return results
+
+
+@click.command()
+@click.option('--stems', default=','.join(list(FUTURES.keys())))
+@click.option('--workers', default=None, type=int)
+@click.option('--window', default=CALIBRATION_WINDOW_DAYS)
+@click.option('--publish', is_flag=True, default=False)
+def main(stems, workers, window, publish):
+    stems = stems.split(',')
+    results = recalibrate(stems, window_days=window, workers=workers)
+    pprint(results.to_dict(orient='index'))
+    if publish:
+        version = publish_parameters(results.to_dict(orient='index'))
+        print(f'execution parameters published as version {version}')
 
 
 if __name__ == '__main__':
@@ -0,0 +1,119 @@
+from datetime import datetime, timezone
+import json
+import math
+import os
+import threading
+import time
+
+from common.data.constants import FUTURES
+
+PARAMETERS_DIRECTORY = os.path.join(
+    os.path.expanduser('~'), '.cache', 'execution', 'parameters')
+LATEST_FILE = 'latest.json'
+RELOAD_INTERVAL_SECONDS = 5
+PARAMETER_NAMES = ['ats', 'sigma', 'b', 'A', 'k']
+PUBLISH_ATTEMPTS = 50
+PUBLISH_RETRY_SECONDS = 0.1
+
+_published = {'checked': None, 'mtime': None, 'version': None, 'parameters': {}}
+_published_lock = threading.Lock()
+
+
+def _read_latest():
+    path = os.path.join(PARAMETERS_DIRECTORY, LATEST_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def _write_json(path, document):
+    temporary_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(temporary_path, 'w') as f:
+        json.dump(document, f, indent=2, sort_keys=True)
+    os.replace(temporary_path, path)
+
+
+def _create_json(path, document):
+    """
+    Write document to path, raising FileExistsError if path exists.
+    """
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+    with os.fdopen(fd, 'w') as f:
+        json.dump(document, f, indent=2, sort_keys=True)
+
+
+def _get_next_document(latest, parameters):
+    published = dict(latest['parameters'])
+    for stem, values in parameters.items():
+        values = {name: float(values[name]) for name in PARAMETER_NAMES
+                  if name in values}
+        if len(values) == len(PARAMETER_NAMES) and \
+                all(math.isfinite(value) for value in values.values()):
+            published[stem] = values
+    return {
+        'version': latest['version'] + 1,
+        'published': datetime.now(timezone.utc).isoformat(),
+        'parameters': published,
+    }
+
+
+def publish_parameters(parameters):
+    """
+    parameters : {stem: {'ats', 'sigma', 'b', 'A', 'k'}}
+
+    Stems with a missing or non finite estimator are ignored and keep their
+    previously published values. Every publication is kept as vNNNNNN.json
+    and latest.json points to the newest one. Returns the new version.
+
+    The version file is created exclusively: a concurrent publisher that
+    took the same version first makes this one wait for its latest.json
+    and merge on top of it, so no publication is lost and latest.json
+    only moves forward.
+    """
+    os.makedirs(PARAMETERS_DIRECTORY, exist_ok=True)
+    for attempt in range(PUBLISH_ATTEMPTS):
+        if attempt > 0:
+            time.sleep(PUBLISH_RETRY_SECONDS)
+        latest = _read_latest() or {'version': 0, 'parameters': {}}
+        document = _get_next_document(latest, parameters)
+        try:
+            _create_json(os.path.join(PARAMETERS_DIRECTORY,
+                                      f'v{document["version"]:06d}.json'), document)
+        except FileExistsError:
+            continue
+        _write_json(os.path.join(PARAMETERS_DIRECTORY, LATEST_FILE), document)
+        return document['version']
+    raise Exception(f'Version {document["version"]} exists but {LATEST_FILE} '
+                    f'was not updated after {PUBLISH_ATTEMPTS} attempts')
+
+
+def get_published_parameters():
+    """
+    Published parameters, reloaded from latest.json when it changed at most
+    once every RELOAD_INTERVAL_SECONDS.
+    """
+    now = time.monotonic()
+    checked = _published['checked']
+    if checked is not None and now - checked < RELOAD_INTERVAL_SECONDS:
+        return _published['parameters']
+    with _published_lock:
+        _published['checked'] = now
+        path = os.path.join(PARAMETERS_DIRECTORY, LATEST_FILE)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if mtime != _published['mtime']:
+            latest = _read_latest() if mtime is not None else None
+            _published['mtime'] = mtime
+            _published['version'] = latest['version'] if latest else None
+            _published['parameters'] = latest['parameters'] if latest else {}
+    return _published['parameters']
+
+
+def get_execution_parameters(stem):
+    parameters = get_published_parameters().get(stem)
+    if parameters is not None:
+        return parameters
+    return FUTURES[stem]['ExecutionParameters']
@@ -1,33 +1,41 @@
+import hashlib
 import math
+import os
+import threading
 
 import click
 import matplotlib.pyplot as plt
 import numpy as np
+import pandas as pd
 from scipy.integrate import odeint
+from scipy.linalg import expm
+from scipy.optimize import brentq
 
 from common.data.constants import FUTURES
 from common.execution.optimal_limit_order.estimators import get_tick_size
+from common.execution.optimal_limit_order.parameters import get_execution_parameters, get_published_parameters
 
+QUOTE_SURFACE_DIRECTORY = os.path.join(
+    os.path.expanduser('~'), '.cache', 'execution', 'quote_surfaces')
+QUOTE_SURFACE_Q_MAX = 50
+QUOTE_SURFACE_T_MAX = 300
+QUOTE_SURFACE_TIME_STEPS = 301
+QUOTE_SURFACE_SOLVER = 'expm'
+LOG_SPACE_SOLVER = 'log'
+# q above which the system is solved for log(w_q / w_{q-1}), w underflowing
+LOG_SPACE_Q = 10
+# q above which single quotes use the continuous inventory approximation
+ASYMPTOTIC_Q = 100
+ACCURACY_REPORT_Q = [1, 5, 10, 20, 50, 100, 200, 500, 1000]
+ACCURACY_REPORT_SECONDS = [1, 10, 60, 300]
 
-def optimal_limit_order_formula(q_max, t_max, mu, sigma, A, k, gamma, b, is_plot=False):
-    """
-    q_max : Quantity in ATS to execute
-    t_max : Time in seconds remaining to execute
-    mu : Trend in tick per second
-    sigma : Volatility in tick per second squared
-    A : arrival rate at best quote
-    k : exponential decreasing parameter of arrival rate
-    gamma : absolute risk aversion
-    b : cost per share to liquidate the remaining position in ticks
-    """
+# Latest quote surface by stem, a surface for new parameters replacing it
+_quote_surfaces = {}
+_quote_surfaces_lock = threading.Lock()
 
-    alpha = k / 2 * gamma * np.power(sigma, 2)
-    beta = k * mu
-    eta = A * np.power(1 + gamma / k, -(1 + k / gamma))
-    w_0 = 1
 
-    def w_T(q):
-        return np.exp(-k * q * b)
+def _solve_odeint(w_T, t, alpha, beta, eta, w_0):
+    q_max = len(w_T)
 
     def linear_ode(w_q, w_q_1, q):
         return (alpha * np.power(q, 2) - beta * q) * w_q - eta * w_q_1
@@ -37,55 +45,477 @@ def optimal_limit_order_formula(q_max, t_max, mu, sigma, A, k, gamma, b, is_plot
         dydt = [linear_ode(w[q], w[q-1], q) for q in range(1, q_max + 1)]
         return dydt
 
-    w_T = [w_T(q) for q in range(1, q_max + 1)]
-    t = np.linspace(0, -t_max, 100)
+    return odeint(linear_ode_system, w_T, t, args=())
 
-    w = odeint(linear_ode_system, w_T, t, args=())
 
-    delta = {}
-    for q in range(1, q_max + 1):
-        if q == 1:
-            delta[q] = 1 / k * np.log(w[:, q-1] / w_0) + \
-                1 / gamma * np.log(1 + gamma / k)
-        else:
-            delta[q] = 1 / k * np.log(w[:, q-1] / w[:, q-2]) + \
-                1 / gamma * np.log(1 + gamma / k)
+def _solve_expm(w_T, t, alpha, beta, eta, w_0):
+    """
+    The system is linear with constant coefficients, so on the uniform time
+    grid w(t_i) = exp(M h)^i w(0) with M lower bidiagonal and w_0 kept
+    constant by a zero first row.
+    """
+    q_max = len(w_T)
+    q = np.arange(1, q_max + 1)
+    generator = np.zeros((q_max + 1, q_max + 1))
+    generator[q, q] = alpha * np.power(q, 2) - beta * q
+    generator[q, q - 1] = -eta
+    propagator = expm(generator * (t[1] - t[0]))
+    w = np.empty((len(t), q_max + 1))
+    w[0] = [w_0, *w_T]
+    for i in range(1, len(t)):
+        w[i] = propagator @ w[i-1]
+    return w[:, 1:]
+
+
+def _solve_log_space(u_T, t, alpha, beta, eta):
+    """
+    u_q = log(w_q / w_{q-1}) follows du_q/dt = g_q - g_{q-1} with
+    g_q = alpha q^2 - beta q - eta exp(-u_q) and g_0 = 0. u stays finite
+    where w underflows and the Jacobian is lower bidiagonal, which LSODA
+    uses as a band for the stiff large q rows.
+    """
+    q = np.arange(1, len(u_T) + 1)
+    a = alpha * np.power(q, 2) - beta * q
+
+    def log_space_ode_system(u, t):
+        g = a - eta * np.exp(-u)
+        return g - np.concatenate([[0], g[:-1]])
+
+    def jacobian(u, t):
+        e = eta * np.exp(-u)
+        bands = np.zeros((2, len(u)))
+        bands[0] = e
+        bands[1, :-1] = -e[:-1]
+        return bands
+
+    return odeint(log_space_ode_system, u_T, t, Dfun=jacobian, ml=1, mu=0, mxstep=50000)
+
+
+SOLVERS = {
+    'odeint': _solve_odeint,
+    'expm': _solve_expm,
+}
+
+
+def _get_coefficients(mu, sigma, A, k, gamma):
+    alpha = k / 2 * gamma * np.power(sigma, 2)
+    beta = k * mu
+    eta = A * np.power(1 + gamma / k, -(1 + k / gamma))
+    return alpha, beta, eta
+
+
+def get_solver(q_max, solver, log_space_q=LOG_SPACE_Q):
+    """
+    Solver actually used for q_max: the log space solver above log_space_q,
+    where odeint and expm overflow, solver otherwise.
+    """
+    if log_space_q is not None and q_max > log_space_q:
+        return LOG_SPACE_SOLVER
+    return solver
+
+
+def optimal_limit_order_surface(q_max, t_max, mu, sigma, A, k, gamma, b, time_steps=100, solver='odeint', log_space_q=LOG_SPACE_Q):
+    """
+    Solve the ODE system once and return (time_to_go, delta) where
+    delta[q - 1, i] is the optimal quote in ticks for q ATS left to execute
+    with time_to_go[i] seconds remaining. Above log_space_q the log space
+    solver replaces solver, None keeping solver for every q_max.
+    """
+
+    alpha, beta, eta = _get_coefficients(mu, sigma, A, k, gamma)
+    w_0 = 1
+    t = np.linspace(0, -t_max, time_steps)
+    solver = get_solver(q_max, solver, log_space_q)
+
+    if solver == LOG_SPACE_SOLVER:
+        u = _solve_log_space(np.full(q_max, -k * b), t, alpha, beta, eta)
+    else:
+        def w_T(q):
+            return np.exp(-k * q * b)
+
+        w_T = [w_T(q) for q in range(1, q_max + 1)]
+        w = SOLVERS[solver](w_T, t, alpha, beta, eta, w_0)
+        w_previous = np.column_stack([np.full(len(t), w_0), w[:, :-1]])
+        u = np.log(w / w_previous)
+
+    delta = 1 / k * u + 1 / gamma * np.log(1 + gamma / k)
+    return -t, delta.T
+
+
+def asymptotic_limit_order_quote(q, t_max, mu, sigma, A, k, gamma, b):
+    """
+    Optimal quote in ticks for a large q from the continuous inventory limit
+    of the log space system, du/dt + eta exp(-u) du/dq = -a'(q) with
+    a(q) = alpha q^2 - beta q. Along its characteristics
+    dq/dt = eta exp(-u) and eta exp(-u) - a(q) is constant: eta exp(k b) -
+    a(q_0) on the ones leaving the terminal condition at q_0, anything in
+    (0, eta exp(k b)) on the fan leaving q = 0. Finding the characteristic
+    through (q, t_max) is a scalar root, so the cost does not depend on q.
+    Needs a increasing, that is mu <= 0.
+    """
+    alpha, beta, eta = _get_coefficients(mu, sigma, A, k, gamma)
+    # a(x) + K = alpha (x + center)^2 + K - offset
+    center = -beta / (2 * alpha)
+    offset = np.power(beta, 2) / (4 * alpha)
+    terminal_speed = eta * np.exp(k * b)
+
+    def a(x):
+        return alpha * np.power(x, 2) - beta * x
+
+    def get_travel_time(q_0, K):
+        low, high = q_0 + center, q + center
+        shifted_K = K - offset
+        if shifted_K > 0:
+            root = np.sqrt(alpha * shifted_K)
+            return (np.arctan(high * alpha / root) - np.arctan(low * alpha / root)) / root
+        if shifted_K == 0:
+            return (1 / low - 1 / high) / alpha
+        root = np.sqrt(-shifted_K / alpha)
+        return (np.log((high - root) / (high + root)) -
+                np.log((low - root) / (low + root))) / (2 * alpha * root)
+
+    if t_max <= 0:
+        K = terminal_speed - a(q)
+    elif t_max < get_travel_time(0, terminal_speed):
+        q_0 = brentq(lambda q_0: get_travel_time(q_0, terminal_speed - a(q_0)) - t_max, 0, q)
+        K = terminal_speed - a(q_0)
+    else:
+        K = brentq(lambda K: get_travel_time(0, K) - t_max,
+                   terminal_speed * 1e-12, terminal_speed)
+    return 1 / k * np.log(eta / (a(q) + K)) + 1 / gamma * np.log(1 + gamma / k)
+
+
+def optimal_limit_order_formula(q_max, t_max, mu, sigma, A, k, gamma, b, is_plot=False, solver=QUOTE_SURFACE_SOLVER, asymptotic_q=ASYMPTOTIC_Q):
+    """
+    q_max : Quantity in ATS to execute
+    t_max : Time in seconds remaining to execute
+    mu : Trend in tick per second
+    sigma : Volatility in tick per second squared
+    A : arrival rate at best quote
+    k : exponential decreasing parameter of arrival rate
+    gamma : absolute risk aversion
+    b : cost per share to liquidate the remaining position in ticks
+    solver : 'expm' (exact matrix exponential) or 'odeint', 'log' above
+        LOG_SPACE_Q
+    asymptotic_q : q_max above which the continuous inventory
+        approximation is used when mu <= 0, None to always solve
+    """
+
+    if asymptotic_q is not None and q_max > asymptotic_q and mu <= 0 and not is_plot:
+        return asymptotic_limit_order_quote(q_max, t_max, mu, sigma, A, k, gamma, b)
+
+    time_to_go, delta = optimal_limit_order_surface(
+        q_max, t_max, mu, sigma, A, k, gamma, b, solver=solver)
 
     if is_plot:
         for q in range(1, q_max + 1):
-            plt.plot(t, delta[q], 'b', label=f'delta_{q}(t)')
+            plt.plot(-time_to_go, delta[q-1], 'b', label=f'delta_{q}(t)')
         plt.legend(loc='best')
         plt.xlabel('t')
         plt.grid()
         plt.show()
 
-    return delta[q_max][-1]
+    return delta[q_max-1][-1]
+
+
+def get_accuracy_report(q_values, seconds, mu, sigma, A, k, gamma, b):
+    """
+    Quotes in ticks of the expm solver, the log space solver and the
+    continuous inventory approximation for every q and time to go, with
+    their errors. expm is the reference until w underflows and gives NaN,
+    the log space solver after.
+    """
+    model_parameters = {'mu': mu, 'sigma': sigma, 'A': A, 'k': k, 'gamma': gamma, 'b': b}
+    t_max = max(seconds)
+    grid = {'q_max': max(q_values), 't_max': t_max,
+            'time_steps': max(math.ceil(t_max), 1) + 1}
+    time_to_go, log_space = optimal_limit_order_surface(
+        solver=LOG_SPACE_SOLVER, **grid, **model_parameters)
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore', under='ignore'):
+        _, exact = optimal_limit_order_surface(
+            solver='expm', log_space_q=None, **grid, **model_parameters)
+    log_space = QuoteSurface(None, time_to_go, log_space)
+    exact = QuoteSurface(None, time_to_go, exact)
+    rows = []
+    for q in q_values:
+        for time_in_seconds in seconds:
+            exact_quote = exact.lookup(q, time_in_seconds)
+            log_space_quote = log_space.lookup(q, time_in_seconds)
+            reference = exact_quote if np.isfinite(exact_quote) else log_space_quote
+            asymptotic_quote = asymptotic_limit_order_quote(q, time_in_seconds, **model_parameters)
+            rows.append({
+                'q': q,
+                'seconds': time_in_seconds,
+                'exact': exact_quote,
+                'log_space': log_space_quote,
+                'asymptotic': asymptotic_quote,
+                'log_space_error': log_space_quote - exact_quote,
+                'asymptotic_error': asymptotic_quote - reference,
+            })
+    return pd.DataFrame(rows)
+
+
+class QuoteSurface():
+    """
+    Optimal quotes in ticks precomputed on a (q, time to go) grid for one set
+    of execution parameters. Time to go is linearly interpolated.
+    """
+
+    def __init__(self, key, time_to_go, delta):
+        self.key = key
+        self.time_to_go = time_to_go
+        self.delta = delta
+        self.q_max = delta.shape[0]
+        self.t_max = time_to_go[-1]
+        self._time_step = time_to_go[1] - time_to_go[0]
+        self._rows = delta.tolist()
+
+    def contains(self, q, time_in_seconds):
+        return 1 <= q <= self.q_max and 0 <= time_in_seconds <= self.t_max
+
+    def lookup(self, q, time_in_seconds):
+        row = self._rows[q-1]
+        position = time_in_seconds / self._time_step
+        index = min(int(position), len(row) - 2)
+        weight = position - index
+        return row[index] * (1 - weight) + row[index + 1] * weight
+
+    def contains_many(self, q, time_in_seconds):
+        return (1 <= q) & (q <= self.q_max) & \
+            (0 <= time_in_seconds) & (time_in_seconds <= self.t_max)
+
+    def lookup_many(self, q, time_in_seconds):
+        """
+        lookup over arrays of q and time to go inside the surface.
+        """
+        position = np.asarray(time_in_seconds, dtype=float) / self._time_step
+        index = np.minimum(position.astype(int), self.delta.shape[1] - 2)
+        weight = position - index
+        rows = np.asarray(q, dtype=int) - 1
+        return self.delta[rows, index] * (1 - weight) + \
+            self.delta[rows, index + 1] * weight
+
+
+def get_model_parameters(stem, parameters=None):
+    parameters = parameters or get_execution_parameters(stem)
+    tick_size = FUTURES[stem]['TickSize']
+    return {
+        'mu': 0,
+        'sigma': parameters['sigma'],
+        'A': parameters['A'],
+        'k': parameters['k'],
+        'gamma': 5e-4 / tick_size,
+        'b': parameters['b'],
+    }
+
+
+def _get_quote_surface_key(model_parameters):
+    grid = (QUOTE_SURFACE_Q_MAX, QUOTE_SURFACE_T_MAX, QUOTE_SURFACE_TIME_STEPS,
+            get_solver(QUOTE_SURFACE_Q_MAX, QUOTE_SURFACE_SOLVER))
+    return tuple(sorted(model_parameters.items())) + grid
+
+
+def _get_quote_surface_path(stem, key):
+    digest = hashlib.sha1(repr(key).encode()).hexdigest()[:16]
+    return os.path.join(QUOTE_SURFACE_DIRECTORY, f'{stem}_{digest}.npz')
+
+
+def _build_quote_surface(stem, key, model_parameters):
+    path = _get_quote_surface_path(stem, key)
+    if os.path.exists(path):
+        with np.load(path) as data:
+            return QuoteSurface(key, data['time_to_go'], data['delta'])
+    time_to_go, delta = optimal_limit_order_surface(
+        q_max=QUOTE_SURFACE_Q_MAX,
+        t_max=QUOTE_SURFACE_T_MAX,
+        time_steps=QUOTE_SURFACE_TIME_STEPS,
+        solver=QUOTE_SURFACE_SOLVER,
+        **model_parameters)
+    os.makedirs(QUOTE_SURFACE_DIRECTORY, exist_ok=True)
+    temporary_path = f'{path}.{os.getpid()}.tmp.npz'
+    np.savez(temporary_path, time_to_go=time_to_go, delta=delta)
+    os.replace(temporary_path, path)
+    return QuoteSurface(key, time_to_go, delta)
 
 
-def get_optimal_quote(stem, quantity, time_in_seconds):
-    parameters = FUTURES[stem]['ExecutionParameters']
-    average_trading_size = parameters['ats']
+def get_quote_surface(stem, parameters=None):
+    """
+    Quote surface of stem for the given ExecutionParameters, the published
+    or FUTURES ones by default. Only the surface of the latest parameters
+    of each stem is kept in memory, so new parameters trigger a rebuild or
+    a load from disk and evict the previous surface.
+    """
+    model_parameters = get_model_parameters(stem, parameters)
+    key = _get_quote_surface_key(model_parameters)
+    surface = _quote_surfaces.get(stem)
+    if surface is not None and surface.key == key:
+        return surface
+    with _quote_surfaces_lock:
+        surface = _quote_surfaces.get(stem)
+        if surface is None or surface.key != key:
+            surface = _build_quote_surface(stem, key, model_parameters)
+            _quote_surfaces[stem] = surface
+    return surface
+
+
+def _solve_quote_surface(stem, q_max, t_max, parameters=None, solver=QUOTE_SURFACE_SOLVER):
+    """
+    Quote surface of stem solved on a one second grid up to q_max and
+    t_max, at least one second so that a zero time to go reads the
+    terminal quote.
+    """
+    t_max = max(t_max, 1)
+    time_to_go, delta = optimal_limit_order_surface(
+        q_max=q_max,
+        t_max=t_max,
+        time_steps=math.ceil(t_max) + 1,
+        solver=solver,
+        **get_model_parameters(stem, parameters))
+    return QuoteSurface(None, time_to_go, delta)
+
+
+def build_quote_surfaces(stems=None):
+    published_parameters = get_published_parameters()
+    stems = stems or [stem for stem, future in FUTURES.items()
+                      if 'ExecutionParameters' in future or stem in published_parameters]
+    return {stem: get_quote_surface(stem) for stem in stems}
+
+
+def get_optimal_quote(stem, quantity, time_in_seconds, solver=QUOTE_SURFACE_SOLVER, parameters=None):
+    """
+    Optimal quote in price units from the stem's quote surface when it
+    covers the order, otherwise solved with the effective solver for the
+    order's q, so that both paths agree.
+    """
+    average_trading_size = (parameters or get_execution_parameters(stem))['ats']
     tick_size = FUTURES[stem]['TickSize']
-    gamma = 5e-4 / tick_size
-    quote = optimal_limit_order_formula(
-        q_max=math.ceil(quantity / average_trading_size),
-        t_max=time_in_seconds,
-        mu=0,
-        sigma=parameters['sigma'],
-        A=parameters['A'],
-        k=parameters['k'],
-        gamma=gamma,
-        b=parameters['b'])
+    q_max = max(math.ceil(quantity / average_trading_size), 1)
+    surface = get_quote_surface(stem, parameters)
+    if surface.contains(q_max, time_in_seconds):
+        quote = surface.lookup(q_max, time_in_seconds)
+    else:
+        quote = optimal_limit_order_formula(
+            q_max=q_max,
+            t_max=time_in_seconds,
+            solver=get_solver(q_max, solver),
+            **get_model_parameters(stem, parameters))
     return quote * tick_size
 
 
+class QuoteSchedule():
+    """
+    Optimal quotes of one parent order for every remaining quantity and
+    time to go, from a single solve. get_quote(quantity, time_in_seconds)
+    is a lookup in price units, quantities and times beyond the parent
+    order being clamped to it.
+    """
+
+    def __init__(self, surface, average_trading_size, tick_size):
+        self.surface = surface
+        self.average_trading_size = average_trading_size
+        self.tick_size = tick_size
+
+    def get_quote(self, quantity, time_in_seconds):
+        q = min(max(math.ceil(quantity / self.average_trading_size), 1),
+                self.surface.q_max)
+        time_in_seconds = min(max(time_in_seconds, 0), self.surface.t_max)
+        return self.surface.lookup(q, time_in_seconds) * self.tick_size
+
+
+def get_quote_schedule(stem, quantity, time_in_seconds, parameters=None, solver=QUOTE_SURFACE_SOLVER):
+    """
+    Quote schedule of a parent order: the stem's quote surface when it
+    covers the order, otherwise one solve on a one second grid for the
+    order's q and time to go, a zero time to go giving the terminal quote.
+    """
+    average_trading_size = (parameters or get_execution_parameters(stem))['ats']
+    tick_size = FUTURES[stem]['TickSize']
+    q_max = max(math.ceil(quantity / average_trading_size), 1)
+    surface = get_quote_surface(stem, parameters)
+    if not surface.contains(q_max, time_in_seconds):
+        surface = _solve_quote_surface(
+            stem, q_max, max(time_in_seconds, 0), parameters, solver)
+    return QuoteSchedule(surface, average_trading_size, tick_size)
+
+
+def get_optimal_quotes(orders, parameters=None, solver=QUOTE_SURFACE_SOLVER):
+    """
+    orders : frame or records with stem, quantity and seconds columns
+    parameters : {stem: ExecutionParameters} overriding the deployed ones
+
+    Prices every order at once. Orders of a stem are looked up on its
+    quote surface; those outside it are priced on one surface solved for
+    the largest q and time to go of the stem. As in QuoteSchedule, q is at
+    least one and time to go at least zero. Returns the orders with the
+    quote in ticks, the buy and sell offsets to the mid in price units
+    and the currency.
+    """
+    orders = pd.DataFrame(orders).reset_index(drop=True)
+    parameters = parameters or {}
+    quote_ticks = np.full(orders.shape[0], np.nan)
+    q = np.zeros(orders.shape[0], dtype=int)
+    tick_sizes = np.full(orders.shape[0], np.nan)
+    currencies = np.empty(orders.shape[0], dtype=object)
+    for stem, group in orders.groupby('stem', sort=False):
+        stem_parameters = parameters.get(stem)
+        average_trading_size = (stem_parameters or get_execution_parameters(stem))['ats']
+        rows = group.index.to_numpy()
+        quantities = group['quantity'].to_numpy(dtype=float)
+        if (quantities < 0).any():
+            raise ValueError(f'Negative quantity for {stem}, quantities are unsigned')
+        group_q = np.maximum(np.ceil(quantities / average_trading_size), 1).astype(int)
+        seconds = np.maximum(group['seconds'].to_numpy(dtype=float), 0)
+        surface = get_quote_surface(stem, stem_parameters)
+        inside = surface.contains_many(group_q, seconds)
+        quote_ticks[rows[inside]] = surface.lookup_many(group_q[inside], seconds[inside])
+        if not inside.all():
+            outside_surface = _solve_quote_surface(
+                stem, group_q[~inside].max(), seconds[~inside].max(), stem_parameters, solver)
+            quote_ticks[rows[~inside]] = outside_surface.lookup_many(
+                group_q[~inside], seconds[~inside])
+        q[rows] = group_q
+        tick_sizes[rows] = FUTURES[stem]['TickSize']
+        currencies[rows] = FUTURES[stem]['Currency']
+    quotes = quote_ticks * tick_sizes
+    return orders.assign(
+        q=q,
+        quote_ticks=quote_ticks,
+        buy_offset=-quotes,
+        sell_offset=quotes,
+        currency=currencies)
+
+
 @click.command()
 @click.option('--stem', default=None)
 @click.option('--quantity', default=1)
 @click.option('--seconds', default=300)
-def main(stem, quantity, seconds):
+@click.option('--solver', default=QUOTE_SURFACE_SOLVER, type=click.Choice([*SOLVERS, LOG_SPACE_SOLVER]),
+              help=f'Solver up to {LOG_SPACE_Q} ATS, the log space solver being used above')
+@click.option('--build-surfaces', is_flag=True, default=False)
+@click.option('--accuracy-report', is_flag=True, default=False,
+              help='Compare the large q pricing modes to the exact solver for stem')
+@click.option('--orders', 'orders_path', default=None,
+              help='CSV of orders with stem, quantity and seconds columns')
+@click.option('--output', default=None, help='CSV written in batch mode')
+def main(stem, quantity, seconds, solver, build_surfaces, accuracy_report, orders_path, output):
+    if build_surfaces:
+        surfaces = build_quote_surfaces([stem] if stem else None)
+        print(f'quote surfaces built for {",".join(surfaces)}')
+        return
+    if accuracy_report:
+        report = get_accuracy_report(ACCURACY_REPORT_Q, ACCURACY_REPORT_SECONDS,
+                                     **get_model_parameters(stem))
+        print(report.to_string(index=False, float_format='{:.4f}'.format))
+        return
+    if orders_path:
+        quotes = get_optimal_quotes(pd.read_csv(orders_path))
+        if output:
+            quotes.to_csv(output, index=False)
+        else:
+            print(quotes.to_string(index=False))
+        return
     quote = get_optimal_quote(
-        stem=stem, quantity=quantity, time_in_seconds=seconds)
+        stem=stem, quantity=quantity, time_in_seconds=seconds, solver=solver)
     currency = FUTURES[stem]['Currency']
     buy_sign = '-' if np.sign(-1 * quote) < 0 else '+'
     sell_sign = '-' if np.sign(quote) < 0 else '+'
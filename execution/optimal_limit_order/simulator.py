@@ -0,0 +1,294 @@
+import click
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, timedelta
+import math
+import numpy as np
+import pandas as pd
+from pprint import pprint
+from tqdm import tqdm
+
+from common.data.constants import FUTURES
+from common.execution.brokers.order_manager import DECAY, FILL, QUOTE, RepricingPolicy, round_to_tick
+from common.execution.optimal_limit_order.estimators import filter_opening_hours, get_calibration_ric, get_quotes, get_trades
+from common.execution.optimal_limit_order.pricer import get_quote_schedule
+
+NANOSECONDS = 1e9
+ORDER_INTERVAL_SECONDS = 600
+
+
+def get_events(quotes, trades):
+    """
+    Merge quotes and trades into time ordered arrays where every event
+    carries the prevailing top of book. Missing sizes are read as zero.
+    """
+    quote_columns = ['BID', 'BIDSIZE', 'ASK', 'ASKSIZE']
+    quotes = quotes.reindex(columns=quote_columns)
+    trades = trades.reindex(columns=['TRDPRC_1', 'COUNT'])
+    events = pd.concat([quotes, trades], sort=False)
+    events = events[~events.index.isna()]
+    order = np.argsort(events.index.asi8, kind='stable')
+    events = events.iloc[order]
+    events[quote_columns] = events[quote_columns].ffill()
+    return {
+        'time': events.index.asi8,
+        'bid': events['BID'].to_numpy(dtype=float),
+        'bid_size': np.nan_to_num(events['BIDSIZE'].to_numpy(dtype=float)),
+        'ask': events['ASK'].to_numpy(dtype=float),
+        'ask_size': np.nan_to_num(events['ASKSIZE'].to_numpy(dtype=float)),
+        'price': events['TRDPRC_1'].to_numpy(dtype=float),
+        'size': np.nan_to_num(events['COUNT'].to_numpy(dtype=float)),
+    }
+
+
+class SimulatedOrder():
+    """
+    Parent limit order replayed against historical events with the same
+    repricing triggers as LimitOrderManager: after the deadline it is
+    repriced with zero time to go on quotes and fills for
+    policy.cancel_after seconds, then cancelled. The order joins the back of
+    the queue at its price: trades at or through the price first consume
+    the quantity ahead, then fill the order up to their size, a trade
+    without size filling all of it.
+    """
+
+    def __init__(self, events, action, quantity, time_in_seconds, get_quote, tick_size, policy):
+        self.events = events
+        self.action = action
+        self.quantity = quantity
+        self.time_in_seconds = time_in_seconds
+        self.get_quote = get_quote
+        self.tick_size = tick_size
+        self.policy = policy
+        self.price = None
+        self.queue_ahead = 0
+        self.filled = 0
+        self.cost = 0
+        self.fill_time = None
+        self.repricings = {QUOTE: 0, FILL: 0, DECAY: 0}
+
+    def _fill(self, quantity, price, time):
+        quantity = min(quantity, self.quantity - self.filled)
+        if quantity <= 0:
+            return False
+        self.filled += quantity
+        self.cost += quantity * price
+        if self.filled >= self.quantity:
+            self.fill_time = time
+        return True
+
+    def _reprice(self, i, time_to_go):
+        events = self.events
+        bid, ask = events['bid'][i], events['ask'][i]
+        if np.isnan(bid) or np.isnan(ask):
+            return False
+        delta_quote = self.get_quote(self.quantity - self.filled, time_to_go)
+        price = bid - delta_quote if self.action == 'BUY' else ask + delta_quote
+        price = round_to_tick(price, self.tick_size, self.action)
+        self.priced_mid = (bid + ask) / 2
+        if price == self.price:
+            return False
+        self.price = price
+        if self.action == 'BUY':
+            if price >= ask:
+                return self._fill(events['ask_size'][i] or math.inf, ask, events['time'][i])
+            self.queue_ahead = 0 if price > bid else events['bid_size'][i]
+        else:
+            if price <= bid:
+                return self._fill(events['bid_size'][i] or math.inf, bid, events['time'][i])
+            self.queue_ahead = 0 if price < ask else events['ask_size'][i]
+        return False
+
+    def _match(self, i):
+        events = self.events
+        time = events['time'][i]
+        trade_price = events['price'][i]
+        sign = 1 if self.action == 'BUY' else -1
+        if not np.isnan(trade_price):
+            if sign * (self.price - trade_price) >= 0:
+                size = events['size'][i] or math.inf
+                available = size - self.queue_ahead
+                self.queue_ahead = max(self.queue_ahead - size, 0)
+                if available > 0:
+                    return self._fill(available, self.price, time)
+            return False
+        touch = events['ask'][i] if self.action == 'BUY' else events['bid'][i]
+        if sign * (self.price - touch) >= 0:
+            touch_size = events['ask_size'][i] if self.action == 'BUY' else events['bid_size'][i]
+            return self._fill(touch_size or math.inf, self.price, time)
+        same_side = events['bid'][i] if self.action == 'BUY' else events['ask'][i]
+        if same_side == self.price:
+            same_side_size = events['bid_size'][i] if self.action == 'BUY' else events['ask_size'][i]
+            self.queue_ahead = min(self.queue_ahead, same_side_size)
+        return False
+
+    def run(self, start):
+        events = self.events
+        times = events['time']
+        start_time = times[start]
+        if np.isnan(events['bid'][start]) or np.isnan(events['ask'][start]):
+            return None
+        deadline = start_time + self.time_in_seconds * NANOSECONDS
+        end = np.searchsorted(times, deadline + self.policy.cancel_after * NANOSECONDS, side='right')
+        self.arrival_mid = (events['bid'][start] + events['ask'][start]) / 2
+        last_repricings = {QUOTE: -math.inf, FILL: -math.inf, DECAY: -math.inf}
+        minimum_intervals = {trigger: interval * NANOSECONDS for trigger, interval
+                             in self.policy.minimum_intervals.items()}
+        decay_interval = self.policy.decay_interval * NANOSECONDS
+        next_decay = start_time + decay_interval
+        quote_threshold = self.policy.quote_threshold * self.tick_size
+        pending = set()
+        is_final = False
+        filled = self._reprice(start, self.time_in_seconds)
+        for i in range(start + 1, end):
+            if self.fill_time is not None:
+                break
+            now = times[i]
+            if filled:
+                pending.add(FILL)
+                filled = False
+            if not is_final and now >= deadline:
+                filled = self._reprice(i, 0)
+                is_final = True
+            else:
+                if not is_final and now >= next_decay:
+                    pending.add(DECAY)
+                    next_decay = now + decay_interval
+                mid = (events['bid'][i] + events['ask'][i]) / 2
+                if abs(mid - self.priced_mid) >= quote_threshold:
+                    pending.add(QUOTE)
+                eligible = [trigger for trigger in pending
+                            if now - last_repricings[trigger] >= minimum_intervals[trigger]]
+                if len(eligible) > 0:
+                    filled = self._reprice(i, max(deadline - now, 0) / NANOSECONDS)
+                    for trigger in eligible:
+                        last_repricings[trigger] = now
+                        self.repricings[trigger] += 1
+                    pending.clear()
+            if self.fill_time is None:
+                filled = self._match(i) or filled
+        return self.get_report(start_time)
+
+    def get_report(self, start_time):
+        average_price = self.cost / self.filled if self.filled > 0 else np.nan
+        sign = 1 if self.action == 'BUY' else -1
+        return {
+            'start': pd.Timestamp(start_time),
+            'action': self.action,
+            'quantity': self.quantity,
+            'filled': self.filled,
+            'fill_ratio': self.filled / self.quantity,
+            'arrival_mid': self.arrival_mid,
+            'average_price': average_price,
+            'slippage_ticks': sign * (average_price - self.arrival_mid) / self.tick_size,
+            'time_to_fill': (self.fill_time - start_time) / NANOSECONDS
+            if self.fill_time is not None else np.nan,
+            **{f'{trigger}_repricings': count for trigger, count in self.repricings.items()},
+        }
+
+
+def simulate_orders(events, stem, quantity, time_in_seconds, tick_size, parameters=None, policy=None, interval_seconds=ORDER_INTERVAL_SECONDS):
+    """
+    Replay one parent order every interval_seconds, alternating buys and
+    sells, and return one report row per order.
+    """
+    policy = policy or RepricingPolicy()
+    schedule = get_quote_schedule(stem, quantity, time_in_seconds, parameters)
+
+    times = events['time']
+    if len(times) == 0:
+        return pd.DataFrame()
+    last_start = times[-1] - time_in_seconds * NANOSECONDS
+    starts = np.arange(times[0], last_start, interval_seconds * NANOSECONDS)
+    reports = []
+    for n, start in enumerate(np.searchsorted(times, starts)):
+        action = 'BUY' if n % 2 == 0 else 'SELL'
+        order = SimulatedOrder(events, action, quantity, time_in_seconds,
+                               schedule.get_quote, tick_size, policy)
+        report = order.run(start)
+        if report is not None:
+            reports.append(report)
+    return pd.DataFrame(reports)
+
+
+def simulate_day(stem, day, quantity, time_in_seconds, parameters=None, policy=None):
+    ric = get_calibration_ric(stem)
+    quotes = get_quotes(ric, day)
+    trades = get_trades(ric, day)
+    if quotes is None or trades is None:
+        return None
+    events = get_events(filter_opening_hours(ric, quotes),
+                        filter_opening_hours(ric, trades))
+    reports = simulate_orders(events, stem, quantity, time_in_seconds,
+                              FUTURES[stem]['TickSize'], parameters, policy)
+    reports['stem'] = stem
+    reports['day'] = day
+    return reports
+
+
+def _run_simulation_job(job):
+    try:
+        return job, simulate_day(*job), None
+    except Exception as e:
+        return job, None, repr(e)
+
+
+def summarize(reports):
+    def summary(group):
+        return pd.Series({
+            'orders': len(group),
+            'fill_ratio': group['filled'].sum() / group['quantity'].sum(),
+            'slippage_ticks': np.average(group['slippage_ticks'].fillna(0),
+                                         weights=group['filled']) if group['filled'].sum() > 0 else np.nan,
+            'median_time_to_fill': group['time_to_fill'].median(),
+        })
+    return reports.groupby('stem').apply(summary)
+
+
+def simulate(stems, start_date, end_date, quantity, time_in_seconds, parameters=None, policy=None, workers=None):
+    """
+    Replay every (stem, day) on a process pool. parameters maps stems to
+    candidate ExecutionParameters; stems without candidates use the
+    deployed ones.
+    """
+    parameters = parameters or {}
+    jobs = []
+    for stem in stems:
+        for i in range((end_date - start_date).days + 1):
+            day = start_date + timedelta(days=i)
+            if day.weekday() in [5, 6]:
+                continue
+            jobs.append((stem, day, quantity, time_in_seconds,
+                         parameters.get(stem), policy))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(_run_simulation_job, job) for job in jobs]
+        results = [future.result() for future in
+                   tqdm(as_completed(futures), total=len(futures))]
+    reports = []
+    for (stem, day, *_), report, error in results:
+        if error is not None:
+            print(f'{stem} {day}: {error}')
+        elif report is not None and report.shape[0] > 0:
+            reports.append(report)
+    if len(reports) == 0:
+        return pd.DataFrame()
+    return pd.concat(reports, ignore_index=True)
+
+
+@click.command()
+@click.option('--stems', default=','.join(list(FUTURES.keys())))
+@click.option('--days', default=5)
+@click.option('--quantity', default=1)
+@click.option('--seconds', default=300)
+@click.option('--workers', default=None, type=int)
+def main(stems, days, quantity, seconds, workers):
+    end_date = date.today() - timedelta(days=1)
+    start_date = end_date - timedelta(days=days - 1)
+    stems = [stem for stem in stems.split(',') if get_calibration_ric(stem)]
+    reports = simulate(stems, start_date, end_date, quantity, seconds,
+                       workers=workers)
+    if reports.shape[0] > 0:
+        pprint(summarize(reports).to_dict(orient='index'))
+
+
+if __name__ == '__main__':
+    main()  # pylint: disable=no-value-for-parameter
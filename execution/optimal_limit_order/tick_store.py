@@ -0,0 +1,119 @@
+import json
+import os
+import shutil
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+TICK_STORE_DIRECTORY = os.path.join(
+    os.path.expanduser('~'), '.cache', 'execution', 'ticks')
+QUOTES = 'quotes'
+TRADES = 'trades'
+INDEX_FILE = '_index.npy'
+META_FILE = '_meta.json'
+
+
+def get_partition_path(kind, ric, day):
+    return os.path.join(TICK_STORE_DIRECTORY, kind, ric, day.isoformat())
+
+
+def has_ticks(kind, ric, day):
+    return os.path.exists(os.path.join(get_partition_path(kind, ric, day), META_FILE))
+
+
+def write_ticks(kind, ric, day, frame):
+    """
+    Store one (ric, day) partition as one .npy file per column plus the
+    index as int64 nanoseconds, so that reads can be memory-mapped.
+    """
+    path = get_partition_path(kind, ric, day)
+    temporary_path = f'{path}.{os.getpid()}.tmp'
+    if os.path.exists(temporary_path):
+        shutil.rmtree(temporary_path)
+    os.makedirs(temporary_path)
+    frame = frame.sort_index()
+    index = pd.DatetimeIndex(frame.index)
+    if index.tz is not None:
+        index = index.tz_convert('UTC').tz_localize(None)
+    np.save(os.path.join(temporary_path, INDEX_FILE),
+            index.values.astype('datetime64[ns]').view('int64'))
+    columns = []
+    for column in frame.columns:
+        values = frame[column].to_numpy()
+        if not np.issubdtype(values.dtype, np.number):
+            values = pd.to_numeric(frame[column], errors='coerce').to_numpy()
+        np.save(os.path.join(temporary_path, f'{column}.npy'), values)
+        columns.append(column)
+    with open(os.path.join(temporary_path, META_FILE), 'w') as f:
+        json.dump({'columns': columns, 'rows': len(index)}, f)
+    if os.path.exists(path):
+        shutil.rmtree(path)
+    os.replace(temporary_path, path)
+
+
+def _to_nanoseconds(timestamp):
+    timestamp = pd.Timestamp(timestamp)
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.tz_convert('UTC').tz_localize(None)
+    return timestamp.value
+
+
+def read_tick_arrays(kind, ric, day, columns=None, start=None, end=None):
+    """
+    Memory-mapped (index, {column: values}) of one partition, index being
+    int64 UTC nanoseconds, optionally restricted to start <= timestamp <=
+    end (naive UTC) and to columns. Returns None when the partition has
+    not been stored.
+    """
+    path = get_partition_path(kind, ric, day)
+    if not has_ticks(kind, ric, day):
+        return None
+    with open(os.path.join(path, META_FILE)) as f:
+        stored_columns = json.load(f)['columns']
+    index = np.load(os.path.join(path, INDEX_FILE), mmap_mode='r')
+    first = 0 if start is None else np.searchsorted(
+        index, _to_nanoseconds(start), side='left')
+    last = len(index) if end is None else np.searchsorted(
+        index, _to_nanoseconds(end), side='right')
+    data = {}
+    for column in stored_columns if columns is None else columns:
+        if column not in stored_columns:
+            continue
+        values = np.load(os.path.join(path, f'{column}.npy'), mmap_mode='r')
+        data[column] = values[first:last]
+    return index[first:last], data
+
+
+def read_ticks(kind, ric, day, start=None, end=None):
+    """
+    Memory-mapped read of one partition, optionally restricted to
+    start <= timestamp <= end (naive UTC). Returns None when the partition
+    has not been stored.
+    """
+    arrays = read_tick_arrays(kind, ric, day, start=start, end=end)
+    if arrays is None:
+        return None
+    index, data = arrays
+    return pd.DataFrame(
+        data=data,
+        index=pd.DatetimeIndex(index.view('datetime64[ns]')),
+        copy=False)
+
+
+def query_ticks(kind, ric, start, end):
+    """
+    Ticks of ric between two datetimes (naive UTC) across day partitions.
+    Days that are not stored are skipped.
+    """
+    frames = []
+    day = pd.Timestamp(start).date()
+    last_day = pd.Timestamp(end).date()
+    while day <= last_day:
+        frame = read_ticks(kind, ric, day, start=start, end=end)
+        if frame is not None and frame.shape[0] > 0:
+            frames.append(frame)
+        day += timedelta(days=1)
+    if len(frames) == 0:
+        return None
+    return pd.concat(frames)
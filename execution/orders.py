@@ -1,14 +1,16 @@
-import re
+import click
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, time, timedelta
+import json
+import os
 from ib_insync import *
 from pprint import pprint
 
-from common.data.constants import FUTURES
-from common.data.database import ric_to_stem
 from common.data.gdrive import get_positions
-from dateutil import tz
-from dateutil.parser import parse
+from common.execution.session import get_positions as get_ib_positions
+from common.execution.symbology import get_symbology
+from common.execution.trading_hours import get_local_session
 import pytz
-from tqdm import tqdm
 
 
 util.startLoop()
@@ -20,94 +22,118 @@ STRATEGIES = [
     'Momentum',
     #'Trend Following'
 ]
-PORT_LIVE = 7496
-
-
-def get_month_letter(month):
-    if month == 'JAN':
-        return 'F'
-    if month == 'FEB':
-        return 'G'
-    if month == 'MAR':
-        return 'H'
-    if month == 'APR':
-        return 'J'
-    if month == 'MAY':
-        return 'K'
-    if month == 'JUN':
-        return 'M'
-    if month == 'JUL':
-        return 'N'
-    if month == 'AUG':
-        return 'Q'
-    if month == 'SEP':
-        return 'U'
-    if month == 'OCT':
-        return 'V'
-    if month == 'NOV':
-        return 'X'
-    if month == 'DEC':
-        return 'Z'
-    raise Exception('Month does not exist')
-
-
-def convert_local_symbol(local_symbol):
-    if ' ' in local_symbol:
-        tokens = local_symbol.split(' ')
-        return tokens[0] + get_month_letter(tokens[-2]) + tokens[-1][1] + '^2'
-    elif ' ' not in local_symbol and '.' not in local_symbol:
-        return local_symbol + '^2'
-    return local_symbol
-
-
-def get_prefix(symbol):
-    if symbol in ['BO', 'C', 'HG', 'O', 'RR', 'SI', 'W']:
-        return '1'
-    return ''
+POSITIONS_DIRECTORY = os.path.join(
+    os.path.expanduser('~'), '.cache', 'execution', 'positions')
+# Strategy DAGs are scheduled at 00:06 UTC and publish the positions dated
+# the previous trading day once they succeed
+POSITIONS_TIMEZONE = 'UTC'
+POSITIONS_PUBLICATION_TIME = time(0, 6)
+# Lifetime of a snapshot not yet holding the expected trading date
+POSITIONS_TTL = timedelta(minutes=5)
 
 
 def get_positions_from_ib():
-    ib = IB()
-    ib.connect('127.0.0.1', PORT_LIVE, clientId=1)
+    ib_positions = [position for position in get_ib_positions()
+                    if position['symbol'] not in CURRENCIES]
+    keys = get_symbology().from_ib_positions(
+        [position['symbol'] for position in ib_positions],
+        [position['localSymbol'] for position in ib_positions])
     positions = {}
-    for position in ib.positions():
-        symbol = position.contract.symbol
-        if symbol in CURRENCIES:
-            continue
-        local_symbol = convert_local_symbol(position.contract.localSymbol)
-        prefix = get_prefix(symbol)
-        ric = prefix + local_symbol
-        ric = re.sub('^GOIL', 'LGO', ric)
-        ric = re.sub('^ETH', 'HTE', ric)
-        positions[ric] = positions.get(ric, 0) + position.position
+    for key, position in zip(keys, ib_positions):
+        positions[key] = positions.get(key, 0) + position['position']
     return positions
 
 
-def ric_to_ib_ticker(ric):
-    stem = ric_to_stem(ric)
-    ib_stem = FUTURES[stem]['Stem']['InteractiveBrokers']
-    if stem == 'BO':
-        return re.sub('^1BO', ib_stem, ric)
-    if stem == 'O':
-        return re.sub('^1O', ib_stem, ric)
-    if stem == 'RR':
-        ticker = re.sub('^1RR', ib_stem, ric)
-        return re.sub('^RR', ib_stem, ticker)
-    if stem == 'S':
-        return re.sub('^S', ib_stem, ric)
-    if stem == 'SI':
-        return re.sub('^1SIRT', "1" + ib_stem, ric)
-    if stem == 'W':
-        return re.sub('^W', '1W', ric)
-    return ric
-
-
-def get_positions_from_airflow():
-    positions = {}
-    for strategy in tqdm(STRATEGIES):
-        positions_of_strategy = get_positions(strategy) \
-            .set_index('Date').tail(1).to_dict(orient='records')[0]
-        for key, value in positions_of_strategy.items():
+def get_last_publication(now=None):
+    """
+    Time of the last daily publication of strategy positions, when the
+    strategy DAGs start.
+    """
+    local_tz = pytz.timezone(POSITIONS_TIMEZONE)
+    now = now or datetime.now(local_tz)
+    publication = local_tz.localize(
+        datetime.combine(now.astimezone(local_tz).date(), POSITIONS_PUBLICATION_TIME))
+    if publication > now:
+        publication -= timedelta(days=1)
+    return publication
+
+
+def get_expected_date(now=None):
+    """
+    Trading day of the positions published last, the weekday before the
+    last publication.
+    """
+    expected = get_last_publication(now).date() - timedelta(days=1)
+    while expected.weekday() >= 5:
+        expected -= timedelta(days=1)
+    return expected
+
+
+def _get_snapshot_path(strategy):
+    return os.path.join(POSITIONS_DIRECTORY, strategy.replace(' ', '_') + '.json')
+
+
+def read_cached_snapshot(strategy):
+    path = _get_snapshot_path(strategy)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def write_cached_snapshot(strategy, snapshot):
+    os.makedirs(POSITIONS_DIRECTORY, exist_ok=True)
+    path = _get_snapshot_path(strategy)
+    temporary_path = f'{path}.{os.getpid()}.tmp'
+    with open(temporary_path, 'w') as f:
+        json.dump(snapshot, f, indent=2, sort_keys=True)
+    os.replace(temporary_path, path)
+
+
+def is_fresh(snapshot, now=None):
+    """
+    Whether snapshot holds the positions of the expected trading date and
+    was fetched after the last publication. A snapshot fetched while the
+    strategy DAGs are still running only lives POSITIONS_TTL.
+    """
+    now = now or datetime.now(pytz.utc)
+    fetched = datetime.fromisoformat(snapshot['fetched'])
+    snapshot_date = datetime.fromisoformat(snapshot['date']).date()
+    if snapshot_date >= get_expected_date(now):
+        return fetched >= get_last_publication(now)
+    return now - fetched < POSITIONS_TTL
+
+
+def fetch_snapshot(strategy):
+    last_positions = get_positions(strategy).set_index('Date').tail(1)
+    return {
+        'date': str(last_positions.index[-1]),
+        'fetched': datetime.now(pytz.utc).isoformat(),
+        'positions': {key: float(value) for key, value
+                      in last_positions.iloc[-1].items()},
+    }
+
+
+def get_snapshot(strategy, refresh=False):
+    """
+    Latest positions of strategy. The cached snapshot is used while it is
+    fresh, so only the first reconciliation after the publication
+    downloads the history.
+    """
+    snapshot = None if refresh else read_cached_snapshot(strategy)
+    if snapshot is None or not is_fresh(snapshot):
+        snapshot = fetch_snapshot(strategy)
+        write_cached_snapshot(strategy, snapshot)
+    return snapshot
+
+
+def get_positions_from_airflow(refresh=False):
+    with ThreadPoolExecutor(max_workers=len(STRATEGIES)) as executor:
+        snapshots = list(executor.map(
+            lambda strategy: get_snapshot(strategy, refresh), STRATEGIES))
+    legs = []
+    for snapshot in snapshots:
+        for key, value in snapshot['positions'].items():
             value = round(value)
             if value == 0:
                 continue
@@ -116,43 +142,58 @@ def get_positions_from_airflow():
                 rics[1] = rics[0][:-2] + rics[1]
             values = [-value, value] if len(rics) == 2 else [value]
             rics = [r if '^' in r else r + '^2' for r in rics]
-            for index, ric in enumerate(rics):
-                ticker = ric_to_ib_ticker(ric)
-                positions[ticker] = positions.get(ticker, 0) + values[index]
+            legs.extend(zip(rics, values))
+    tickers = get_symbology().to_ib_tickers([ric for ric, _ in legs])
+    positions = {}
+    for ticker, (_, value) in zip(tickers, legs):
+        positions[ticker] = positions.get(ticker, 0) + value
     return positions
 
 
 def convert_time(stem):
-    tzinfos = {
-        'CT': tz.gettz('US/Central'),
-        'ET': tz.gettz('US/Eastern')
-    }
-    local_tz = pytz.timezone('Europe/Paris')
-    hours = FUTURES[stem]['Hours']
-    from_time, to_time = hours.split(' - ')
-    from_time += ' ' + hours.split(' ')[-1]
-    from_time = parse(from_time, tzinfos=tzinfos).astimezone(local_tz).time()
-    to_time = parse(to_time, tzinfos=tzinfos).astimezone(local_tz).time()
+    from_time, to_time = get_local_session(stem, pytz.timezone('Europe/Paris'))
     return f'{from_time} - {to_time}'
 
 
-def main():
+def get_differences(refresh=False):
+    """
+    Contracts whose IB position differs from the strategies' position, as
+    dicts with key, stem, position_ib and position_airflow.
+    """
     positions_ib = get_positions_from_ib()
-    positions_airflow = get_positions_from_airflow()
+    positions_airflow = get_positions_from_airflow(refresh)
+    symbology = get_symbology()
     keys = sorted(list(set(list(positions_ib.keys()) +
                            list(positions_airflow.keys()))))
+    differences = []
     for key in keys:
         position_ib = positions_ib.get(key, 0)
         position_airflow = positions_airflow.get(key, 0)
         if position_ib == position_airflow:
             continue
-        ric = re.sub('^ZL', 'BO', key)
-        ric = re.sub('^ZO', 'O', ric)
-        ric = re.sub('^ZS', 'S', ric)
-        stem = ric_to_stem(ric)
+        differences.append({
+            'key': key,
+            'stem': symbology.get_key_stem(key),
+            'position_ib': position_ib,
+            'position_airflow': position_airflow,
+        })
+    return differences
+
+
+def reconcile(refresh=False):
+    for difference in get_differences(refresh):
+        stem = difference['stem']
         open_time = convert_time(stem)
-        print(f'({open_time}) {stem}: {key}: {position_ib} -> {position_airflow}')
+        print(f'({open_time}) {stem}: {difference["key"]}: '
+              f'{difference["position_ib"]} -> {difference["position_airflow"]}')
+
+
+@click.command()
+@click.option('--refresh', is_flag=True, default=False,
+              help='Download strategy positions even if cached')
+def main(refresh):
+    reconcile(refresh)
 
 
 if __name__ == '__main__':
-    main()
+    main()  # pylint: disable=no-value-for-parameter
@@ -0,0 +1,134 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+import os
+from pprint import pprint
+
+import click
+from ib_insync import Future, util
+
+from common.data.constants import FUTURES
+from common.execution.brokers.contracts import ContractRegistry
+from common.execution.brokers.interactive_brokers import InteractiveBrokers
+from common.execution.orders import get_differences
+from common.execution.session import EXECUTION_CLIENT_ID, get_ib
+from common.execution.symbology import get_symbology
+from common.execution.trading_hours import get_next_open
+
+FUTURE_CONTRACTS_FILE = os.path.join(
+    os.path.expanduser('~'), '.cache', 'execution', 'future_contracts.json')
+REBALANCE_SECONDS = 300
+OPEN_DELAY_SECONDS = 60
+HORIZON_HOURS = 24
+
+
+def get_future_contract(key):
+    symbology = get_symbology()
+    stem = symbology.get_key_stem(key)
+    return Future(currency=FUTURES[stem]['Currency'], **symbology.to_contract_fields(key))
+
+
+def get_child_orders(differences):
+    return [{
+        'ticker': difference['key'],
+        'stem': difference['stem'],
+        'size': difference['position_airflow'] - difference['position_ib'],
+    } for difference in differences]
+
+
+def schedule(child_orders, now=None, open_delay_seconds=OPEN_DELAY_SECONDS, horizon_hours=HORIZON_HOURS):
+    """
+    Returns (batches, deferred): batches maps a start time to the child
+    orders sent together at that time, now for open markets and shortly
+    after the next open otherwise. Orders whose market does not open
+    within horizon_hours are deferred to a later run.
+    """
+    now = now or datetime.now(timezone.utc)
+    horizon = now + timedelta(hours=horizon_hours)
+    batches = {}
+    deferred = []
+    for child_order in child_orders:
+        next_open = get_next_open(child_order['stem'], now)
+        if next_open is None or next_open > horizon:
+            deferred.append(child_order)
+            continue
+        start = now if next_open == now else \
+            next_open + timedelta(seconds=open_delay_seconds)
+        batches.setdefault(start, []).append(child_order)
+    return batches, deferred
+
+
+async def execute_batches(broker, batches, time_in_seconds=REBALANCE_SECONDS):
+    """
+    Send every batch as a basket at its start time, batches waiting for
+    their open concurrently, and return the fill reports of all orders.
+    """
+
+    async def execute_batch(start, child_orders):
+        delay = (start - datetime.now(timezone.utc)).total_seconds()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return await broker.execute_basket_async(
+            {child_order['ticker']: child_order['size'] for child_order in child_orders},
+            time_in_seconds,
+            stems={child_order['ticker']: child_order['stem'] for child_order in child_orders})
+
+    results = await asyncio.gather(
+        *[execute_batch(start, child_orders) for start, child_orders in batches.items()])
+    return [report for reports in results for report in reports]
+
+
+def rebalance(broker=None, time_in_seconds=REBALANCE_SECONDS, horizon_hours=HORIZON_HOURS, stems=None, client_id=EXECUTION_CLIENT_ID,
+              latency_path=None):
+    """
+    Turn the reconciliation differences into child orders and work them
+    through InteractiveBrokers, waiting for the open of closed markets.
+    Live orders are always sized from freshly fetched strategy positions.
+    stems restricts the orders to the differences of those stems, so that
+    concurrent rebalances on distinct client_id each work their own slice.
+    latency_path is where the order latencies are exported after every basket.
+    """
+    if broker is None:
+        ib = get_ib(client_id)
+        broker = InteractiveBrokers(ib, contracts=ContractRegistry(
+            ib, FUTURE_CONTRACTS_FILE, get_future_contract), latency_path=latency_path)
+    differences = get_differences(refresh=True)
+    if stems is not None:
+        differences = [difference for difference in differences if difference['stem'] in stems]
+    child_orders = get_child_orders(differences)
+    batches, deferred = schedule(child_orders, horizon_hours=horizon_hours)
+    reports = util.run(execute_batches(broker, batches, time_in_seconds))
+    return reports, deferred
+
+
+def print_schedule(batches, deferred):
+    for start, child_orders in sorted(batches.items()):
+        for child_order in child_orders:
+            print(f'{start:%Y-%m-%d %H:%M %Z} {child_order["stem"]}: '
+                  f'{child_order["ticker"]} {child_order["size"]:+}')
+    for child_order in deferred:
+        print(f'deferred {child_order["stem"]}: '
+              f'{child_order["ticker"]} {child_order["size"]:+}')
+
+
+@click.command()
+@click.option('--refresh', is_flag=True, default=False,
+              help='Fetch the strategy positions again, always done with --execute')
+@click.option('--seconds', default=REBALANCE_SECONDS)
+@click.option('--horizon-hours', default=HORIZON_HOURS)
+@click.option('--execute', is_flag=True, default=False,
+              help='Send the orders instead of printing the schedule')
+@click.option('--latency-path', default=None,
+              help='Export the order latencies to this file, Prometheus text for .prom and JSON otherwise')
+def main(refresh, seconds, horizon_hours, execute, latency_path):
+    if not execute:
+        child_orders = get_child_orders(get_differences(refresh))
+        print_schedule(*schedule(child_orders, horizon_hours=horizon_hours))
+        return
+    reports, deferred = rebalance(time_in_seconds=seconds, horizon_hours=horizon_hours,
+                                  latency_path=latency_path)
+    pprint(reports)
+    print_schedule({}, deferred)
+
+
+if __name__ == '__main__':
+    main()  # pylint: disable=no-value-for-parameter
@@ -0,0 +1,192 @@
+import asyncio
+import json
+import socket
+
+import click
+from ib_insync import IB, util
+
+HOST = '127.0.0.1'
+PORT_LIVE = 7496
+SESSION_PORT = 7600
+SESSION_CLIENT_ID = 10
+EXECUTION_CLIENT_ID = 1
+RECONCILIATION_CLIENT_ID = 2
+RECONNECT_SECONDS = 5
+
+_connections = {}
+
+
+def get_ib(client_id=EXECUTION_CLIENT_ID, port=PORT_LIVE):
+    """
+    Process-wide IB connection per clientId, connected on first use and
+    reconnected if it dropped.
+    """
+    ib = _connections.get(client_id)
+    if ib is None or not ib.isConnected():
+        ib = IB()
+        ib.connect(HOST, port, clientId=client_id)
+        _connections[client_id] = ib
+    return ib
+
+
+def serialize_position(position):
+    return {
+        'account': position.account,
+        'symbol': position.contract.symbol,
+        'localSymbol': position.contract.localSymbol,
+        'secType': position.contract.secType,
+        'conId': position.contract.conId,
+        'position': float(position.position),
+        'avgCost': float(position.avgCost),
+    }
+
+
+def serialize_account_value(account_value):
+    return {
+        'account': account_value.account,
+        'tag': account_value.tag,
+        'value': account_value.value,
+        'currency': account_value.currency,
+    }
+
+
+def serialize_trade(trade):
+    return {
+        'symbol': trade.contract.symbol,
+        'localSymbol': trade.contract.localSymbol,
+        'orderId': trade.order.orderId,
+        'action': trade.order.action,
+        'orderType': trade.order.orderType,
+        'totalQuantity': float(trade.order.totalQuantity),
+        'lmtPrice': float(trade.order.lmtPrice),
+        'status': trade.orderStatus.status,
+        'filled': float(trade.orderStatus.filled),
+        'remaining': float(trade.orderStatus.remaining),
+    }
+
+
+class SessionService():
+    """
+    Keeps one TWS connection open and answers line-delimited JSON requests
+    on a local socket from the state ib_insync maintains with the update
+    stream, so clients never connect to TWS themselves.
+    """
+
+    def __init__(self, ib, host=HOST, port=SESSION_PORT, tws_port=PORT_LIVE, client_id=SESSION_CLIENT_ID):
+        self.ib = ib
+        self.host = host
+        self.port = port
+        self.tws_port = tws_port
+        self.client_id = client_id
+        self.handlers = {
+            'ping': lambda: 'pong',
+            'positions': lambda: [serialize_position(p) for p in self.ib.positions()],
+            'account_values': lambda: [serialize_account_value(v) for v in self.ib.accountValues()],
+            'open_trades': lambda: [serialize_trade(t) for t in self.ib.openTrades()],
+        }
+        self.ib.disconnectedEvent += self._on_disconnected
+
+    def _on_disconnected(self):
+        asyncio.ensure_future(self._reconnect())
+
+    async def _reconnect(self):
+        while not self.ib.isConnected():
+            await asyncio.sleep(RECONNECT_SECONDS)
+            try:
+                await self.ib.connectAsync(HOST, self.tws_port, clientId=self.client_id)
+            except Exception as e:
+                print(f'reconnection failed: {e}')
+
+    def handle(self, request):
+        handler = self.handlers.get(request.get('method'))
+        if handler is None:
+            return {'error': f'Unknown method {request.get("method")}'}
+        if not self.ib.isConnected():
+            return {'error': 'Not connected to TWS'}
+        return {'result': handler()}
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    response = self.handle(json.loads(line))
+                except Exception as e:
+                    response = {'error': repr(e)}
+                writer.write((json.dumps(response) + '\n').encode())
+                await writer.drain()
+        finally:
+            writer.close()
+
+    async def serve(self):
+        server = await asyncio.start_server(
+            self._handle_connection, self.host, self.port)
+        async with server:
+            await server.serve_forever()
+
+    def run(self):
+        util.run(self.serve())
+
+
+class SessionClient():
+
+    def __init__(self, host=HOST, port=SESSION_PORT, timeout=2):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+
+    def _call(self, method):
+        with socket.create_connection((self.host, self.port), timeout=self.timeout) as connection:
+            connection.sendall((json.dumps({'method': method}) + '\n').encode())
+            with connection.makefile('r') as f:
+                response = json.loads(f.readline())
+        if 'error' in response:
+            raise RuntimeError(response['error'])
+        return response['result']
+
+    def ping(self):
+        return self._call('ping') == 'pong'
+
+    def positions(self):
+        return self._call('positions')
+
+    def account_values(self):
+        return self._call('account_values')
+
+    def open_trades(self):
+        return self._call('open_trades')
+
+
+def get_session_client():
+    client = SessionClient()
+    try:
+        client.ping()
+    except (OSError, RuntimeError):
+        return None
+    return client
+
+
+def get_positions(client_id=RECONCILIATION_CLIENT_ID):
+    """
+    Positions from the session service when it runs, otherwise from this
+    process' own connection.
+    """
+    client = get_session_client()
+    if client is not None:
+        return client.positions()
+    return [serialize_position(p) for p in get_ib(client_id).positions()]
+
+
+@click.command()
+@click.option('--port', default=SESSION_PORT)
+@click.option('--tws-port', default=PORT_LIVE)
+@click.option('--client-id', default=SESSION_CLIENT_ID)
+def main(port, tws_port, client_id):
+    ib = get_ib(client_id=client_id, port=tws_port)
+    SessionService(ib, port=port, tws_port=tws_port, client_id=client_id).run()
+
+
+if __name__ == '__main__':
+    main()  # pylint: disable=no-value-for-parameter
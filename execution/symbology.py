@@ -0,0 +1,209 @@
+from datetime import date
+
+import click
+
+from common.data.constants import FUTURES
+from common.data.database import ric_to_stem
+
+MONTH_LETTERS = {
+    'JAN': 'F', 'FEB': 'G', 'MAR': 'H', 'APR': 'J', 'MAY': 'K', 'JUN': 'M',
+    'JUL': 'N', 'AUG': 'Q', 'SEP': 'U', 'OCT': 'V', 'NOV': 'X', 'DEC': 'Z',
+}
+LETTER_MONTHS = {letter: month for month, letter in MONTH_LETTERS.items()}
+CONTRACT_MONTHS = {letter: i + 1 for i, letter in enumerate(MONTH_LETTERS.values())}
+PREFIXED_SYMBOLS = {'BO', 'C', 'HG', 'O', 'RR', 'SI', 'W'}
+CONTINUATION_SUFFIX = '^2'
+# IB roots renamed to the RIC roots of the strategies
+IB_ROOT_RENAMES = [('GOIL', 'LGO'), ('ETH', 'HTE')]
+# RIC roots by stem renamed to IB roots, {ib} being the IB stem
+RIC_ROOT_RENAMES = {
+    'BO': [('1BO', '{ib}')],
+    'O': [('1O', '{ib}')],
+    'RR': [('1RR', '{ib}'), ('RR', '{ib}')],
+    'S': [('S', '{ib}')],
+    'SI': [('1SIRT', '1{ib}')],
+    'W': [('W', '1W')],
+}
+# IB roots of reconciliation keys renamed back to RIC roots
+KEY_ROOT_RENAMES = [('ZL', 'BO'), ('ZO', 'O'), ('ZS', 'S')]
+# IB exchanges by IB root, IB resolving the exchange of the others
+IB_EXCHANGES = {
+    'ES': 'GLOBEX', 'NQ': 'GLOBEX',
+    'GC': 'COMEX', 'HG': 'COMEX', 'SI': 'COMEX',
+    'ZF': 'ECBOT', 'ZN': 'ECBOT', 'ZT': 'ECBOT', 'ZB': 'ECBOT',
+    'ZC': 'ECBOT', 'ZL': 'ECBOT', 'ZO': 'ECBOT', 'ZS': 'ECBOT', 'ZW': 'ECBOT',
+}
+
+
+def get_month_letter(month):
+    letter = MONTH_LETTERS.get(month)
+    if letter is None:
+        raise Exception('Month does not exist')
+    return letter
+
+
+def convert_local_symbol(local_symbol):
+    if ' ' in local_symbol:
+        tokens = local_symbol.split(' ')
+        return tokens[0] + get_month_letter(tokens[-2]) + tokens[-1][1] + CONTINUATION_SUFFIX
+    elif '.' not in local_symbol:
+        return local_symbol + CONTINUATION_SUFFIX
+    return local_symbol
+
+
+def get_prefix(symbol):
+    return '1' if symbol in PREFIXED_SYMBOLS else ''
+
+
+def _rename_root(symbol, renames):
+    for root, replacement in renames:
+        if symbol.startswith(root):
+            return replacement + symbol[len(root):]
+    return symbol
+
+
+class Symbology():
+    """
+    Conversions between RICs, stems, IB positions and reconciliation keys.
+    Root renames are compiled from FUTURES once and every conversion is
+    memoized by symbol, so converting a large universe again is a
+    dictionary lookup per position. ric_to_stem stays the reference for
+    stems and runs once per distinct RIC.
+    """
+
+    def __init__(self, futures=FUTURES):
+        self.futures = futures
+        self.ric_root_renames = {}
+        for stem, renames in RIC_ROOT_RENAMES.items():
+            if stem not in futures:
+                continue
+            ib_stem = futures[stem]['Stem']['InteractiveBrokers']
+            self.ric_root_renames[stem] = [
+                (root, replacement.format(ib=ib_stem)) for root, replacement in renames]
+        self._stems = {}
+        self._ib_tickers = {}
+        self._rics = {}
+        self._position_keys = {}
+
+    def get_stem(self, ric):
+        stem = self._stems.get(ric)
+        if stem is None:
+            stem = ric_to_stem(ric)
+            self._stems[ric] = stem
+        return stem
+
+    def to_ib_ticker(self, ric):
+        """
+        Reconciliation key of a strategy RIC such as 1BOM1^2.
+        """
+        ticker = self._ib_tickers.get(ric)
+        if ticker is None:
+            renames = self.ric_root_renames.get(self.get_stem(ric), [])
+            ticker = _rename_root(ric, renames)
+            self._ib_tickers[ric] = ticker
+        return ticker
+
+    def to_ric(self, key):
+        """
+        RIC of a reconciliation key, from which ric_to_stem finds the stem.
+        """
+        ric = self._rics.get(key)
+        if ric is None:
+            ric = _rename_root(key, KEY_ROOT_RENAMES)
+            self._rics[key] = ric
+        return ric
+
+    def get_key_stem(self, key):
+        return self.get_stem(self.to_ric(key))
+
+    def from_ib_position(self, symbol, local_symbol):
+        """
+        Reconciliation key of an IB position such as ZL JUL 21.
+        """
+        key = self._position_keys.get((symbol, local_symbol))
+        if key is None:
+            key = get_prefix(symbol) + convert_local_symbol(local_symbol)
+            key = _rename_root(key, IB_ROOT_RENAMES)
+            self._position_keys[(symbol, local_symbol)] = key
+        return key
+
+    def to_contract_fields(self, key, day=None):
+        """
+        IB symbol, exchange and contract month of the future of a
+        reconciliation key such as ZLN1^2, the contract month being the first
+        one ending with the digit of the key that is not before the month of
+        day.
+        """
+        symbol = key[:-len(CONTINUATION_SUFFIX)] if key.endswith(CONTINUATION_SUFFIX) else key
+        month = CONTRACT_MONTHS.get(symbol[-2])
+        if month is None or not symbol[-1].isdigit():
+            raise Exception(f'No contract month in {key}')
+        day = day or date.today()
+        year = day.year + (int(symbol[-1]) - day.year) % 10
+        if (year, month) < (day.year, day.month):
+            year += 10
+        ib_symbol = self.futures[self.get_key_stem(key)]['Stem']['InteractiveBrokers']
+        return {
+            'symbol': ib_symbol,
+            'exchange': IB_EXCHANGES.get(ib_symbol, ''),
+            'lastTradeDateOrContractMonth': f'{year}{month:02d}',
+        }
+
+    def to_ib_tickers(self, rics):
+        tickers = {ric: self.to_ib_ticker(ric) for ric in set(rics)}
+        return [tickers[ric] for ric in rics]
+
+    def from_ib_positions(self, symbols, local_symbols):
+        keys = {pair: self.from_ib_position(*pair)
+                for pair in set(zip(symbols, local_symbols))}
+        return [keys[pair] for pair in zip(symbols, local_symbols)]
+
+    def expand(self, stems=None, years=range(10)):
+        """
+        Continuation RICs of every contract month of stems for the given
+        last digits of the year, converted once so that later lookups hit
+        the tables.
+        """
+        stems = stems or [stem for stem, future in self.futures.items()
+                          if 'InteractiveBrokers' in future.get('Stem', {})]
+        rics = []
+        for stem in stems:
+            root = self.futures[stem]['Stem'].get('Reuters', stem)
+            for year in years:
+                for letter in LETTER_MONTHS:
+                    rics.append(f'{root}{letter}{year}{CONTINUATION_SUFFIX}')
+        self.to_ib_tickers(rics)
+        return rics
+
+    def check_round_trips(self, rics):
+        """
+        RICs whose stem is lost going to the reconciliation key and back.
+        """
+        return [ric for ric in rics
+                if self.get_key_stem(self.to_ib_ticker(ric)) != self.get_stem(ric)]
+
+
+_symbology = None
+
+
+def get_symbology():
+    global _symbology
+    if _symbology is None:
+        _symbology = Symbology()
+    return _symbology
+
+
+@click.command()
+@click.option('--stems', default=None)
+def main(stems):
+    symbology = get_symbology()
+    rics = symbology.expand(stems.split(',') if stems else None)
+    failures = symbology.check_round_trips(rics)
+    print(f'{len(rics)} contract months, {len(failures)} round trip failures')
+    for ric in failures:
+        key = symbology.to_ib_ticker(ric)
+        print(f'{ric} -> {key} -> {symbology.to_ric(key)}')
+
+
+if __name__ == '__main__':
+    main()  # pylint: disable=no-value-for-parameter
@@ -0,0 +1,224 @@
+from datetime import datetime, time, timedelta, timezone
+import threading
+
+from dateutil import tz
+from dateutil.parser import parse
+import numpy as np
+import pandas as pd
+
+from common.data.constants import CRYPTOCURRENCIES, FUTURES
+
+TZINFOS = {
+    'CT': tz.gettz('US/Central'),
+    'ET': tz.gettz('US/Eastern'),
+}
+PARIS = tz.gettz('Europe/Paris')
+NEW_YORK = tz.gettz('America/New_York')
+MARKET_HOURS = {
+    'paris': (time(9, 0), time(17, 30), PARIS),
+    'new_york': (time(9, 30), time(16, 0), NEW_YORK),
+}
+# Days of sessions built around a requested time
+LOOKBACK_DAYS = 7
+LOOKAHEAD_DAYS = 366
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+_trading_hours = {}
+_session_indexes = {}
+_session_indexes_lock = threading.Lock()
+
+
+def get_trading_hours(stem):
+    """
+    (open time, close time, timezone) of the daily session of stem from
+    FUTURES hours such as 5:00 PM - 4:00 PM CT, parsed once. A close
+    before the open means the session runs overnight.
+    """
+    trading_hours = _trading_hours.get(stem)
+    if trading_hours is None:
+        hours = FUTURES[stem]['Hours']
+        from_time, to_time = hours.split(' - ')
+        timezone_name = hours.split(' ')[-1]
+        to_time = to_time.rsplit(' ', 1)[0]
+        trading_hours = (parse(from_time).time(), parse(to_time).time(),
+                         TZINFOS[timezone_name])
+        _trading_hours[stem] = trading_hours
+    return trading_hours
+
+
+def get_ric_market(ric):
+    """
+    Market whose hours filter the ticks of ric: Euronext Paris for .PA,
+    none for cryptocurrencies, US equities otherwise.
+    """
+    if ric.endswith('.PA'):
+        return 'paris'
+    if ric in CRYPTOCURRENCIES:
+        return None
+    return 'new_york'
+
+
+def _to_nanoseconds(moment):
+    """
+    UTC nanoseconds of a datetime, naive ones being UTC, or of nanoseconds.
+    """
+    if isinstance(moment, (int, np.integer)):
+        return int(moment)
+    if isinstance(moment, pd.Timestamp):
+        return moment.value
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return (moment - EPOCH) // timedelta(microseconds=1) * 1000
+
+
+def _to_datetime(nanoseconds):
+    return pd.Timestamp(nanoseconds, tz='UTC').to_pydatetime()
+
+
+class SessionIndex():
+    """
+    UTC session intervals of one set of trading hours as sorted arrays of
+    nanoseconds, so that lookups are binary searches. Sessions are built
+    day by day in the local timezone, which follows DST transitions, and
+    only the sessions closing on a weekday are kept. A year of sessions is
+    built at once and the index grows when a time outside the days it
+    covers is requested.
+    """
+
+    def __init__(self, trading_hours):
+        self.open_time, self.close_time, self.timezone = trading_hours
+        self.is_overnight = self.close_time <= self.open_time
+        self.first_day = None
+        self.last_day = None
+        self._state = ((np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)), 0, -1)
+        self._lock = threading.Lock()
+
+    def _build(self, first_day, last_day):
+        opens = []
+        closes = []
+        day = first_day
+        while day <= last_day:
+            close_day = day + timedelta(days=1) if self.is_overnight else day
+            if close_day.weekday() < 5:
+                opens.append(datetime.combine(day, self.open_time, tzinfo=self.timezone))
+                closes.append(datetime.combine(close_day, self.close_time, tzinfo=self.timezone))
+            day += timedelta(days=1)
+        return (np.array([_to_nanoseconds(moment) for moment in opens], dtype=np.int64),
+                np.array([_to_nanoseconds(moment) for moment in closes], dtype=np.int64))
+
+    def get_sessions(self, start, end=None):
+        """
+        (opens, closes) arrays covering the days around start and end, in
+        nanoseconds, built if needed.
+        """
+        end = start if end is None else end
+        sessions, covered_start, covered_end = self._state
+        if covered_start <= start and end <= covered_end:
+            return sessions
+        first_day = pd.Timestamp(start, tz='UTC').date() - timedelta(days=LOOKBACK_DAYS)
+        last_day = pd.Timestamp(end, tz='UTC').date() + timedelta(days=LOOKBACK_DAYS)
+        with self._lock:
+            if self.first_day is not None:
+                first_day = min(first_day, self.first_day)
+                last_day = max(last_day, self.last_day)
+            last_day = max(last_day, first_day + timedelta(days=LOOKAHEAD_DAYS))
+            sessions = self._build(first_day, last_day)
+            self.first_day, self.last_day = first_day, last_day
+            covered_start = _to_nanoseconds(datetime.combine(
+                first_day + timedelta(days=LOOKBACK_DAYS), time()))
+            covered_end = _to_nanoseconds(datetime.combine(
+                last_day - timedelta(days=LOOKBACK_DAYS), time()))
+            self._state = (sessions, covered_start, covered_end)
+            return sessions
+
+    def is_open(self, now):
+        nanoseconds = _to_nanoseconds(now)
+        opens, closes = self.get_sessions(nanoseconds)
+        position = np.searchsorted(opens, nanoseconds, side='right') - 1
+        return bool(position >= 0 and nanoseconds < closes[position])
+
+    def get_session(self, now):
+        """
+        (open, close) in UTC of the session open at now, or of the next
+        one.
+        """
+        nanoseconds = _to_nanoseconds(now)
+        opens, closes = self.get_sessions(nanoseconds)
+        position = np.searchsorted(opens, nanoseconds, side='right') - 1
+        if position < 0 or nanoseconds >= closes[position]:
+            position += 1
+        return _to_datetime(opens[position]), _to_datetime(closes[position])
+
+    def get_next_open(self, now):
+        """
+        now if the session is open, otherwise the next open.
+        """
+        if self.is_open(now):
+            return now
+        return self.get_session(now)[0]
+
+    def get_mask(self, nanoseconds):
+        """
+        Whether each UTC nanosecond timestamp falls in a session, bounds
+        included.
+        """
+        nanoseconds = np.asarray(nanoseconds, dtype=np.int64)
+        if len(nanoseconds) == 0:
+            return np.zeros(0, dtype=bool)
+        opens, closes = self.get_sessions(nanoseconds.min(), nanoseconds.max())
+        positions = np.searchsorted(opens, nanoseconds, side='right') - 1
+        return (positions >= 0) & \
+            (nanoseconds <= closes[np.maximum(positions, 0)])
+
+
+def _get_session_index(key, get_hours):
+    index = _session_indexes.get(key)
+    if index is None:
+        with _session_indexes_lock:
+            index = _session_indexes.get(key)
+            if index is None:
+                index = SessionIndex(get_hours())
+                _session_indexes[key] = index
+    return index
+
+
+def get_session_index(stem):
+    return _get_session_index(('stem', stem), lambda: get_trading_hours(stem))
+
+
+def get_ric_session_index(ric):
+    market = get_ric_market(ric)
+    if market is None:
+        return None
+    return _get_session_index(('market', market), lambda: MARKET_HOURS[market])
+
+
+def is_open(stem, now):
+    return get_session_index(stem).is_open(now)
+
+
+def get_next_open(stem, now):
+    return get_session_index(stem).get_next_open(now)
+
+
+def filter_trading_hours(ric, data):
+    """
+    Rows of a tick frame indexed by UTC timestamps that fall in the trading
+    hours of ric. The index is not converted.
+    """
+    index = get_ric_session_index(ric)
+    if index is None:
+        return data
+    return data[index.get_mask(data.index.asi8)]
+
+
+def get_local_session(stem, local_timezone=PARIS, now=None):
+    """
+    Open and close times in local_timezone of the current or next session
+    of stem.
+    """
+    now = now or datetime.now(timezone.utc)
+    session_open, session_close = get_session_index(stem).get_session(now)
+    return (session_open.astimezone(local_timezone).time(),
+            session_close.astimezone(local_timezone).time())
@@ -1,12 +1,18 @@
 from datetime import date, datetime, timedelta
 import os
+import time
 import pendulum
 
 from airflow import DAG
+from airflow.exceptions import AirflowException
 from airflow.operators.python_operator import PythonOperator
+from airflow.utils.state import State
 from airflow.utils.trigger_rule import TriggerRule
 from airflow.utils.dates import days_ago
 
+from common.execution.optimal_limit_order.pricer import get_quote_surface
+from common.execution.rebalance import rebalance
+from common.execution.session import get_session_client
 from common.utils.gmail import send_email
 from common.utils.sms import send_sms
 from dags.services.momentum.run import run
@@ -14,6 +20,15 @@ from dags.services.momentum.run import run
 
 local_tz = pendulum.timezone('Europe/Paris')
 
+STEMS = ['ES', 'GC', 'NQ', 'ZF', 'ZN', 'ZT']
+LEVERAGE = 2
+# Stems executed at once, bounded by the TWS client ids allowed
+MAX_ACTIVE_STEMS = 3
+# TWS client id of the first stem task, the others following it
+STEM_CLIENT_ID = 20
+STEM_RETRIES = 2
+STEM_RETRY_DELAY = timedelta(minutes=2)
+
 default_args = {
     'owner': 'airflow',
     'depends_on_past': False,
@@ -30,38 +45,142 @@ dag = DAG(
     default_args=default_args,
     description='A DAG to execute Momentum strategy',
     schedule_interval='6 0 * * *',
+    concurrency=MAX_ACTIVE_STEMS,
 )
 
 
-def execute_momentum(**kwargs):
-    run(mode='live', stems='ES,GC,NQ,ZF,ZN,ZT', leverage=2)
-
-
-def notify_failure(**kwargs):
-    send_sms('[ERR] Execute Momentum')
-    send_email('[ERR] Execute Momentum')
-
+def _get_task_id(stem):
+    return f'execute_momentum_{stem}'
+
+
+def compute_positions(**kwargs):
+    """
+    Run the strategy once over all stems, so that positions are sized
+    across the portfolio exactly as before the stems were split.
+    """
+    run(mode='live', stems=','.join(STEMS), leverage=LEVERAGE)
+
+
+def prepare_execution(**kwargs):
+    """
+    Build the quote surfaces of every stem once so that the stem tasks load
+    them from the cache and check the session service through which the
+    stem tasks share one warm TWS connection for positions. Best effort: a
+    stem whose surface cannot be built solves its quotes when executed.
+    """
+    if get_session_client() is None:
+        print('session service not running, stem tasks read positions on their own connection')
+    failed_stems = []
+    for stem in STEMS:
+        try:
+            get_quote_surface(stem)
+        except Exception as e:
+            print(f'{stem}: quote surface not built: {e!r}')
+            failed_stems.append(stem)
+    print(f'quote surfaces ready for {",".join(s for s in STEMS if s not in failed_stems)}')
+    return failed_stems
+
+
+def execute_stem(stem, **kwargs):
+    """
+    Work the differences between the IB positions and the strategy
+    positions of stem only, on the stem's own TWS client id. A retry
+    reconciles again, so it only sends what is still missing.
+    """
+    start = time.monotonic()
+    reports, deferred = rebalance(stems=[stem], client_id=STEM_CLIENT_ID + STEMS.index(stem))
+    for report in reports:
+        print(report)
+    for child_order in deferred:
+        print(f'deferred {child_order["ticker"]} {child_order["size"]:+}')
+    failed_orders = [report for report in reports if report['status'] != 'Filled']
+    if len(failed_orders) > 0:
+        raise AirflowException(f'{stem}: {len(failed_orders)} orders not filled')
+    return {'stem': stem, 'seconds': time.monotonic() - start}
+
+
+def report_execution(**kwargs):
+    """
+    Collect the state and duration of every stem once they are all done,
+    notify the ones that failed after their retries and fail the run if
+    any did.
+    """
+    dag_run = kwargs['dag_run']
+    task_instance = kwargs['ti']
+    failed_stems = []
+    for stem in STEMS:
+        state = dag_run.get_task_instance(_get_task_id(stem)).state
+        result = task_instance.xcom_pull(task_ids=_get_task_id(stem)) or {}
+        seconds = result.get('seconds')
+        print(f'{stem}: {state}' + (f' in {seconds:.0f}s' if seconds is not None else ''))
+        if state != State.SUCCESS:
+            failed_stems.append(stem)
+    if len(failed_stems) > 0:
+        send_sms(f'[ERR] Execute Momentum {",".join(failed_stems)}')
+        send_email(f'[ERR] Execute Momentum {",".join(failed_stems)}')
+        raise AirflowException(f'Execute Momentum failed for {",".join(failed_stems)}')
+    return failed_stems
+
+
+t0 = PythonOperator(
+    dag=dag,
+    provide_context=True,
+    python_callable=compute_positions,
+    task_id='compute_positions',
+)
 
 t1 = PythonOperator(
     dag=dag,
     provide_context=True,
-    python_callable=execute_momentum,
-    task_id='execute_momentum',
+    python_callable=prepare_execution,
+    task_id='prepare_execution',
 )
 
+stem_tasks = [
+    PythonOperator(
+        dag=dag,
+        provide_context=True,
+        python_callable=execute_stem,
+        op_kwargs={'stem': stem},
+        task_id=_get_task_id(stem),
+        retries=STEM_RETRIES,
+        retry_delay=STEM_RETRY_DELAY,
+    )
+    for stem in STEMS
+]
+
 t2 = PythonOperator(
     dag=dag,
     provide_context=True,
-    python_callable=notify_failure,
-    task_id='notify_failure',
-    trigger_rule=TriggerRule.ONE_FAILED
+    python_callable=report_execution,
+    task_id='report_execution',
+    trigger_rule=TriggerRule.ALL_DONE,
 )
 
 
+t0.doc_md = """\
+#### Task documentation
+
+Compute Momentum positions over all stems
+"""
+
 t1.doc_md = """\
 #### Task documentation
 
-Execute Momentum strategy
+Build the quote surfaces of the stems, best effort
+"""
+
+for stem_task in stem_tasks:
+    stem_task.doc_md = """\
+#### Task documentation
+
+Execute the Momentum positions of one stem, retried on its own
+"""
+
+t2.doc_md = """\
+#### Task documentation
+
+Report the state of every stem, notify and fail on failed ones
 """
 
-t1 >> t2
+t0 >> t1 >> stem_tasks >> t2
@@ -0,0 +1,56 @@
+import json
+from datetime import date, timedelta
+
+from ib_insync import Future
+
+from common.execution.brokers.contracts import ContractRegistry, is_expired
+from common.execution.brokers.fake_ib import FakeIB
+
+
+def get_future(ticker):
+    symbol, expiry = ticker.split('-')
+    return Future(symbol, expiry, 'GLOBEX')
+
+
+def test_cold_registry_qualifies_once_and_saves(tmp_path):
+    path = tmp_path / 'contracts.json'
+    ib = FakeIB()
+    registry = ContractRegistry(ib, str(path), get_future)
+    contracts = registry.qualify(['ES-203012', 'NQ-203012', 'ES-203012'])
+    assert ib.qualify_requests == 1
+    assert sorted(contracts) == ['ES-203012', 'NQ-203012']
+    registry.qualify(['ES-203012'])
+    assert ib.qualify_requests == 1
+    saved = json.loads(path.read_text())
+    assert saved['ES-203012']['conId'] == contracts['ES-203012'].conId
+
+
+def test_warm_registry_loads_without_qualifying(tmp_path):
+    path = str(tmp_path / 'contracts.json')
+    cold = ContractRegistry(FakeIB(), path, get_future)
+    contract = cold.get('ES-203012')
+    ib = FakeIB()
+    warm = ContractRegistry(ib, path, get_future)
+    assert warm.get('ES-203012') == contract
+    assert ib.qualify_requests == 0
+
+
+def test_warm_registry_drops_expired_contracts(tmp_path):
+    path = str(tmp_path / 'contracts.json')
+    expired = (date.today() - timedelta(days=1)).strftime('%Y%m%d')
+    ticker = f'ES-{expired}'
+    ContractRegistry(FakeIB(), path, get_future).get(ticker)
+    ib = FakeIB()
+    warm = ContractRegistry(ib, path, get_future)
+    assert is_expired(warm.get(ticker))
+    assert ib.qualify_requests == 1
+
+
+def test_registry_without_path(tmp_path):
+    ib = FakeIB()
+    registry = ContractRegistry(ib, None, get_future)
+    registry.get('ES-203012')
+    registry.evict('ES-203012')
+    registry.get('ES-203012')
+    assert ib.qualify_requests == 2
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,85 @@
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from common.execution.optimal_limit_order import download, tick_store
+from common.execution.optimal_limit_order.download import DownloadManifest
+from common.execution.optimal_limit_order.tick_store import QUOTES, read_ticks
+
+START = datetime(2020, 5, 1)
+END = datetime(2020, 5, 1, 1)
+
+
+def test_empty_eikon_response_has_no_rows(monkeypatch):
+    monkeypatch.setattr(download, 'get_timeseries', lambda **kwargs: {'error': None, 'data': None})
+    assert download.fetch_quotes('ESc1', START, END) is None
+
+
+def test_eikon_errors_are_raised(monkeypatch):
+    monkeypatch.setattr(download, 'get_timeseries',
+                        lambda **kwargs: {'error': 'No data available for the requested date range', 'data': None})
+    with pytest.raises(Exception, match='Eikon ESc1'):
+        download.fetch_quotes('ESc1', START, END)
+
+
+def test_manifest_counts_fetched_windows(tmp_path):
+    manifest = DownloadManifest(str(tmp_path / 'manifest.json'))
+    key = download._get_cursor_key('quotes', 'ESc1', date(2020, 5, 1))
+    manifest.mark_window_done(key, END, 120)
+    manifest.mark_window_done(key, datetime(2020, 5, 1, 2), 0)
+    assert (manifest.rows, manifest.windows) == (120, 2)
+    assert manifest.get(key) == '2020-05-01T02:00:00'
+
+
+class Interruption(Exception):
+    pass
+
+
+class WindowFetcher():
+    """
+    Ten quotes a minute, interrupted at the start of fail_at.
+    """
+
+    def __init__(self, fail_at=None):
+        self.fail_at = fail_at
+        self.windows = []
+
+    def __call__(self, ric, start, end):
+        if start == self.fail_at:
+            raise Interruption(start)
+        self.windows.append((start, end))
+        index = pd.date_range(start, end, freq='6s', inclusive='left')
+        return pd.DataFrame({'BID': np.arange(len(index), dtype=float)}, index=index)
+
+
+def test_interrupted_day_resumes_from_its_cursor(monkeypatch, tmp_path):
+    monkeypatch.setattr(download, 'DOWNLOAD_DIRECTORY', str(tmp_path / 'downloads'))
+    monkeypatch.setattr(tick_store, 'TICK_STORE_DIRECTORY', str(tmp_path / 'ticks'))
+    monkeypatch.setattr(download, 'MAX_RETRIES', 1)
+    day = date(2020, 5, 1)
+    cursor_key = download._get_cursor_key(QUOTES, 'ESc1', day)
+    path = str(tmp_path / 'manifest.json')
+
+    interrupted = WindowFetcher(fail_at=datetime(2020, 5, 1, 3))
+    monkeypatch.setattr(download, 'get_fetcher', lambda kind, ric: (interrupted, 10**6, False))
+    with pytest.raises(Interruption):
+        download._download_day(DownloadManifest(path), QUOTES, 'ESc1', day)
+    assert [start for start, _ in interrupted.windows] == \
+        [datetime(2020, 5, 1, 0), datetime(2020, 5, 1, 1)]
+    manifest = DownloadManifest(path)
+    assert manifest.get(cursor_key) == '2020-05-01T03:00:00'
+    assert not manifest.is_done(download._get_day_key(QUOTES, 'ESc1', day))
+
+    resumed = WindowFetcher()
+    monkeypatch.setattr(download, 'get_fetcher', lambda kind, ric: (resumed, 10**6, False))
+    rows, requests = download._download_day(manifest, QUOTES, 'ESc1', day)
+    assert resumed.windows[0][0] == datetime(2020, 5, 1, 3)
+    assert resumed.windows[-1][1] == datetime(2020, 5, 2)
+    assert (rows, requests) == (21 * 600, len(resumed.windows))
+    frame = read_ticks(QUOTES, 'ESc1', day)
+    assert frame.shape[0] == 24 * 600
+    assert frame.index.is_unique and frame.index[0] == datetime(2020, 5, 1)
+    assert frame.index[-1] == datetime(2020, 5, 2) - timedelta(seconds=6)
+    assert DownloadManifest(path).get(download._get_day_key(QUOTES, 'ESc1', day)) == 24 * 600
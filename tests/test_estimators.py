@@ -0,0 +1,54 @@
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from common.execution.optimal_limit_order import estimators
+from common.execution.optimal_limit_order.estimators import DayTicks, get_executed_quantities
+
+TIMES = ['2021-06-01 14:00:00.5', '2021-06-01 14:00:30', '2021-06-01 14:01:10',
+         '2021-06-01 14:02:05', '2021-06-01 14:03:00']
+
+
+def get_frames(unit):
+    index = pd.DatetimeIndex(TIMES, tz='UTC').as_unit(unit)
+    quotes = pd.DataFrame({'BID': [99.75, 99.75, 100.0, 100.0, 100.25],
+                           'ASK': [100.0, 100.0, 100.25, 100.25, 100.5]}, index=index)
+    trades = pd.DataFrame({'TRDPRC_1': [100.0, 100.25, 100.5, 100.25, 100.5],
+                           'COUNT': [1.0, 2.0, 3.0, 1.0, 2.0]}, index=index)
+    return quotes, trades
+
+
+def test_day_ticks_times_are_nanoseconds_whatever_the_index_unit():
+    ticks = DayTicks.from_frames(*get_frames('ns'))
+    for unit in ['us', 'ms']:
+        other = DayTicks.from_frames(*get_frames(unit))
+        np.testing.assert_array_equal(other.quote_times, ticks.quote_times)
+        np.testing.assert_array_equal(other.trade_times, ticks.trade_times)
+    assert ticks.quote_times[0] == pd.Timestamp(TIMES[0], tz='UTC').value
+
+
+def test_executed_quantities_do_not_depend_on_the_index_unit():
+    quotes, trades = get_frames('ns')
+    expected = get_executed_quantities(quotes.join(trades), [0, 1], 0.25)
+    quotes, trades = get_frames('us')
+    np.testing.assert_array_equal(
+        get_executed_quantities(quotes.join(trades), [0, 1], 0.25), expected)
+    assert expected.shape == (2, 3)
+
+
+def test_days_without_estimators_are_cached_as_empty(monkeypatch, tmp_path):
+    computed = []
+
+    def get_estimators(ric, day, tick_size):
+        computed.append(day)
+        return None if day.day == 1 else {'sigma': 1.0}
+
+    monkeypatch.setattr(estimators, 'ESTIMATORS_DIRECTORY', str(tmp_path))
+    monkeypatch.setattr(estimators, 'get_estimators', get_estimators)
+    jobs = [('ES', 'ESc1', date(2021, 6, day), 0.25) for day in [1, 2]]
+    first = [estimators._run_calibration_job(job) for job in jobs]
+    second = [estimators._run_calibration_job(job) for job in jobs]
+    assert first == second == [(jobs[0], None, None), (jobs[1], {'sigma': 1.0}, None)]
+    assert computed == [date(2021, 6, 1), date(2021, 6, 2)]
+    assert estimators.has_cached_estimators('ESc1', date(2021, 6, 1))
@@ -0,0 +1,48 @@
+import json
+
+from common.execution.brokers.fake_ib import FakeIB
+from common.execution.brokers.interactive_brokers import InteractiveBrokers
+from common.execution.brokers.latency import COMPLETE, QUALIFY, QUOTE, LatencyRecorder
+
+
+def get_recorder():
+    recorder = LatencyRecorder()
+    recorder.observe(QUOTE, 0.002)
+    recorder.observe(QUOTE, 0.2)
+    timeline = recorder.start_order('ESM0^2')
+    timeline.record(QUALIFY, 0.01)
+    timeline.complete()
+    return recorder
+
+
+def test_json_export_round_trips(tmp_path):
+    recorder = get_recorder()
+    path = str(tmp_path / 'latency' / 'latency.json')
+    recorder.write(path)
+    with open(path) as f:
+        exported = json.load(f)
+    assert exported == json.loads(json.dumps(recorder.to_dict()))
+    assert exported['steps'][QUOTE]['count'] == 2
+    assert exported['steps'][QUOTE]['buckets']['0.0025'] == 1
+    assert exported['steps'][QUOTE]['buckets']['+Inf'] == 2
+    assert [event['step'] for event in exported['timelines'][0]['events']] == [QUALIFY, COMPLETE]
+
+
+def test_prometheus_export(tmp_path):
+    path = str(tmp_path / 'latency.prom')
+    get_recorder().write(path)
+    with open(path) as f:
+        text = f.read()
+    assert 'execution_order_lifecycle_seconds_count{step="quote"} 2' in text
+    assert 'execution_order_lifecycle_seconds_bucket{step="quote",le="+Inf"} 2' in text
+
+
+def test_basket_exports_latencies(tmp_path):
+    path = str(tmp_path / 'latency.json')
+    broker = InteractiveBrokers(FakeIB(), latency_path=path)
+    reports = broker.execute_basket({'ESM0^2': 0})
+    assert reports == []
+    with open(path) as f:
+        exported = json.load(f)
+    assert exported['steps'][QUALIFY]['count'] == 1
+    assert exported == json.loads(json.dumps(broker.latency.to_dict()))
@@ -0,0 +1,68 @@
+import pytest
+from ib_insync import Future
+
+from common.execution.brokers.fake_ib import FakeIB
+from common.execution.brokers.market_data import MarketDataBook
+
+
+@pytest.fixture
+def ib():
+    return FakeIB()
+
+
+def get_contract(ib, symbol='ES'):
+    return ib.qualifyContracts(Future(symbol, '202112', 'GLOBEX'))[0]
+
+
+def test_subscriptions_share_one_line(ib):
+    book = MarketDataBook(ib)
+    contract = get_contract(ib)
+    book.subscribe(contract)
+    book.subscribe(contract)
+    assert ib.market_data_requests == 1
+    assert ib.market_data_lines == {contract.conId: 1}
+    book.unsubscribe(contract)
+    assert ib.market_data_lines == {contract.conId: 1}
+    assert book.is_subscribed(contract)
+    book.unsubscribe(contract)
+    assert ib.market_data_lines == {}
+    assert not book.is_subscribed(contract)
+
+
+def test_release_is_not_cancelled_twice(ib):
+    book = MarketDataBook(ib)
+    contract = get_contract(ib)
+    with book.subscription(contract):
+        pass
+    book.unsubscribe(contract)
+    assert ib.market_data_lines == {}
+
+
+def test_subscription_released_on_error(ib):
+    book = MarketDataBook(ib)
+    contract = get_contract(ib)
+    with pytest.raises(RuntimeError):
+        with book.subscription(contract):
+            raise RuntimeError('order failed')
+    assert ib.market_data_lines == {}
+
+
+def test_quotes_follow_the_subscription(ib):
+    book = MarketDataBook(ib)
+    contract = get_contract(ib)
+    other = get_contract(ib, 'NQ')
+    with book.subscription(contract):
+        ib.set_quote(contract, 100, 100.25)
+        ib.set_quote(other, 200, 200.25)
+        assert book.get_bid_ask(contract) == (100, 100.25)
+        assert book.get_latest_quote(other) is None
+    assert book.get_latest_quote(contract) is None
+
+
+def test_close_cancels_every_line(ib):
+    book = MarketDataBook(ib)
+    contracts = [get_contract(ib, symbol) for symbol in ['ES', 'NQ']]
+    for contract in contracts:
+        book.subscribe(contract)
+    book.close()
+    assert ib.market_data_lines == {}
@@ -0,0 +1,118 @@
+import asyncio
+
+from ib_insync import Future, util
+
+from common.execution.brokers.fake_ib import FakeIB
+from common.execution.brokers.market_data import MarketDataBook
+from common.execution.brokers.order_manager import DECAY, FILL, QUOTE, LimitOrderManager, RepricingPolicy
+
+TICK_SIZE = 0.25
+
+
+class QuoteRecorder():
+    """
+    Optimal quote of one tick plus one tick per second to go, recording
+    every (quantity, time to go) priced.
+    """
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, quantity, time_in_seconds):
+        self.calls.append((quantity, time_in_seconds))
+        return TICK_SIZE * (1 + time_in_seconds)
+
+
+def get_manager(ib, quantity=4, time_in_seconds=1.0, **policy):
+    contract = ib.qualifyContracts(Future('ES', '202112', 'GLOBEX'))[0]
+    market_data = MarketDataBook(ib)
+    market_data.subscribe(contract)
+    ib.set_quote(contract, 100, 100.25)
+    policy = {
+        'quote_threshold': 1,
+        'decay_interval': 0.2,
+        'minimum_intervals': {QUOTE: 0.05, FILL: 0.05, DECAY: 0.05},
+        'cancel_after': 0.3,
+        **policy,
+    }
+    return LimitOrderManager(ib, market_data, contract, 'BUY', quantity, time_in_seconds,
+                             QuoteRecorder(), TICK_SIZE, policy=RepricingPolicy(**policy))
+
+
+def run_with_market(manager, market):
+    async def main():
+        task = asyncio.ensure_future(market(manager))
+        try:
+            return await manager.run()
+        finally:
+            task.cancel()
+    return util.run(main())
+
+
+async def idle(manager):
+    await asyncio.sleep(10)
+
+
+def test_reprices_on_quote_move_beyond_threshold():
+    ib = FakeIB()
+    manager = get_manager(ib, decay_interval=10)
+    prices = []
+
+    async def market(manager):
+        await asyncio.sleep(0.1)
+        prices.append(manager.order.lmtPrice)
+        ib.set_quote(manager.contract, 100.1, 100.35)
+        await asyncio.sleep(0.1)
+        prices.append(manager.order.lmtPrice)
+        ib.set_quote(manager.contract, 101, 101.25)
+        await asyncio.sleep(0.1)
+        prices.append(manager.order.lmtPrice)
+        ib.fill(manager.trade, 4, manager.order.lmtPrice)
+
+    trade = run_with_market(manager, market)
+    assert trade.orderStatus.status == 'Filled'
+    assert manager.repricings[QUOTE] == 1
+    assert prices[0] == prices[1] < prices[2]
+
+
+def test_reprices_on_fill_and_decay():
+    ib = FakeIB()
+    manager = get_manager(ib, time_in_seconds=2.0)
+
+    async def market(manager):
+        await asyncio.sleep(0.3)
+        ib.fill(manager.trade, 1, manager.order.lmtPrice)
+        await asyncio.sleep(0.3)
+        ib.fill(manager.trade, 3, manager.order.lmtPrice)
+
+    trade = run_with_market(manager, market)
+    assert trade.orderStatus.filled == 4
+    assert manager.repricings[FILL] >= 1
+    assert manager.repricings[DECAY] >= 1
+    assert manager.get_quote.calls[-1][0] == 3
+
+
+def test_reprices_at_zero_time_to_go_then_cancels():
+    ib = FakeIB()
+    manager = get_manager(ib, time_in_seconds=0.3, cancel_after=0.3)
+    prices = []
+
+    async def market(manager):
+        await asyncio.sleep(0.45)
+        prices.append(manager.order.lmtPrice)
+        ib.set_quote(manager.contract, 101, 101.25)
+        await asyncio.sleep(0.1)
+        prices.append(manager.order.lmtPrice)
+
+    trade = run_with_market(manager, market)
+    assert (4, 0) in manager.get_quote.calls
+    assert prices[1] > prices[0]
+    assert trade.orderStatus.status == 'Cancelled'
+    assert ib.openTrades() == []
+
+
+def test_zero_quantity_places_no_order():
+    ib = FakeIB()
+    manager = get_manager(ib, quantity=0)
+    assert run_with_market(manager, idle) is None
+    assert ib.trades() == []
@@ -0,0 +1,49 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import json
+import os
+
+import pytest
+
+from common.execution.optimal_limit_order import parameters
+from common.execution.optimal_limit_order.parameters import LATEST_FILE, publish_parameters
+
+VALUES = {'ats': 2.0, 'sigma': 0.5, 'b': 3.0, 'A': 0.1, 'k': 1.5}
+STEMS = [f'S{i}' for i in range(8)]
+
+
+@pytest.fixture
+def directory(monkeypatch, tmp_path):
+    monkeypatch.setattr(parameters, 'PARAMETERS_DIRECTORY', str(tmp_path))
+    monkeypatch.setattr(parameters, 'PUBLISH_RETRY_SECONDS', 0.001)
+    return tmp_path
+
+
+def read_json(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def test_concurrent_publications_are_all_kept(directory):
+    with ThreadPoolExecutor(max_workers=len(STEMS)) as executor:
+        versions = list(executor.map(lambda stem: publish_parameters({stem: VALUES}), STEMS))
+    assert sorted(versions) == list(range(1, len(STEMS) + 1))
+    latest = read_json(directory / LATEST_FILE)
+    assert latest['version'] == len(STEMS)
+    assert sorted(latest['parameters']) == STEMS
+    assert sorted(os.listdir(directory)) == \
+        [LATEST_FILE] + [f'v{version:06d}.json' for version in range(1, len(STEMS) + 1)]
+    assert datetime.fromisoformat(latest['published']).utcoffset().total_seconds() == 0
+
+
+def test_invalid_values_keep_previous_ones(directory):
+    publish_parameters({'ES': VALUES})
+    assert publish_parameters({'ES': {**VALUES, 'k': float('nan')}, 'GC': VALUES}) == 2
+    assert read_json(directory / 'v000002.json')['parameters'] == {'ES': VALUES, 'GC': VALUES}
+
+
+def test_unfinished_publication_fails(directory, monkeypatch):
+    monkeypatch.setattr(parameters, 'PUBLISH_ATTEMPTS', 3)
+    (directory / 'v000001.json').write_text('{}')
+    with pytest.raises(Exception, match='Version 1 exists'):
+        publish_parameters({'ES': VALUES})
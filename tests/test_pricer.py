@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+from common.execution.optimal_limit_order import pricer
+from common.execution.optimal_limit_order.pricer import LOG_SPACE_Q, QUOTE_SURFACE_T_MAX, get_optimal_quote, get_quote_surface, optimal_limit_order_surface
+
+MODEL_PARAMETERS = [
+    {'mu': 0, 'sigma': 1.2, 'A': 0.05, 'k': 0.6, 'gamma': 2e-3, 'b': 3.1},
+    {'mu': 0.01, 'sigma': 0.5, 'A': 0.5, 'k': 1.5, 'gamma': 1e-3, 'b': 1.0},
+]
+EXECUTION_PARAMETERS = {'ats': 3.0, 'sigma': 1.2, 'b': 3.1, 'A': 0.05, 'k': 0.6}
+TOLERANCE_TICKS = 1e-3
+
+
+@pytest.mark.parametrize('model_parameters', MODEL_PARAMETERS)
+@pytest.mark.parametrize('q_max', [1, 5, LOG_SPACE_Q])
+@pytest.mark.parametrize('t_max', [60, 300])
+def test_expm_matches_odeint(model_parameters, q_max, t_max):
+    surfaces = [optimal_limit_order_surface(
+        q_max, t_max, time_steps=t_max + 1, solver=solver, log_space_q=None, **model_parameters)
+        for solver in ['odeint', 'expm']]
+    (odeint_time_to_go, odeint_delta), (expm_time_to_go, expm_delta) = surfaces
+    np.testing.assert_array_equal(odeint_time_to_go, expm_time_to_go)
+    assert np.isfinite(expm_delta).all()
+    np.testing.assert_allclose(expm_delta, odeint_delta, rtol=0, atol=TOLERANCE_TICKS)
+
+
+def test_quote_surfaces_keep_latest_parameters(monkeypatch, tmp_path):
+    monkeypatch.setattr(pricer, 'QUOTE_SURFACE_DIRECTORY', str(tmp_path))
+    monkeypatch.setattr(pricer, '_quote_surfaces', {})
+    surface = get_quote_surface('ES', EXECUTION_PARAMETERS)
+    assert get_quote_surface('ES', EXECUTION_PARAMETERS) is surface
+    reloaded = get_quote_surface('ES', {**EXECUTION_PARAMETERS, 'sigma': 1.5})
+    assert reloaded.key != surface.key
+    assert list(pricer._quote_surfaces.items()) == [('ES', reloaded)]
+    restored = get_quote_surface('ES', EXECUTION_PARAMETERS)
+    assert restored.key == surface.key
+    assert len(list(tmp_path.iterdir())) == 2
+
+
+@pytest.mark.parametrize('quantity', [3, 30, 60])
+def test_direct_quotes_match_surface_lookups(monkeypatch, tmp_path, quantity):
+    monkeypatch.setattr(pricer, 'QUOTE_SURFACE_DIRECTORY', str(tmp_path))
+    monkeypatch.setattr(pricer, '_quote_surfaces', {})
+    surface_quote = get_optimal_quote('ES', quantity, QUOTE_SURFACE_T_MAX, parameters=EXECUTION_PARAMETERS)
+    solved_quote = get_optimal_quote('ES', quantity, QUOTE_SURFACE_T_MAX + 1e-9, parameters=EXECUTION_PARAMETERS)
+    assert solved_quote == pytest.approx(surface_quote, abs=TOLERANCE_TICKS)
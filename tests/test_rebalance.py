@@ -0,0 +1,42 @@
+from common.execution import rebalance as rebalance_module
+from common.execution.rebalance import rebalance
+
+DIFFERENCES = [
+    {'key': 'ESM0^2', 'stem': 'ES', 'position_ib': 1, 'position_airflow': 3},
+    {'key': 'GCM0^2', 'stem': 'GC', 'position_ib': 0, 'position_airflow': -2},
+]
+
+
+class RecordingBroker():
+
+    def __init__(self):
+        self.baskets = []
+
+    async def execute_basket_async(self, sizes, time_in_seconds=300, stems=None):
+        self.baskets.append(sizes)
+        return [{'ticker': ticker, 'status': 'Filled'} for ticker in sizes]
+
+
+def test_rebalance_works_only_its_stems(monkeypatch):
+    refreshes = []
+
+    def get_differences(refresh=False):
+        refreshes.append(refresh)
+        return DIFFERENCES
+
+    monkeypatch.setattr(rebalance_module, 'get_differences', get_differences)
+    monkeypatch.setattr(rebalance_module, 'get_next_open', lambda stem, now: now)
+    broker = RecordingBroker()
+    reports, deferred = rebalance(broker=broker, stems=['GC'])
+    assert broker.baskets == [{'GCM0^2': -2}]
+    assert reports == [{'ticker': 'GCM0^2', 'status': 'Filled'}]
+    assert deferred == []
+    assert refreshes == [True]
+
+
+def test_rebalance_works_every_stem_by_default(monkeypatch):
+    monkeypatch.setattr(rebalance_module, 'get_differences', lambda refresh=False: DIFFERENCES)
+    monkeypatch.setattr(rebalance_module, 'get_next_open', lambda stem, now: now)
+    broker = RecordingBroker()
+    rebalance(broker=broker)
+    assert broker.baskets == [{'ESM0^2': 2, 'GCM0^2': -2}]
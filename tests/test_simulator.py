@@ -0,0 +1,77 @@
+import numpy as np
+
+from common.execution.brokers.order_manager import DECAY, FILL, QUOTE, RepricingPolicy
+from common.execution.optimal_limit_order.simulator import NANOSECONDS, SimulatedOrder
+
+TICK_SIZE = 0.25
+
+
+def get_events(rows):
+    """
+    rows : (seconds, bid, ask, trade price, trade size), the price being
+    None for quotes
+    """
+    seconds, bid, ask, price, size = zip(*rows)
+    return {
+        'time': (np.array(seconds) * NANOSECONDS).astype(np.int64),
+        'bid': np.array(bid, dtype=float),
+        'bid_size': np.full(len(rows), 5.0),
+        'ask': np.array(ask, dtype=float),
+        'ask_size': np.full(len(rows), 5.0),
+        'price': np.array([np.nan if p is None else p for p in price], dtype=float),
+        'size': np.array(size, dtype=float),
+    }
+
+
+class QuoteRecorder():
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, quantity, time_in_seconds):
+        self.calls.append((quantity, time_in_seconds))
+        return TICK_SIZE * (1 + time_in_seconds)
+
+
+def get_order(rows, quantity=10, time_in_seconds=10, cancel_after=5):
+    policy = RepricingPolicy(decay_interval=100, cancel_after=cancel_after,
+                             minimum_intervals={QUOTE: 0, FILL: 0, DECAY: 0})
+    return SimulatedOrder(get_events(rows), 'BUY', quantity, time_in_seconds,
+                          QuoteRecorder(), TICK_SIZE, policy)
+
+
+def test_trade_through_fills_up_to_its_size():
+    order = get_order([
+        (0, 100, 100.25, None, 0),
+        (1, 100, 100.25, 97, 8),
+    ])
+    report = order.run(0)
+    assert order.price == 97.25
+    assert order.queue_ahead == 0
+    assert report['filled'] == 3
+
+
+def test_trade_at_price_consumes_queue_ahead_first():
+    order = get_order([
+        (0, 100, 100.25, None, 0),
+        (10, 100, 100.25, None, 0),
+        (11, 100, 100.25, 99.75, 4),
+        (12, 100, 100.25, 99.75, 4),
+    ])
+    report = order.run(0)
+    assert order.price == 99.75
+    assert report['filled'] == 3
+
+
+def test_reprices_on_quotes_after_deadline_until_cancel():
+    order = get_order([
+        (0, 100, 100.25, None, 0),
+        (10, 100, 100.25, None, 0),
+        (12, 101, 101.25, None, 0),
+        (20, 101, 101.25, 90, 100),
+    ])
+    report = order.run(0)
+    assert (10, 0) in order.get_quote.calls
+    assert order.price == 100.75
+    assert report['quote_repricings'] == 1
+    assert report['filled'] == 0
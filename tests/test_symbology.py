@@ -0,0 +1,137 @@
+from datetime import date
+import re
+
+import pytest
+
+from common.execution import symbology
+from common.execution.symbology import Symbology, convert_local_symbol
+
+FUTURES = {
+    'BO': {'Stem': {'Reuters': '1BO', 'InteractiveBrokers': 'ZL'}},
+    'ES': {'Stem': {'Reuters': 'ES', 'InteractiveBrokers': 'ES'}},
+    'GC': {'Stem': {'Reuters': 'GC', 'InteractiveBrokers': 'GC'}},
+    'HG': {'Stem': {'Reuters': '1HG', 'InteractiveBrokers': 'HG'}},
+    'LGO': {'Stem': {'Reuters': 'LGO', 'InteractiveBrokers': 'GOIL'}},
+    'O': {'Stem': {'Reuters': '1O', 'InteractiveBrokers': 'ZO'}},
+    'RR': {'Stem': {'Reuters': '1RR', 'InteractiveBrokers': 'ZR'}},
+    'S': {'Stem': {'Reuters': 'S', 'InteractiveBrokers': 'ZS'}},
+    'SI': {'Stem': {'Reuters': '1SIRT', 'InteractiveBrokers': 'SI'}},
+    'W': {'Stem': {'Reuters': 'W', 'InteractiveBrokers': 'ZW'}},
+}
+ROOT_STEMS = {
+    '1BO': 'BO', 'BO': 'BO', 'ES': 'ES', 'GC': 'GC', '1HG': 'HG', 'LGO': 'LGO',
+    '1O': 'O', 'O': 'O', '1RR': 'RR', 'RR': 'RR', 'S': 'S',
+    '1SIRT': 'SI', '1SI': 'SI', 'W': 'W', '1W': 'W',
+}
+RICS = [f'{future["Stem"]["Reuters"]}{letter}{year}^2'
+        for future in FUTURES.values() for letter in 'HMUZ' for year in [1, 9]] + \
+    ['RRN1^2']
+POSITIONS = [
+    ('ZL', 'ZL   JUL 21'),
+    ('ZS', 'ZS   NOV 21'),
+    ('ZO', 'ZO   DEC 21'),
+    ('ES', 'ESU1'),
+    ('GC', 'GCZ1'),
+    ('HG', 'HGU1'),
+    ('SI', 'SIN1'),
+    ('GOIL', 'GOILN1'),
+    ('EUR', 'EUR.USD'),
+]
+
+
+def ric_to_stem(ric):
+    return ROOT_STEMS.get(ric[:-len('^2')][:-2])
+
+
+def old_ric_to_ib_ticker(ric):
+    stem = ric_to_stem(ric)
+    ib_stem = FUTURES[stem]['Stem']['InteractiveBrokers']
+    if stem == 'BO':
+        return re.sub('^1BO', ib_stem, ric)
+    if stem == 'O':
+        return re.sub('^1O', ib_stem, ric)
+    if stem == 'RR':
+        ticker = re.sub('^1RR', ib_stem, ric)
+        return re.sub('^RR', ib_stem, ticker)
+    if stem == 'S':
+        return re.sub('^S', ib_stem, ric)
+    if stem == 'SI':
+        return re.sub('^1SIRT', "1" + ib_stem, ric)
+    if stem == 'W':
+        return re.sub('^W', '1W', ric)
+    return ric
+
+
+def old_from_ib_position(symbol, local_symbol):
+    prefix = '1' if symbol in ['BO', 'C', 'HG', 'O', 'RR', 'SI', 'W'] else ''
+    ric = prefix + convert_local_symbol(local_symbol)
+    ric = re.sub('^GOIL', 'LGO', ric)
+    return re.sub('^ETH', 'HTE', ric)
+
+
+def old_to_ric(key):
+    ric = re.sub('^ZL', 'BO', key)
+    ric = re.sub('^ZO', 'O', ric)
+    return re.sub('^ZS', 'S', ric)
+
+
+@pytest.fixture
+def conversions(monkeypatch):
+    monkeypatch.setattr(symbology, 'ric_to_stem', ric_to_stem)
+    return Symbology(futures=FUTURES)
+
+
+def test_convert_local_symbol():
+    assert convert_local_symbol('ZL   JUL 21') == 'ZLN1^2'
+    assert convert_local_symbol('ESU1') == 'ESU1^2'
+    assert convert_local_symbol('EUR.USD') == 'EUR.USD'
+
+
+@pytest.mark.parametrize('ric', RICS)
+def test_to_ib_ticker_matches_regex(conversions, ric):
+    assert conversions.to_ib_ticker(ric) == old_ric_to_ib_ticker(ric)
+
+
+@pytest.mark.parametrize('symbol, local_symbol', POSITIONS)
+def test_from_ib_position_matches_regex(conversions, symbol, local_symbol):
+    assert conversions.from_ib_position(symbol, local_symbol) == \
+        old_from_ib_position(symbol, local_symbol)
+
+
+@pytest.mark.parametrize('symbol, local_symbol', POSITIONS[:-1])
+def test_to_ric_matches_regex(conversions, symbol, local_symbol):
+    key = conversions.from_ib_position(symbol, local_symbol)
+    assert conversions.to_ric(key) == old_to_ric(key)
+
+
+def test_round_trips_match_regex(conversions):
+    old_failures = [ric for ric in RICS
+                    if ric_to_stem(old_to_ric(old_ric_to_ib_ticker(ric))) != ric_to_stem(ric)]
+    assert conversions.check_round_trips(RICS) == old_failures
+    # ZR keys have no RIC root rename, before and after the symbology module
+    assert {ric_to_stem(ric) for ric in old_failures} <= {'RR'}
+
+
+def test_positions_match_strategy_keys(conversions):
+    assert conversions.from_ib_position('ZL', 'ZL   JUL 21') == \
+        conversions.to_ib_ticker('1BON1^2')
+    assert conversions.from_ib_position('ZS', 'ZS   NOV 21') == \
+        conversions.to_ib_ticker('SX1^2')
+
+
+def test_memoized_conversions_are_stable(conversions):
+    first = conversions.from_ib_positions(*zip(*POSITIONS))
+    assert conversions.from_ib_positions(*zip(*POSITIONS)) == first
+    assert conversions.to_ib_tickers(RICS + RICS) == [old_ric_to_ib_ticker(ric) for ric in RICS + RICS]
+
+
+@pytest.mark.parametrize('key, day, contract_month', [
+    ('ZLN1^2', date(2021, 6, 1), '202107'),
+    ('ZLN1^2', date(2021, 7, 20), '202107'),
+    ('ZLF6^2', date(2026, 10, 17), '203601'),
+    ('ZLF7^2', date(2026, 10, 17), '202701'),
+    ('ESZ6^2', date(2026, 12, 1), '202612'),
+])
+def test_contract_month_is_not_expired(conversions, key, day, contract_month):
+    fields = conversions.to_contract_fields(key, day)
+    assert fields['lastTradeDateOrContractMonth'] == contract_month
@@ -0,0 +1,61 @@
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from common.execution.optimal_limit_order import tick_store
+from common.execution.optimal_limit_order.tick_store import QUOTES, has_ticks, query_ticks, read_tick_arrays, read_ticks, write_ticks
+
+DAY = date(2021, 6, 1)
+
+
+@pytest.fixture(autouse=True)
+def directory(monkeypatch, tmp_path):
+    monkeypatch.setattr(tick_store, 'TICK_STORE_DIRECTORY', str(tmp_path))
+    return tmp_path
+
+
+def get_quotes(day=DAY, unit='us', tz='UTC'):
+    index = pd.DatetimeIndex(
+        [f'{day} 14:00:00.000001', f'{day} 14:00:00.5', f'{day} 14:00:01', f'{day} 13:59:59'],
+        tz=tz).as_unit(unit)
+    return pd.DataFrame({'BID': [99.75, 100.0, 100.25, 99.5],
+                         'ASK': [100.0, 100.25, 100.5, 99.75],
+                         'BIDSIZE': ['3', '4', 'n/a', '1']}, index=index)
+
+
+def test_round_trip_is_sorted_naive_utc_nanoseconds():
+    quotes = get_quotes()
+    write_ticks(QUOTES, 'ESc1', DAY, quotes)
+    assert has_ticks(QUOTES, 'ESc1', DAY)
+    frame = read_ticks(QUOTES, 'ESc1', DAY)
+    expected = quotes.sort_index()
+    assert frame.index.dtype == 'datetime64[ns]'
+    assert list(frame.index) == list(expected.index.tz_localize(None))
+    np.testing.assert_array_equal(frame['BID'], expected['BID'])
+    np.testing.assert_array_equal(frame['BIDSIZE'], [1.0, 3.0, 4.0, np.nan])
+
+
+def test_arrays_are_memory_mapped_nanoseconds():
+    write_ticks(QUOTES, 'ESc1', DAY, get_quotes(tz='America/Chicago'))
+    index, data = read_tick_arrays(QUOTES, 'ESc1', DAY, columns=['ASK', 'COUNT'])
+    assert isinstance(index, np.memmap) and isinstance(data['ASK'], np.memmap)
+    assert list(data) == ['ASK']
+    assert index[1] == pd.Timestamp(f'{DAY} 14:00:00.000001', tz='America/Chicago').value
+
+
+def test_reads_are_restricted_to_bounds():
+    write_ticks(QUOTES, 'ESc1', DAY, get_quotes())
+    frame = read_ticks(QUOTES, 'ESc1', DAY, start=datetime(2021, 6, 1, 14),
+                       end=datetime(2021, 6, 1, 14, 0, 0, 500000))
+    assert list(frame['BID']) == [99.75, 100.0]
+    assert read_ticks(QUOTES, 'ESc1', date(2021, 6, 2)) is None
+
+
+def test_query_spans_stored_days():
+    write_ticks(QUOTES, 'ESc1', DAY, get_quotes())
+    write_ticks(QUOTES, 'ESc1', date(2021, 6, 3), get_quotes(date(2021, 6, 3)))
+    frame = query_ticks(QUOTES, 'ESc1', datetime(2021, 6, 1, 14), datetime(2021, 6, 3, 14))
+    assert frame.shape[0] == 3 + 1
+    assert frame.index.is_monotonic_increasing
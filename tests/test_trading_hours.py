@@ -0,0 +1,71 @@
+from datetime import datetime, time, timezone
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from common.execution.trading_hours import MARKET_HOURS, TZINFOS, SessionIndex
+
+# CME Globex hours, 5:00 PM - 4:00 PM CT
+OVERNIGHT_HOURS = (time(17, 0), time(16, 0), TZINFOS['CT'])
+
+
+def utc(*args):
+    return datetime(*args, tzinfo=timezone.utc)
+
+
+@pytest.mark.parametrize('now, session', [
+    # Friday before the March change, CST
+    (utc(2021, 3, 12, 15), (utc(2021, 3, 11, 23), utc(2021, 3, 12, 22))),
+    # Sunday of the March change, the reopen is at 5:00 PM CDT
+    (utc(2021, 3, 14, 21, 30), (utc(2021, 3, 14, 22), utc(2021, 3, 15, 21))),
+    # Friday before the November change, CDT
+    (utc(2021, 11, 5, 15), (utc(2021, 11, 4, 22), utc(2021, 11, 5, 21))),
+    # Sunday of the November change, the reopen is at 5:00 PM CST
+    (utc(2021, 11, 7, 22, 30), (utc(2021, 11, 7, 23), utc(2021, 11, 8, 22))),
+])
+def test_overnight_sessions_follow_dst(now, session):
+    index = SessionIndex(OVERNIGHT_HOURS)
+    assert index.get_session(now) == session
+    assert index.is_open(now) == (session[0] <= now)
+    assert index.get_next_open(now) == max(now, session[0])
+
+
+@pytest.mark.parametrize('now, is_open', [
+    (utc(2021, 3, 12, 14), False),
+    (utc(2021, 3, 12, 14, 30), True),
+    (utc(2021, 3, 12, 20, 30), True),
+    (utc(2021, 3, 15, 13, 30), True),
+    (utc(2021, 3, 15, 20, 30), False),
+    (utc(2021, 11, 5, 13, 30), True),
+    (utc(2021, 11, 5, 20, 30), False),
+    (utc(2021, 11, 8, 14), False),
+    (utc(2021, 11, 8, 20, 30), True),
+    (utc(2021, 11, 6, 15), False),
+])
+def test_new_york_open_and_close_across_dst(now, is_open):
+    assert SessionIndex(MARKET_HOURS['new_york']).is_open(now) == is_open
+
+
+def test_next_open_skips_the_weekend_of_the_march_change():
+    index = SessionIndex(MARKET_HOURS['new_york'])
+    assert index.get_next_open(utc(2021, 3, 12, 22)) == utc(2021, 3, 15, 13, 30)
+    assert index.get_next_open(utc(2021, 11, 5, 22)) == utc(2021, 11, 8, 14, 30)
+
+
+def test_paris_changes_on_its_own_date():
+    # The US moved on 2021-03-14, Europe on 2021-03-28
+    index = SessionIndex(MARKET_HOURS['paris'])
+    assert index.get_session(utc(2021, 3, 26, 7)) == (utc(2021, 3, 26, 8), utc(2021, 3, 26, 16, 30))
+    assert index.get_session(utc(2021, 3, 29, 6)) == (utc(2021, 3, 29, 7), utc(2021, 3, 29, 15, 30))
+
+
+def test_mask_matches_is_open_across_both_changes():
+    index = SessionIndex(MARKET_HOURS['new_york'])
+    moments = pd.date_range('2021-03-10', '2021-11-12', freq='17min', tz='UTC')
+    mask = index.get_mask(moments.as_unit('ns').asi8)
+    # Closes are included in the mask and excluded from is_open
+    is_close = np.array([moment.time() in [time(20), time(21)] for moment in moments])
+    expected = np.array([index.is_open(moment) for moment in moments])
+    np.testing.assert_array_equal(mask[~is_close], expected[~is_close])
+    assert mask.sum() > 0